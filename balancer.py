@@ -0,0 +1,616 @@
+"""
+PUG Pro Discord Bot - Team Balancer
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import math
+from itertools import combinations
+from typing import Optional, List, Dict, Tuple, Iterable
+
+# ============================================================================
+# Balancing Configuration
+# ============================================================================
+
+# Number of the server's own PUGs after which a shared-team appearance counts half as much
+TEAMMATE_HALF_LIFE = 20
+
+# ELO points (team total) a fully weighted repeat pairing is worth to the balancer
+# Keeps ELO the dominant term - a recent duo only wins a close tie-break
+TEAMMATE_REPEAT_PENALTY = 25
+
+# Rating uncertainty (Glicko-style rating deviation, in ELO points)
+RATING_DEVIATION_NEW = 350  # Player with no games
+RATING_DEVIATION_MIN = 50  # Floor for long-time regulars
+RATING_PRIOR_SPREAD = 200  # Typical ELO spread of a community, used to shrink uncertain ratings
+
+# ELO points (team total) per point of difference in team uncertainty (RD of the team sum)
+# Spreads new/unproven players across both teams instead of stacking them
+UNCERTAINTY_BALANCE_WEIGHT = 0.5
+
+# Branches the live searches (draft outlook, channel planning) may visit before settling for the
+# best split found so far - about a quarter of a second; uncertain ratings at 20+ players can
+# otherwise take seconds
+LIVE_SEARCH_MAX_NODES = 50000
+
+
+def win_probability(red_avg: float, blue_avg: float, variance: float = 0.0) -> float:
+    """Expected red win probability from team average ELOs
+
+    variance is the uncertainty of (red_avg - blue_avg); it flattens the prediction
+    towards 50% the same way Glicko's g(RD) does.
+    """
+    if variance:
+        q = math.log(10) / 400
+        g = 1 / math.sqrt(1 + 3 * q * q * variance / math.pi ** 2)
+        return 1 / (1 + 10 ** (-g * (red_avg - blue_avg) / 400))
+    return 1 / (1 + 10 ** ((blue_avg - red_avg) / 400))
+
+
+def rating_uncertainty(games_played: int, rating_deviation: Optional[float] = None) -> float:
+    """Rating deviation for a player - the stored value if there is one, else from games played"""
+    if rating_deviation is not None:
+        return max(RATING_DEVIATION_MIN, rating_deviation)
+    return max(RATING_DEVIATION_MIN, RATING_DEVIATION_NEW / math.sqrt(1 + max(0, games_played or 0)))
+
+
+def shrink_ratings(player_ids: List, elos: Dict, sigmas: Dict) -> Tuple[List[float], List[float]]:
+    """Posterior-mean ratings and variances for a pool
+
+    An uncertain rating is pulled toward the pool average (a 0-game 1600 is probably not
+    a proven 1600), while a veteran's rating barely moves.
+    """
+    values = [elos[uid] for uid in player_ids]
+    pool_mean = sum(values) / len(values)
+    prior = RATING_PRIOR_SPREAD ** 2
+    shrunk = []
+    variances = []
+    for uid, elo in zip(player_ids, values):
+        variance = sigmas[uid] ** 2
+        weight = prior / (prior + variance)
+        shrunk.append(pool_mean + weight * (elo - pool_mean))
+        variances.append(variance * weight)  # Posterior variance
+    return shrunk, variances
+
+
+def expected_abs_difference(mean: float, variance: float) -> float:
+    """E|X| for X ~ Normal(mean, variance) - expected team-total gap under rating uncertainty"""
+    if variance <= 0:
+        return abs(mean)
+    sd = math.sqrt(variance)
+    z = mean / sd
+    return sd * math.sqrt(2 / math.pi) * math.exp(-z * z / 2) + mean * math.erf(z / math.sqrt(2))
+
+
+def pair_key(a, b) -> Tuple[str, str]:
+    """Order-independent key for a pair of Discord IDs"""
+    a, b = str(a), str(b)
+    return (a, b) if a < b else (b, a)
+
+
+class TeammateHistory:
+    """Recency-weighted count of how often each pair of players shared a team (per server)
+
+    Weights are stored as of the PUG that last touched the pair and decayed lazily,
+    so recording a PUG only touches the pairs on its two teams. Decay counts the
+    server's own PUGs (a per-server sequence), not global PUG ids, so busy servers
+    sharing the database don't age another server's history.
+    """
+
+    def __init__(self, half_life: int = TEAMMATE_HALF_LIFE):
+        self.decay = 0.5 ** (1 / half_life)
+        self.pairs = {}  # {server_id: {(a, b): [weight, last_pug_id, last_seq]}}
+        self.latest_pug = {}  # {server_id: last pug_id recorded}
+        self.sequence = {}  # {server_id: PUGs recorded so far}
+
+    def is_loaded(self, server_id: str) -> bool:
+        return str(server_id) in self.pairs
+
+    def load(self, server_id: str, rows: Iterable[Tuple[str, str, float, int, int]]):
+        """Load persisted (player_a, player_b, weight, last_pug_id, last_seq) rows for a server"""
+        server_id = str(server_id)
+        pairs = {}
+        latest = 0
+        sequence = 0
+        for player_a, player_b, weight, last_pug_id, last_seq in rows:
+            pairs[pair_key(player_a, player_b)] = [weight, last_pug_id, last_seq]
+            latest = max(latest, last_pug_id)
+            sequence = max(sequence, last_seq)
+        self.pairs[server_id] = pairs
+        self.latest_pug[server_id] = latest
+        self.sequence[server_id] = sequence
+
+    def record_pug(self, server_id: str, pug_id: int, red_team: List, blue_team: List) -> List[Tuple]:
+        """Fold one PUG's teams into the matrix (a PUG already counted is skipped)
+        Returns the changed (player_a, player_b, weight, last_pug_id, last_seq) rows for persistence"""
+        server_id = str(server_id)
+        if pug_id <= self.latest_pug.get(server_id, 0):
+            return []
+        pairs = self.pairs.setdefault(server_id, {})
+        seq = self.sequence.get(server_id, 0) + 1
+        changed = []
+        for team in (red_team, blue_team):
+            for a, b in combinations(team, 2):
+                key = pair_key(a, b)
+                entry = pairs.get(key)
+                if entry:
+                    # Decay the old weight forward to this PUG, then count this appearance
+                    entry[0] = entry[0] * self.decay ** max(0, seq - entry[2]) + 1
+                    entry[1] = pug_id
+                    entry[2] = seq
+                else:
+                    entry = pairs[key] = [1.0, pug_id, seq]
+                changed.append((key[0], key[1], entry[0], entry[1], entry[2]))
+        self.latest_pug[server_id] = pug_id
+        self.sequence[server_id] = seq
+        return changed
+
+    def weight(self, server_id: str, a, b, as_of: Optional[int] = None) -> float:
+        """Decayed co-play weight for a pair as of a server sequence number (defaults to the latest PUG)"""
+        server_id = str(server_id)
+        entry = self.pairs.get(server_id, {}).get(pair_key(a, b))
+        if not entry:
+            return 0.0
+        if as_of is None:
+            as_of = self.sequence.get(server_id, entry[2])
+        return entry[0] * self.decay ** max(0, as_of - entry[2])
+
+    def weight_matrix(self, server_id: str, player_ids: List) -> Optional[List[List[float]]]:
+        """Symmetric matrix of pair weights for the given players (None if no pair has history)"""
+        n = len(player_ids)
+        matrix = [[0.0] * n for _ in range(n)]
+        any_history = False
+        for i in range(n):
+            for j in range(i + 1, n):
+                w = self.weight(server_id, player_ids[i], player_ids[j])
+                if w:
+                    matrix[i][j] = matrix[j][i] = w
+                    any_history = True
+        return matrix if any_history else None
+
+
+def repeat_penalty(indices: Iterable[int], pair_weights: Optional[List[List[float]]]) -> float:
+    """Sum of co-play weights for every pair inside one team"""
+    if not pair_weights:
+        return 0.0
+    indices = list(indices)
+    return sum(pair_weights[i][j] for i, j in combinations(indices, 2))
+
+
+def score_split(values: List[float], red_idx: List[int], blue_idx: List[int],
+                pair_weights: Optional[List[List[float]]] = None,
+                repeat_weight: float = TEAMMATE_REPEAT_PENALTY,
+                variances: Optional[List[float]] = None) -> Tuple[Tuple[float, float, float], float, float]:
+    """Score one red/blue split of player indexes (lower is better)
+
+    Criteria (in order):
+    1. Minimize cost = ELO total difference + repeat_weight * teammate repeat penalty
+    2. Minimize win probability difference
+    3. Minimize variance (tie-breaker for same cost)
+
+    With rating variances, the ELO total difference becomes the expected difference under
+    that uncertainty (closed form, normal ratings) plus a term for uneven team uncertainty.
+
+    Returns (sort key, ELO total difference, repeat penalty).
+    """
+    red_total = sum(values[i] for i in red_idx)
+    blue_total = sum(values[i] for i in blue_idx)
+    diff = abs(red_total - blue_total)
+
+    penalty = 0.0
+    if pair_weights:
+        penalty = repeat_penalty(red_idx, pair_weights) + repeat_penalty(blue_idx, pair_weights)
+
+    red_avg = red_total / len(red_idx)
+    blue_avg = blue_total / len(blue_idx)
+
+    if variances:
+        red_uncertainty = sum(variances[i] for i in red_idx)
+        blue_uncertainty = sum(variances[i] for i in blue_idx)
+        imbalance = expected_abs_difference(red_total - blue_total, red_uncertainty + blue_uncertainty)
+        imbalance += UNCERTAINTY_BALANCE_WEIGHT * abs(math.sqrt(red_uncertainty) - math.sqrt(blue_uncertainty))
+        avg_variance = red_uncertainty / len(red_idx) ** 2 + blue_uncertainty / len(blue_idx) ** 2
+        win_prob_diff = abs(win_probability(red_avg, blue_avg, avg_variance) - 0.5)
+    else:
+        imbalance = diff
+        win_prob_diff = abs(win_probability(red_avg, blue_avg) - 0.5)
+
+    # Variance - how spread out are skills within each team
+    red_var = sum((values[i] - red_avg) ** 2 for i in red_idx) / len(red_idx)
+    blue_var = sum((values[i] - blue_avg) ** 2 for i in blue_idx) / len(blue_idx)
+    return (imbalance + repeat_weight * penalty, win_prob_diff, red_var + blue_var), diff, penalty
+
+
+def _split_values(player_ids: List, elos: Dict, sigmas: Optional[Dict]) -> Tuple[List[float], Optional[List[float]]]:
+    """Ratings the balancer works with: raw ELOs, or shrunk ELOs plus variances when sigmas are known"""
+    if sigmas:
+        return shrink_ratings(player_ids, elos, sigmas)
+    return [elos[uid] for uid in player_ids], None
+
+
+def _split_result(player_ids: List, elos: Dict, red_idx, blue_idx, key, penalty) -> Dict:
+    red = [player_ids[i] for i in red_idx]
+    blue = [player_ids[i] for i in blue_idx]
+    return {
+        'red': red,
+        'blue': blue,
+        'elo_diff': abs(sum(elos[uid] for uid in red) - sum(elos[uid] for uid in blue)),
+        'repeat_penalty': penalty,
+        'cost': key[0],
+        'win_prob_diff': key[1],
+        'variance': key[2]
+    }
+
+
+def _split_key(split: Dict) -> Tuple[float, float, float]:
+    """The score_split key of a split result (lower is better)"""
+    return split['cost'], split['win_prob_diff'], split['variance']
+
+
+def find_balanced_split(player_ids: List, elos: Dict, pair_weights: Optional[List[List[float]]] = None,
+                        repeat_weight: float = TEAMMATE_REPEAT_PENALTY,
+                        sigmas: Optional[Dict] = None) -> Optional[Dict]:
+    """Find the most balanced red/blue split of a full queue by trying every combination
+
+    pair_weights is an optional matrix indexed like player_ids (see TeammateHistory.weight_matrix).
+    sigmas is an optional {player: rating deviation} (see rating_uncertainty).
+    Returns a dict with the red/blue teams and their scores, or None if the split is impossible.
+    """
+    n = len(player_ids)
+    if n < 2 or n % 2 != 0:
+        return None
+    values, variances = _split_values(player_ids, elos, sigmas)
+    everyone = set(range(n))
+
+    best = None
+    best_key = None
+
+    # Try all possible combinations of players for red team
+    for red_idx in combinations(range(n), n // 2):
+        blue_idx = sorted(everyone.difference(red_idx))
+        key, diff, penalty = score_split(values, red_idx, blue_idx, pair_weights, repeat_weight, variances)
+
+        if best_key is None or key < best_key:
+            best_key = key
+            best = (red_idx, blue_idx, penalty)
+
+            # Early termination: perfect balance and no repeat pairs
+            if key[0] == 0 and key[1] < 0.01:
+                break
+
+    return _split_result(player_ids, elos, best[0], best[1], best_key, best[2])
+
+
+def branch_and_bound_split(player_ids: List, elos: Dict, pair_weights: Optional[List[List[float]]] = None,
+                           repeat_weight: float = TEAMMATE_REPEAT_PENALTY,
+                           red_fixed: Iterable = (), blue_fixed: Iterable = (),
+                           sigmas: Optional[Dict] = None, max_nodes: Optional[int] = None) -> Optional[Dict]:
+    """Best split with the same scoring as find_balanced_split, found by branch-and-bound
+
+    Players in red_fixed/blue_fixed are already on a team (e.g. captains and drafted players);
+    the rest are assigned highest ELO first, and a branch is dropped as soon as the smallest
+    ELO difference it could still reach is worse than the best complete split so far.
+    Under uncertainty the total variance is the same for every split, so the bound is the
+    expected difference at the smallest reachable gap of the means.
+    With max_nodes the search stops after visiting that many branches and returns the best
+    split found so far; 'complete' in the result says whether the search finished.
+    """
+    n = len(player_ids)
+    if n < 2 or n % 2 != 0:
+        return None
+    size = n // 2
+    values, variances = _split_values(player_ids, elos, sigmas)
+    index = {uid: i for i, uid in enumerate(player_ids)}
+    red = [index[uid] for uid in red_fixed]
+    blue = [index[uid] for uid in blue_fixed]
+    if len(red) > size or len(blue) > size:
+        return None
+
+    taken = set(red) | set(blue)
+    free = sorted((i for i in range(n) if i not in taken), key=lambda i: -values[i])
+    m = len(free)
+
+    # prefix[k] = sum of the k highest free ELOs, used for the reachable-difference bound
+    prefix = [0.0]
+    for i in free:
+        prefix.append(prefix[-1] + values[i])
+
+    # Total variance is split-independent; floor = the best score any split could reach
+    total_variance = sum(variances) if variances else 0.0
+    floor = expected_abs_difference(0.0, total_variance)
+
+    best = {'key': None, 'red': None, 'blue': None, 'penalty': 0, 'nodes': 0}
+
+    def join_penalty(team, i):
+        if not pair_weights:
+            return 0.0
+        row = pair_weights[i]
+        return sum(row[j] for j in team)
+
+    def search(p, red_sum, blue_sum, penalty):
+        if best['key'] is not None and best['key'][0] <= floor and best['key'][1] < 0.01:
+            return  # Perfect balance and no repeat pairs - nothing can beat it
+        best['nodes'] += 1
+        if max_nodes is not None and best['nodes'] > max_nodes and best['key'] is not None:
+            return  # Out of budget - keep the best split so far
+        red_need = size - len(red)
+        blue_need = size - len(blue)
+
+        if p == m:
+            key, diff, split_penalty = score_split(values, red, blue, pair_weights, repeat_weight, variances)
+            if best['key'] is None or key < best['key']:
+                best.update(key=key, red=list(red), blue=list(blue), penalty=split_penalty)
+            return
+
+        if best['key'] is not None:
+            # Red's share of the remaining pool lies between its red_need lowest and highest ELOs
+            remaining = prefix[m] - prefix[p]
+            low = prefix[m] - prefix[m - red_need] if red_need else 0.0
+            high = prefix[p + red_need] - prefix[p]
+            base = red_sum - blue_sum - remaining
+            lo, hi = base + 2 * low, base + 2 * high
+            reachable = 0.0 if lo <= 0 <= hi else min(abs(lo), abs(hi))
+            bound = expected_abs_difference(reachable, total_variance)
+            if bound + repeat_weight * penalty > best['key'][0]:
+                return
+
+        i = free[p]
+        # Try the lighter team first so a good split is found early
+        order = ('red', 'blue') if red_sum <= blue_sum else ('blue', 'red')
+        for team in order:
+            if team == 'red' and red_need:
+                extra = join_penalty(red, i)
+                red.append(i)
+                search(p + 1, red_sum + values[i], blue_sum, penalty + extra)
+                red.pop()
+            elif team == 'blue' and blue_need:
+                extra = join_penalty(blue, i)
+                blue.append(i)
+                search(p + 1, red_sum, blue_sum + values[i], penalty + extra)
+                blue.pop()
+            if not red and not blue:
+                break  # Nothing fixed: red/blue are interchangeable, so the first player stays red
+
+    start_red = sum(values[i] for i in red)
+    start_blue = sum(values[i] for i in blue)
+    start_penalty = repeat_penalty(red, pair_weights) + repeat_penalty(blue, pair_weights)
+    search(0, start_red, start_blue, start_penalty)
+
+    if best['key'] is None:
+        return None
+    result = _split_result(player_ids, elos, sorted(best['red']), sorted(best['blue']),
+                           best['key'], best['penalty'])
+    result['complete'] = max_nodes is None or best['nodes'] <= max_nodes
+    return result
+
+
+# Balancing engines selectable by name (same inputs, same scoring)
+BALANCE_ENGINES = {
+    'exhaustive': find_balanced_split,
+    'branch_bound': branch_and_bound_split
+}
+
+
+def snake_pick_turn(picks_made: int) -> str:
+    """Team that makes the next pick after captains, given how many picks were made
+
+    Snake draft pattern: RED → BLUE → BLUE → RED → RED → BLUE → BLUE...
+    """
+    if picks_made == 0:
+        return 'red'
+    if picks_made == 1:
+        return 'blue'
+    return 'blue' if (picks_made - 1) % 4 in (0, 1) else 'red'
+
+
+def snake_pick_order(red_count: int, blue_count: int, team_size: int, picks_made: int) -> List[str]:
+    """Teams for every remaining pick, following the snake order and skipping full teams"""
+    per_team = team_size // 2
+    order = []
+    while red_count + blue_count < team_size:
+        team = snake_pick_turn(picks_made)
+        if team == 'red' and red_count >= per_team:
+            team = 'blue'
+        elif team == 'blue' and blue_count >= per_team:
+            team = 'red'
+        order.append(team)
+        if team == 'red':
+            red_count += 1
+        else:
+            blue_count += 1
+        picks_made += 1
+    return order
+
+
+class DraftEvaluator:
+    """Live outlook for a captain draft
+
+    ELOs, rating deviations and teammate weights are captured once when picking starts (no
+    database calls per pick). The best split is kept between picks: while the captains pick
+    along it, it is still the best and is reused; otherwise the bounded search re-runs over the
+    players still available, capped at LIVE_SEARCH_MAX_NODES. Run evaluate in a worker thread.
+    """
+
+    def __init__(self, player_ids: List, elos: Dict, pair_weights: Optional[List[List[float]]] = None,
+                 repeat_weight: float = TEAMMATE_REPEAT_PENALTY, sigmas: Optional[Dict] = None):
+        self.player_ids = list(player_ids)
+        self.elos = dict(elos)
+        self.pair_weights = pair_weights
+        self.repeat_weight = repeat_weight
+        self.sigmas = dict(sigmas) if sigmas else None
+        self.team_size = len(self.player_ids)
+        self.best = None
+
+    def _outlook(self, red_team: List, blue_team: List) -> Tuple[float, float]:
+        """(average ELO gap, red win probability) for complete teams"""
+        per_team = self.team_size // 2
+        red_avg = sum(self.elos[uid] for uid in red_team) / per_team
+        blue_avg = sum(self.elos[uid] for uid in blue_team) / per_team
+        variance = 0.0
+        if self.sigmas:
+            variance = sum(self.sigmas[uid] ** 2 for uid in list(red_team) + list(blue_team)) / per_team ** 2
+        return abs(red_avg - blue_avg), win_probability(red_avg, blue_avg, variance)
+
+    def evaluate(self, red_team: List, blue_team: List, picks_made: int) -> Optional[Dict]:
+        """Best achievable balance and projected outcome for the current draft state
+
+        best_*: the most balanced teams the captains can still end up with
+        projected_*: where the draft lands if each captain keeps taking the highest ELO left
+        """
+        if any(uid not in self.elos for uid in list(red_team) + list(blue_team)):
+            return None  # Roster changed since picking started (e.g. a sub)
+        best = self.best
+        # Picks only narrow the choice, so a finished search's split stays the best while it fits them
+        fits = best is not None and set(red_team) <= set(best['red']) and set(blue_team) <= set(best['blue'])
+        if not fits or not best['complete']:
+            found = branch_and_bound_split(self.player_ids, self.elos, self.pair_weights, self.repeat_weight,
+                                           red_fixed=red_team, blue_fixed=blue_team, sigmas=self.sigmas,
+                                           max_nodes=LIVE_SEARCH_MAX_NODES)
+            if found is None:
+                return None
+            # A capped search can miss a split an earlier one found - keep the better of the two
+            if not fits or _split_key(found) <= _split_key(best):
+                best = found
+            self.best = best
+        best_avg_diff, best_red_win_prob = self._outlook(best['red'], best['blue'])
+
+        # Greedy projection along the snake order
+        taken = set(red_team) | set(blue_team)
+        available = sorted((uid for uid in self.player_ids if uid not in taken),
+                           key=lambda uid: self.elos[uid], reverse=True)
+        projected_red = list(red_team)
+        projected_blue = list(blue_team)
+        for team, uid in zip(snake_pick_order(len(red_team), len(blue_team), self.team_size, picks_made), available):
+            (projected_red if team == 'red' else projected_blue).append(uid)
+        projected_avg_diff, projected_red_win_prob = self._outlook(projected_red, projected_blue)
+
+        return {
+            'best_red': best['red'],
+            'best_blue': best['blue'],
+            'best_avg_diff': best_avg_diff,
+            'best_red_win_prob': best_red_win_prob,
+            'projected_red': projected_red,
+            'projected_blue': projected_blue,
+            'projected_avg_diff': projected_avg_diff,
+            'projected_red_win_prob': projected_red_win_prob
+        }
+
+
+def _assign_players(pools: Dict[str, List], sizes: Dict[str, int]) -> Optional[Dict[str, List]]:
+    """Fill every queue in pools with exactly sizes[queue] distinct players
+
+    Min-cost max-flow (source → queue → player → sink) where each edge costs the player's
+    position in that queue, so earlier joiners keep their spots whenever the fill is possible.
+    Returns {queue_key: [players]} or None if the queues cannot all be filled at once.
+    """
+    queue_keys = list(pools)
+    players = []
+    player_node = {}
+    for key in queue_keys:
+        for uid in pools[key]:
+            if uid not in player_node:
+                player_node[uid] = len(players)
+                players.append(uid)
+
+    # Nodes: 0 = source, 1..Q = queues, Q+1..Q+P = players, last = sink
+    q_count, p_count = len(queue_keys), len(players)
+    sink = q_count + p_count + 1
+    graph = [[] for _ in range(sink + 1)]  # edge = [to, capacity, cost, reverse index]
+
+    def add_edge(u, v, capacity, cost):
+        graph[u].append([v, capacity, cost, len(graph[v])])
+        graph[v].append([u, 0, -cost, len(graph[u]) - 1])
+
+    for qi, key in enumerate(queue_keys):
+        add_edge(0, 1 + qi, sizes[key], 0)
+        for position, uid in enumerate(pools[key]):
+            add_edge(1 + qi, 1 + q_count + player_node[uid], 1, position)
+    for pi in range(p_count):
+        add_edge(1 + q_count + pi, sink, 1, 0)
+
+    needed = sum(sizes[key] for key in queue_keys)
+    flow = 0
+    while flow < needed:
+        # Bellman-Ford shortest augmenting path (graphs here are a few dozen nodes)
+        dist = [float('inf')] * (sink + 1)
+        parent = [None] * (sink + 1)
+        dist[0] = 0
+        updated = True
+        while updated:
+            updated = False
+            for u in range(sink + 1):
+                if dist[u] == float('inf'):
+                    continue
+                for ei, (v, capacity, cost, _) in enumerate(graph[u]):
+                    if capacity > 0 and dist[u] + cost < dist[v]:
+                        dist[v] = dist[u] + cost
+                        parent[v] = (u, ei)
+                        updated = True
+        if dist[sink] == float('inf'):
+            return None
+        v = sink
+        while v != 0:
+            u, ei = parent[v]
+            edge = graph[u][ei]
+            edge[1] -= 1
+            graph[v][edge[3]][1] += 1
+            v = u
+        flow += 1
+
+    assignment = {}
+    for qi, key in enumerate(queue_keys):
+        chosen = {players[v - 1 - q_count] for v, capacity, cost, _ in graph[1 + qi]
+                  if 1 + q_count <= v < sink and capacity == 0}
+        assignment[key] = [uid for uid in pools[key] if uid in chosen]
+    return assignment
+
+
+def plan_channel_matches(pools: Dict[str, List], sizes: Dict[str, int], elos: Optional[Dict] = None,
+                         sigmas: Optional[Dict] = None) -> Dict:
+    """Choose which queues in a channel to launch together when their players overlap
+
+    pools: {queue_key: eligible players in join order (queue first, then waiting list)}
+    sizes: {queue_key: players needed to launch}
+
+    Picks the set of queues that starts the most matches (then seats the most players,
+    then has the best combined autopick balance) and returns
+    {'launch': {queue_key: [players]}, 'matches': int, 'balance_cost': float}.
+    Each distinct roster is balanced once (capped at LIVE_SEARCH_MAX_NODES), however many
+    subsets it appears in. Run it in a worker thread.
+    """
+    candidates = [key for key in pools if len(pools[key]) >= sizes[key]]
+    best = {'launch': {}, 'matches': 0, 'balance_cost': 0.0}
+    best_rank = (0, 0, 0.0)
+    split_costs = {}  # {frozenset(roster): average ELO gap of its best split}
+
+    def roster_cost(team):
+        roster = frozenset(team)
+        if roster not in split_costs:
+            split = branch_and_bound_split(team, elos, sigmas=sigmas, max_nodes=LIVE_SEARCH_MAX_NODES)
+            split_costs[roster] = split['elo_diff'] / (len(team) // 2) if split else 0.0
+        return split_costs[roster]
+
+    # Channels only run a handful of modes, so every subset can be checked
+    for count in range(len(candidates), 0, -1):
+        if count < best['matches']:
+            break
+        for chosen in combinations(candidates, count):
+            assignment = _assign_players({key: pools[key] for key in chosen},
+                                         {key: sizes[key] for key in chosen})
+            if assignment is None:
+                continue
+            balance_cost = 0.0
+            if elos:
+                balance_cost = sum(roster_cost(team) for team in assignment.values())
+            seated = sum(sizes[key] for key in chosen)
+            rank = (count, seated, -balance_cost)
+            if not best['launch'] or rank > best_rank:
+                best_rank = rank
+                best = {'launch': assignment, 'matches': count, 'balance_cost': balance_cost}
+    return best
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+PUG Pro Discord Bot - Balancer Benchmark
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Runs the autopick balancing engines against synthetic ELO pools (and real pools from an
+.exportstats CSV) without Discord, and compares the results with a stored baseline.
+
+Usage:
+    python benchmark_balancer.py                                  # all engines vs baseline
+    python benchmark_balancer.py --engines branch_bound --against exhaustive
+    python benchmark_balancer.py --csv pug_stats_MyServer.csv     # add a real ELO pool
+    python benchmark_balancer.py --save-baseline                  # record a new baseline
+    python benchmark_balancer.py --check-time                     # also fail on slowdowns
+    python benchmark_balancer.py --full                           # add the slow large cases
+
+Exits with status 1 if any engine produces less balanced teams or uses more memory
+(beyond --memory-tolerance) than the baseline for the same pool. Timings are kept in
+units of a fixed calibration loop run on the same host, so a baseline recorded on one
+machine still means something on another; they are only checked with --check-time.
+A default run covers queues up to 20 players and runs the exhaustive engine up to 12, so it
+finishes in well under a minute; --full adds 22-24 players and exhaustive runs up to 16
+(several minutes). The stored baseline should be recorded with --full so both can use it.
+Each pool is balanced with plain ELOs, with rating deviations and with teammate history,
+so every scoring path is covered. The baseline records --trials and --seed, and a run with
+different ones is refused (the pools would differ).
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from itertools import combinations
+from typing import Optional, List, Dict
+
+from balancer import BALANCE_ENGINES, rating_uncertainty
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_SIZES = list(range(4, 22, 2))
+FULL_SIZES = list(range(4, 26, 2))
+
+# Trying every combination past this size is slow, so it is skipped (--full raises the limit)
+EXHAUSTIVE_MAX_SIZE = 12
+FULL_EXHAUSTIVE_MAX_SIZE = 16
+
+# Balance differences smaller than this are float noise, not a regression
+QUALITY_EPSILON = 1e-6
+
+
+# ============================================================================
+# ELO pools
+# ============================================================================
+
+def uniform_pool(rng: random.Random, n: int) -> List[float]:
+    return [rng.uniform(600, 1600) for _ in range(n)]
+
+
+def bimodal_pool(rng: random.Random, n: int) -> List[float]:
+    """Two skill clusters, e.g. new players and veterans"""
+    return [rng.gauss(800, 80) if rng.random() < 0.5 else rng.gauss(1400, 80) for _ in range(n)]
+
+
+def long_tail_pool(rng: random.Random, n: int) -> List[float]:
+    """Most players near the starting ELO with a few far above"""
+    return [700 + rng.lognormvariate(5.5, 0.6) for _ in range(n)]
+
+
+def load_csv_elos(path: str) -> List[float]:
+    """Read the ELO column from an .exportstats CSV (plain or .gz)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='', encoding='utf-8') as f:
+        return [float(row['ELO']) for row in csv.DictReader(f) if row.get('ELO')]
+
+
+def build_pools(csv_elos: Optional[List[float]], sizes: List[int], trials: int, seed: int) -> Dict[str, Dict[int, List[List[float]]]]:
+    """{distribution: {size: [pool per trial]}} - seeded so every run sees the same pools
+
+    The pools depend on trials as well as seed (trials are drawn one after another), so a
+    baseline only applies to runs with the same --trials and --seed.
+    """
+    generators = {
+        'uniform': uniform_pool,
+        'bimodal': bimodal_pool,
+        'long_tail': long_tail_pool
+    }
+    # One seed per distribution and size, so a subset of --sizes still matches the baseline
+    pools = {}
+    for name, generator in generators.items():
+        pools[name] = {}
+        for n in sizes:
+            rng = random.Random(f"{seed}-{name}-{n}")
+            pools[name][n] = [generator(rng, n) for _ in range(trials)]
+    if csv_elos:
+        pools['csv'] = {}
+        for n in sizes:
+            if n <= len(csv_elos):
+                rng = random.Random(f"{seed}-csv-{n}")
+                pools['csv'][n] = [rng.sample(csv_elos, n) for _ in range(trials)]
+    return pools
+
+
+# ============================================================================
+# Scoring inputs
+# ============================================================================
+
+def no_extras(rng: random.Random, n: int) -> Dict:
+    """Plain ELO balancing"""
+    return {}
+
+
+def uncertain_extras(rng: random.Random, n: int) -> Dict:
+    """Rating deviations for a mix of new players and regulars (shrunk ratings + variance term)"""
+    return {'sigmas': {i: rating_uncertainty(rng.choice([0, 1, 3, 10, 30, 100])) for i in range(n)}}
+
+
+def pairs_extras(rng: random.Random, n: int) -> Dict:
+    """Teammate history: about a third of the pairs have played together recently (repeat penalty)"""
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            if rng.random() < 0.3:
+                matrix[i][j] = matrix[j][i] = rng.uniform(0.1, 1.0)
+    return {'pair_weights': matrix}
+
+
+# Case suffix -> extra engine arguments, so every scoring path is benchmarked
+SCORINGS = {
+    '': no_extras,
+    'uncertain': uncertain_extras,
+    'pairs': pairs_extras
+}
+
+
+def build_cases(pools: Dict[str, Dict[int, List[List[float]]]], seed: int) -> Dict[str, Dict]:
+    """{case: {'size': n, 'trials': [(pool, engine kwargs)]}} for every pool and scoring
+
+    case is '<distribution>/<size>' for plain ELOs and '<distribution>/<size>/<scoring>' otherwise.
+    """
+    cases = {}
+    for distribution, by_size in pools.items():
+        for n, trial_pools in by_size.items():
+            for scoring, extras in SCORINGS.items():
+                rng = random.Random(f"{seed}-{distribution}-{n}-{scoring}")
+                case = f"{distribution}/{n}/{scoring}" if scoring else f"{distribution}/{n}"
+                cases[case] = {'size': n, 'trials': [(values, extras(rng, n)) for values in trial_pools]}
+    return cases
+
+
+# ============================================================================
+# Measurement
+# ============================================================================
+
+def calibrate(rounds: int = 5) -> float:
+    """Seconds this host takes for a fixed pure-Python loop (best of a few runs) - the unit for timings"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        total = 0.0
+        for combo in combinations(range(22), 6):
+            total += sum(combo) * 0.5
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(engine_name: str, trials: List) -> Dict:
+    """Average wall time, peak memory and balance quality of one engine over some (pool, kwargs) trials"""
+    engine = BALANCE_ENGINES[engine_name]
+    wall_times = []
+    peak_memory = 0
+    elo_diffs = []
+    win_prob_diffs = []
+
+    for values, extras in trials:
+        player_ids = list(range(len(values)))
+        elos = dict(zip(player_ids, values))
+
+        start = time.perf_counter()
+        result = engine(player_ids, elos, **extras)
+        wall_times.append(time.perf_counter() - start)
+
+        # Separate run so tracing overhead doesn't skew the timing (first pool only - it is slow)
+        if not elo_diffs:
+            tracemalloc.start()
+            engine(player_ids, elos, **extras)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        # Average-ELO difference between the teams (what players see)
+        elo_diffs.append(result['elo_diff'] / (len(values) // 2))
+        win_prob_diffs.append(result['win_prob_diff'])
+
+    return {
+        'wall_time': sum(wall_times) / len(wall_times),
+        'peak_memory': peak_memory,
+        'elo_diff': sum(elo_diffs) / len(elo_diffs),
+        'win_prob_diff': sum(win_prob_diffs) / len(win_prob_diffs)
+    }
+
+
+def run_benchmark(engines: List[str], cases: Dict, unit: float, exhaustive_max: int = EXHAUSTIVE_MAX_SIZE) -> Dict:
+    """{case: {engine: metrics}} for the cases from build_cases
+
+    relative_time is wall_time in calibration units (see calibrate)
+    """
+    results = {}
+    for case, spec in cases.items():
+        results[case] = {}
+        for engine_name in engines:
+            if engine_name == 'exhaustive' and spec['size'] > exhaustive_max:
+                continue
+            metrics = measure(engine_name, spec['trials'])
+            metrics['relative_time'] = metrics['wall_time'] / unit
+            results[case][engine_name] = metrics
+            print(f"{case:<26} {engine_name:<13} {metrics['wall_time']*1000:>10.2f} ms "
+                  f"{metrics['peak_memory']/1024:>9.1f} KiB  ELO diff {metrics['elo_diff']:>8.3f}  "
+                  f"win% diff {metrics['win_prob_diff']*100:>6.3f}")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, against: Optional[str], memory_tolerance: float,
+            time_tolerance: Optional[float] = None) -> List[str]:
+    """List of regressions against the baseline (empty if none) - timings only if time_tolerance is given"""
+    failures = []
+    for case, by_engine in results.items():
+        for engine_name, metrics in by_engine.items():
+            reference = baseline.get(case, {}).get(against or engine_name)
+            if not reference:
+                continue
+            label = f"{case} {engine_name} vs baseline {against or engine_name}"
+            if metrics['elo_diff'] > reference['elo_diff'] + QUALITY_EPSILON:
+                failures.append(f"{label}: ELO diff {metrics['elo_diff']:.3f} > {reference['elo_diff']:.3f}")
+            if metrics['win_prob_diff'] > reference['win_prob_diff'] + QUALITY_EPSILON:
+                failures.append(f"{label}: win% diff {metrics['win_prob_diff']*100:.3f} > {reference['win_prob_diff']*100:.3f}")
+            if metrics['peak_memory'] > reference['peak_memory'] * (1 + memory_tolerance):
+                failures.append(f"{label}: peak memory {metrics['peak_memory']/1024:.1f} KiB > "
+                                f"{reference['peak_memory']/1024:.1f} KiB")
+            if time_tolerance is not None and metrics['relative_time'] > reference['relative_time'] * (1 + time_tolerance):
+                failures.append(f"{label}: {metrics['relative_time']:.3f} > {reference['relative_time']:.3f} "
+                                f"calibration units ({metrics['wall_time']*1000:.2f} ms here)")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the autopick balancing engines")
+    parser.add_argument('--engines', default=','.join(BALANCE_ENGINES),
+                        help="Comma-separated engines to run (default: all)")
+    parser.add_argument('--sizes', help="Comma-separated queue sizes (even numbers, default 4-20, 4-24 with --full)")
+    parser.add_argument('--full', action='store_true',
+                        help=f"Also run 22-24 players and the exhaustive engine up to {FULL_EXHAUSTIVE_MAX_SIZE} (slow)")
+    parser.add_argument('--trials', type=int, default=5, help="Pools per distribution and size")
+    parser.add_argument('--seed', type=int, default=2004)
+    parser.add_argument('--csv', help="ELO pool from an .exportstats CSV (.csv or .csv.gz)")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--against', help="Compare every engine with this baseline engine (default: itself)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.5,
+                        help="Allowed peak memory growth before failing, as a fraction (default 0.5 = 50%%)")
+    parser.add_argument('--check-time', action='store_true',
+                        help="Also fail on slowdowns (timings are noisy on shared machines)")
+    parser.add_argument('--time-tolerance', type=float, default=0.5,
+                        help="Allowed slowdown with --check-time, as a fraction (default 0.5 = 50%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="Write these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    unknown = [e for e in engines if e not in BALANCE_ENGINES]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)} (available: {', '.join(BALANCE_ENGINES)})")
+    if args.sizes:
+        sizes = [int(n) for n in args.sizes.split(',')]
+    else:
+        sizes = FULL_SIZES if args.full else DEFAULT_SIZES
+    exhaustive_max = FULL_EXHAUSTIVE_MAX_SIZE if args.full else EXHAUSTIVE_MAX_SIZE
+    if any(n < 2 or n % 2 for n in sizes):
+        parser.error("sizes must be even numbers of at least 2")
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if 'cases' not in baseline or 'trials' not in baseline:
+            print(f"⚠️ {args.baseline} predates calibrated timings and recorded settings - "
+                  f"run with --save-baseline to update it")
+            return 1
+        # Different trials or seed means different pools, so the averages can't be compared
+        if (baseline['trials'], baseline['seed']) != (args.trials, args.seed):
+            print(f"❌ {args.baseline} was recorded with --trials {baseline['trials']} --seed {baseline['seed']} - "
+                  f"run with those settings or record a new baseline")
+            return 1
+
+    csv_elos = load_csv_elos(args.csv) if args.csv else None
+    cases = build_cases(build_pools(csv_elos, sizes, args.trials, args.seed), args.seed)
+    unit = calibrate()
+    print(f"Calibration loop: {unit*1000:.2f} ms")
+    results = run_benchmark(engines, cases, unit, exhaustive_max)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'calibration': unit, 'trials': args.trials, 'seed': args.seed, 'sizes': sizes,
+                       'cases': results}, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"⚠️ No baseline at {args.baseline} - run with --save-baseline first")
+        return 0
+
+    missing = [case for case in results if case not in baseline['cases']]
+    if missing:
+        print(f"⚠️ {len(missing)} case(s) not in the baseline (sizes {baseline['sizes']}), not compared: "
+              f"{', '.join(missing)}")
+    failures = compare(results, baseline['cases'], args.against, args.memory_tolerance,
+                       args.time_tolerance if args.check_time else None)
+    if failures:
+        print(f"❌ {len(failures)} regression(s):")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,8 +10,9 @@ Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
 Any questions? Please message fallacy on Discord.
 """
 
+import math
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Tuple
 import json
 
@@ -150,6 +151,25 @@ class DatabaseManager:
             conn.commit()
             print("✅ Added best_loss_streak column")
         
+        # Migration: Add rating_deviation column if it doesn't exist
+        # NULL = derive rating uncertainty from games played (see balancer.rating_uncertainty)
+        try:
+            cursor.execute("SELECT rating_deviation FROM players LIMIT 1")
+        except:
+            print("⚠️  Adding rating_deviation column to players table...")
+            cursor.execute("ALTER TABLE players ADD COLUMN rating_deviation REAL")
+            conn.commit()
+            print("✅ Added rating_deviation column")
+        
+        # Migration: Add rating_volatility column if it doesn't exist (Glicko-2 engine only)
+        try:
+            cursor.execute("SELECT rating_volatility FROM players LIMIT 1")
+        except:
+            print("⚠️  Adding rating_volatility column to players table...")
+            cursor.execute("ALTER TABLE players ADD COLUMN rating_volatility REAL")
+            conn.commit()
+            print("✅ Added rating_volatility column")
+        
         # PUGs table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS pugs (
@@ -160,7 +180,8 @@ class DatabaseManager:
                 avg_blue_elo REAL,
                 status TEXT DEFAULT 'active',
                 tiebreaker_map TEXT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                settled_seq INTEGER
             )
         ''')
         
@@ -180,7 +201,28 @@ class DatabaseManager:
             cursor.execute("ALTER TABLE pugs ADD COLUMN tiebreaker_map TEXT")
             conn.commit()
             print("✅ Database migration: Added 'tiebreaker_map' column to pugs table")
-        
+
+        # Migration: Add server_id column to pugs if it doesn't exist
+        try:
+            cursor.execute("SELECT server_id FROM pugs LIMIT 1")
+        except:
+            cursor.execute("ALTER TABLE pugs ADD COLUMN server_id TEXT")
+            conn.commit()
+            print("✅ Database migration: Added 'server_id' column to pugs table")
+
+        # Migration: Add predicted_red_win column to pugs (pre-match red win probability shown to players)
+        try:
+            cursor.execute("SELECT predicted_red_win FROM pugs LIMIT 1")
+        except:
+            cursor.execute("ALTER TABLE pugs ADD COLUMN predicted_red_win REAL")
+            # Older PUGs showed the team-average ELO prediction - recompute it from the stored averages
+            cursor.execute('SELECT pug_id, avg_red_elo, avg_blue_elo FROM pugs WHERE avg_red_elo IS NOT NULL AND avg_blue_elo IS NOT NULL')
+            cursor.executemany('UPDATE pugs SET predicted_red_win = ? WHERE pug_id = ?',
+                               [(1 / (1 + 10 ** ((avg_blue - avg_red) / 400)), pug_id)
+                                for pug_id, avg_red, avg_blue in cursor.fetchall()])
+            conn.commit()
+            print("✅ Database migration: Added 'predicted_red_win' column to pugs table")
+
         # PUG teams table (many-to-many relationship)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS pug_teams (
@@ -192,6 +234,259 @@ class DatabaseManager:
                 FOREIGN KEY (discord_id) REFERENCES players (discord_id)
             )
         ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pug_teams_pug ON pug_teams (pug_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pug_teams_player ON pug_teams (discord_id)')
+
+        # Backfill pugs.server_id from the server the PUG's players are registered on
+        # (players can exist on several servers, so the most common match wins)
+        cursor.execute("SELECT COUNT(*) FROM pugs WHERE server_id IS NULL")
+        if cursor.fetchone()[0] > 0:
+            cursor.execute('''
+                UPDATE pugs
+                SET server_id = (
+                    SELECT p.server_id
+                    FROM pug_teams t
+                    JOIN players p ON p.discord_id = t.discord_id
+                    WHERE t.pug_id = pugs.pug_id
+                    GROUP BY p.server_id
+                    ORDER BY COUNT(*) DESC
+                    LIMIT 1
+                )
+                WHERE server_id IS NULL
+            ''')
+            conn.commit()
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pugs_server ON pugs (server_id, pug_id)')
+
+        # Migration: settled_seq - the order results were recorded in (per server). PUGs run side by side,
+        # so a lower-numbered PUG can finish later; replays and the rating ledger follow this order
+        try:
+            cursor.execute("SELECT settled_seq FROM pugs LIMIT 1")
+        except:
+            cursor.execute("ALTER TABLE pugs ADD COLUMN settled_seq INTEGER")
+            # Earlier results weren't ordered - PUG number order is the best guess
+            cursor.execute("UPDATE pugs SET settled_seq = pug_id WHERE winner IS NOT NULL")
+            conn.commit()
+            print("✅ Database migration: Added 'settled_seq' column to pugs table")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pugs_settled ON pugs (server_id, settled_seq)')
+
+        # Migration: Add last_pug_at / inactive columns to players (rating decay)
+        # last_pug_at is kept up to date on every result, so decay never has to scan PUG history
+        try:
+            cursor.execute("SELECT last_pug_at, inactive FROM players LIMIT 1")
+        except:
+            print("⚠️  Adding last_pug_at/inactive columns to players table...")
+            cursor.execute("ALTER TABLE players ADD COLUMN last_pug_at TEXT")
+            cursor.execute("ALTER TABLE players ADD COLUMN inactive INTEGER DEFAULT 0")
+            cursor.execute('''
+                UPDATE players SET last_pug_at = (
+                    SELECT MAX(p.timestamp)
+                    FROM pug_teams t
+                    JOIN pugs p ON p.pug_id = t.pug_id
+                    WHERE t.discord_id = players.discord_id
+                      AND p.server_id = players.server_id
+                      AND p.winner IS NOT NULL
+                )
+            ''')
+            conn.commit()
+            print("✅ Added last_pug_at/inactive columns")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_players_last_pug ON players (server_id, last_pug_at)')
+        # Streak records (.longestwin/.longestloss read the top of these)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_players_best_win ON players (server_id, best_win_streak)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_players_best_loss ON players (server_id, best_loss_streak)')
+        # Covering index for leaderboard positions (COUNT of players above an ELO)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_players_ladder ON players (server_id, elo, inactive, discord_id)')
+        
+        # Pair statistics (player_a < player_b): record together and head-to-head, kept up to date at settlement and undo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pair_stats (
+                server_id TEXT NOT NULL,
+                player_a TEXT NOT NULL,
+                player_b TEXT NOT NULL,
+                together INTEGER DEFAULT 0,
+                together_wins INTEGER DEFAULT 0,
+                together_losses INTEGER DEFAULT 0,
+                against INTEGER DEFAULT 0,
+                a_wins INTEGER DEFAULT 0,
+                b_wins INTEGER DEFAULT 0,
+                PRIMARY KEY (server_id, player_a, player_b)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pair_stats_b ON pair_stats (server_id, player_b)')
+        
+        # Prediction calibration per server/mode, bucketed by the favourite's win probability
+        # (bucket 0 = 50-60% ... 4 = 90-100%), kept up to date at settlement and undo
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'prediction_calibration'")
+        calibration_exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_calibration (
+                server_id TEXT NOT NULL,
+                game_mode TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                predictions INTEGER DEFAULT 0,
+                favourite_prob_sum REAL DEFAULT 0,
+                favourite_wins INTEGER DEFAULT 0,
+                brier_sum REAL DEFAULT 0,
+                log_loss_sum REAL DEFAULT 0,
+                PRIMARY KEY (server_id, game_mode, bucket)
+            )
+        ''')
+        if not calibration_exists:
+            cursor.execute('''
+                SELECT server_id, game_mode, winner, predicted_red_win FROM pugs
+                WHERE server_id IS NOT NULL AND winner IN ('red', 'blue') AND predicted_red_win IS NOT NULL
+                  AND COALESCE(status, 'active') != 'killed'
+            ''')
+            rows = cursor.fetchall()
+            for server_id, game_mode, winner, predicted_red_win in rows:
+                self._write_prediction_result(cursor, server_id, game_mode, predicted_red_win, winner, 1)
+            conn.commit()
+            if rows:
+                print(f"✅ Built prediction calibration from {len(rows)} past PUGs")
+        
+        # Per-player aggregates for the stat commands, kept up to date at settlement and undo
+        # recent_changes: [[pug_id, server ELO change], ...] newest first; mode_records: {mode: {wins, losses, splits}}
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS player_aggregates (
+                server_id TEXT NOT NULL,
+                discord_id TEXT NOT NULL,
+                last_change REAL,
+                net_last_10 REAL DEFAULT 0,
+                recent_changes TEXT DEFAULT '[]',
+                last_pug_id INTEGER,
+                last_played TIMESTAMP,
+                mode_records TEXT DEFAULT '{}',
+                PRIMARY KEY (server_id, discord_id)
+            )
+        ''')
+        
+        # Rating decay settings (per server) and audit trail
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_decay (
+                server_id TEXT PRIMARY KEY,
+                enabled INTEGER DEFAULT 0,
+                inactive_days INTEGER DEFAULT 28,
+                decay_per_week REAL DEFAULT 10,
+                decay_floor REAL DEFAULT 1000,
+                hide_inactive INTEGER DEFAULT 1,
+                last_run_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_decay_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_at TEXT NOT NULL,
+                server_id TEXT NOT NULL,
+                discord_id TEXT NOT NULL,
+                last_pug_at TEXT,
+                elo_before REAL NOT NULL,
+                elo_after REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rating_decay_log_server ON rating_decay_log (server_id, run_at)')
+        
+        # Teammate history table (decayed co-play weight per pair, see balancer.TeammateHistory)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS teammate_history (
+                server_id TEXT,
+                player_a TEXT,
+                player_b TEXT,
+                weight REAL NOT NULL,
+                last_pug_id INTEGER NOT NULL,
+                last_seq INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (server_id, player_a, player_b)
+            )
+        ''')
+        
+        # Rating history table (per-player rating before/after each decided PUG - exact undo)
+        # pool: the rating pool the row changed (NULL = the shared players.elo); score: the match score used
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_history (
+                pug_id INTEGER NOT NULL,
+                discord_id TEXT NOT NULL,
+                server_id TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                elo_before REAL NOT NULL,
+                elo_after REAL NOT NULL,
+                deviation_before REAL,
+                deviation_after REAL,
+                volatility_before REAL,
+                volatility_after REAL,
+                pool TEXT,
+                score REAL,
+                PRIMARY KEY (pug_id, discord_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rating_history_player ON rating_history (server_id, discord_id, pug_id)')
+        
+        # Per-mode rating pools (modes with their own ladder instead of the shared players.elo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS player_ratings (
+                server_id TEXT NOT NULL,
+                pool TEXT NOT NULL,
+                discord_id TEXT NOT NULL,
+                elo REAL NOT NULL,
+                peak_elo REAL,
+                rating_deviation REAL,
+                rating_volatility REAL,
+                wins INTEGER DEFAULT 0,
+                losses INTEGER DEFAULT 0,
+                games INTEGER DEFAULT 0,
+                last_pug_at TIMESTAMP,
+                PRIMARY KEY (server_id, pool, discord_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_player_ratings_ladder ON player_ratings (server_id, pool, elo DESC, discord_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_player_ratings_player ON player_ratings (server_id, discord_id)')
+        
+        # Rating adjustments ledger (.setelo, .importelos, resets) - lets ratings be replayed from history
+        # NULL fields are left unchanged by the replay; after_seq = settled_seq of the last result recorded
+        # before the change (where replays apply it), after_pug_id = that PUG's number (for display)
+        # Decay rows store a change (elo_delta, not below elo_floor); voided rows are skipped by replays
+        cursor.execute('''
+            SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'rating_adjustments'
+        ''')
+        ledger_exists = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_adjustments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                server_id TEXT NOT NULL,
+                discord_id TEXT NOT NULL,
+                after_pug_id INTEGER NOT NULL DEFAULT 0,
+                after_seq INTEGER NOT NULL DEFAULT 0,
+                elo REAL,
+                peak_elo REAL,
+                wins INTEGER,
+                losses INTEGER,
+                current_streak INTEGER,
+                best_win_streak INTEGER,
+                best_loss_streak INTEGER,
+                elo_delta REAL,
+                elo_floor REAL,
+                source TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                voided INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rating_adjustments_seq ON rating_adjustments (server_id, after_seq, id)')
+        
+        if not ledger_exists:
+            # Earlier ELO edits were never recorded, so snapshot every player as a baseline:
+            # a replay reproduces today's values and only recomputes what comes after
+            cursor.execute('''
+                INSERT INTO rating_adjustments (server_id, discord_id, after_pug_id, after_seq, elo, peak_elo, wins, losses,
+                                                current_streak, best_win_streak, best_loss_streak, source)
+                SELECT p.server_id, p.discord_id,
+                       COALESCE((SELECT pug_id FROM pugs WHERE pugs.server_id = p.server_id AND settled_seq IS NOT NULL
+                                 ORDER BY settled_seq DESC LIMIT 1), 0),
+                       COALESCE((SELECT MAX(settled_seq) FROM pugs WHERE pugs.server_id = p.server_id), 0),
+                       p.elo, p.peak_elo, p.wins, p.losses,
+                       p.current_streak, p.best_win_streak, p.best_loss_streak, 'baseline'
+                FROM players p
+            ''')
+            if cursor.rowcount:
+                print(f"✅ Recorded rating baseline for {cursor.rowcount} player(s)")
+            conn.commit()
         
         # Timeouts table
         cursor.execute('''
@@ -242,10 +537,28 @@ class DatabaseManager:
                 mode_name TEXT PRIMARY KEY,
                 display_name TEXT NOT NULL,
                 team_size INTEGER NOT NULL,
-                description TEXT
+                description TEXT,
+                rating_engine TEXT DEFAULT 'elo',
+                rating_pool TEXT
             )
         ''')
         
+        # Migration: Add rating_engine column to game_modes if it doesn't exist
+        try:
+            cursor.execute("SELECT rating_engine FROM game_modes LIMIT 1")
+        except:
+            cursor.execute("ALTER TABLE game_modes ADD COLUMN rating_engine TEXT DEFAULT 'elo'")
+            conn.commit()
+            print("✅ Database migration: Added 'rating_engine' column to game_modes table")
+        
+        # Migration: Add rating_pool column to game_modes (NULL = shared server ELO)
+        try:
+            cursor.execute("SELECT rating_pool FROM game_modes LIMIT 1")
+        except:
+            cursor.execute("ALTER TABLE game_modes ADD COLUMN rating_pool TEXT")
+            conn.commit()
+            print("✅ Database migration: Added 'rating_pool' column to game_modes table")
+        
         # Mode Aliases table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS mode_aliases (
@@ -263,6 +576,28 @@ class DatabaseManager:
             )
         ''')
         
+        # Users whose DMs failed because they don't accept DMs from the bot (global, not per server)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dm_failures (
+                discord_id TEXT PRIMARY KEY,
+                reason TEXT,
+                failures INTEGER DEFAULT 1,
+                last_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Auto-updating leaderboard messages, one row per chunk (so restarts reuse them)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS leaderboard_messages (
+                server_id TEXT NOT NULL,
+                chunk_idx INTEGER NOT NULL,
+                channel_id TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                digest TEXT,
+                PRIMARY KEY (server_id, chunk_idx)
+            )
+        ''')
+        
         # NOTE: No default game modes are created
         # Admins must create game modes with .addmode command
         # Example: .addmode 4v4 8 (creates a 4v4 mode with 8 total players)
@@ -295,7 +630,8 @@ class DatabaseManager:
         cursor.execute('''
             SELECT discord_id, server_id, discord_name, display_name, 
                    wins, losses, total_pugs, elo, 
-                   ut2k4_player_name, ut2k4_last_scraped, current_streak, registered, peak_elo
+                   ut2k4_player_name, ut2k4_last_scraped, current_streak, registered, peak_elo,
+                   rating_deviation, rating_volatility
             FROM players 
             WHERE discord_id = ? AND server_id = ?
         ''', (str(discord_id), str(server_id)))
@@ -315,7 +651,9 @@ class DatabaseManager:
                 'ut2k4_last_scraped': row[9],
                 'current_streak': row[10] if len(row) > 10 else 0,
                 'registered': row[11] if len(row) > 11 else 0,
-                'peak_elo': row[12] if len(row) > 12 else row[7]
+                'peak_elo': row[12] if len(row) > 12 else row[7],
+                'rating_deviation': row[13] if len(row) > 13 else None,
+                'rating_volatility': row[14] if len(row) > 14 else None
             }
         else:
             player = None
@@ -363,7 +701,9 @@ class DatabaseManager:
             'ut2k4_last_scraped': None,
             'current_streak': 0,
             'registered': 1,
-            'peak_elo': None
+            'peak_elo': None,
+            'rating_deviation': None,
+            'rating_volatility': None
         }
         
         conn.close()
@@ -433,65 +773,176 @@ class DatabaseManager:
         conn.close()
         return exists
     
-    def update_player_stats(self, discord_id: str, server_id: str, won: bool):
-        """Update player win/loss stats and streak (server-scoped)"""
+    def find_cleanup_candidates(self, server_id: str, members: List[Tuple[str, List[str]]],
+                                default_elo: float = 1000) -> List[Dict]:
+        """Player rows .cleanduplicates would remove, found with set queries (no per-row lookups)
+        
+        members: (discord_id, [names]) of everyone currently in the server (display name, username)
+        Reasons:
+        - 'invalid': the id can't be a Discord user id
+        - 'duplicate': an unused row (below) named like a current member
+        - 'orphan': any other unused row
+        Unused = not in the server, never played here, no PUGs on record and still at default_elo -
+        a row with an admin-set ELO or a PUG count is kept.
+        Simulation players (IDs 1000-1999) are never included.
+        Returns [{'discord_id', 'name', 'elo', 'total_pugs', 'reason'}], highest ELO first.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Get current streak and best streaks
+        cursor.execute('CREATE TEMP TABLE cleanup_members (discord_id TEXT PRIMARY KEY)')
+        cursor.execute('CREATE TEMP TABLE cleanup_member_names (name TEXT PRIMARY KEY)')
+        cursor.executemany('INSERT OR IGNORE INTO cleanup_members (discord_id) VALUES (?)',
+                           [(str(discord_id),) for discord_id, _ in members])
+        cursor.executemany('INSERT OR IGNORE INTO cleanup_member_names (name) VALUES (?)',
+                           [(name.lower(),) for _, names in members for name in names if name])
+        
+        # Stored names without a #discriminator, lower-cased, to compare with member names
         cursor.execute('''
-            SELECT current_streak, best_win_streak, best_loss_streak 
-            FROM players 
-            WHERE discord_id = ? AND server_id = ?
-        ''', (str(discord_id), str(server_id)))
-        result = cursor.fetchone()
-        current_streak = result[0] if result and result[0] is not None else 0
-        best_win_streak = result[1] if result and len(result) > 1 and result[1] is not None else 0
-        best_loss_streak = result[2] if result and len(result) > 2 and result[2] is not None else 0
+            WITH played AS (
+                SELECT DISTINCT t.discord_id
+                FROM pug_teams t
+                JOIN pugs p ON p.pug_id = t.pug_id
+                WHERE p.server_id = ?
+            ),
+            candidates AS (
+                SELECT pl.discord_id, pl.elo, pl.total_pugs,
+                       COALESCE(pl.display_name, pl.discord_name) AS name,
+                       LOWER(pl.display_name) AS display_key,
+                       LOWER(CASE WHEN INSTR(pl.discord_name, '#') > 0
+                                  THEN SUBSTR(pl.discord_name, 1, INSTR(pl.discord_name, '#') - 1)
+                                  ELSE pl.discord_name END) AS username_key,
+                       m.discord_id IS NOT NULL AS is_member,
+                       pd.discord_id IS NOT NULL AS has_played
+                FROM players pl
+                LEFT JOIN cleanup_members m ON m.discord_id = pl.discord_id
+                LEFT JOIN played pd ON pd.discord_id = pl.discord_id
+                WHERE pl.server_id = ?
+                  AND NOT (pl.discord_id GLOB '[0-9]*' AND CAST(pl.discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+            )
+            SELECT discord_id, name, elo, total_pugs, reason FROM (
+                SELECT *, CASE
+                    WHEN discord_id = '' OR discord_id GLOB '*[^0-9]*' OR CAST(discord_id AS INTEGER) < 4194304
+                        THEN 'invalid'
+                    WHEN is_member OR has_played THEN NULL
+                    WHEN COALESCE(total_pugs, 0) != 0 OR elo != ? THEN NULL
+                    WHEN display_key IN (SELECT name FROM cleanup_member_names)
+                      OR username_key IN (SELECT name FROM cleanup_member_names)
+                        THEN 'duplicate'
+                    ELSE 'orphan'
+                END AS reason
+                FROM candidates
+            )
+            WHERE reason IS NOT NULL
+            ORDER BY elo DESC
+        ''', (str(server_id), str(server_id), default_elo))
         
-        if won:
-            # Win: increment positive streak or start new one
-            new_streak = current_streak + 1 if current_streak >= 0 else 1
-            
-            # Update best win streak if this is a new record
-            new_best_win = max(best_win_streak, new_streak)
-            
+        candidates = [{'discord_id': row[0], 'name': row[1], 'elo': row[2], 'total_pugs': row[3], 'reason': row[4]}
+                      for row in cursor.fetchall()]
+        
+        conn.close()
+        return candidates
+    
+    def delete_players(self, server_id: str, discord_ids: List[str]) -> int:
+        """Delete many players (and their per-pool ratings, aggregates and rating ledger rows) in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('CREATE TEMP TABLE doomed_players (discord_id TEXT PRIMARY KEY)')
+            cursor.executemany('INSERT OR IGNORE INTO doomed_players (discord_id) VALUES (?)',
+                               [(str(discord_id),) for discord_id in discord_ids])
+            for table in ('player_ratings', 'player_aggregates', 'rating_adjustments'):
+                cursor.execute(f'''
+                    DELETE FROM {table}
+                    WHERE server_id = ? AND discord_id IN (SELECT discord_id FROM doomed_players)
+                ''', (str(server_id),))
             cursor.execute('''
+                DELETE FROM players
+                WHERE server_id = ? AND discord_id IN (SELECT discord_id FROM doomed_players)
+            ''', (str(server_id),))
+            deleted = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return deleted
+    
+    def update_player_stats(self, discord_id: str, server_id: str, won: bool):
+        """Update player win/loss stats and streak (server-scoped)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self._record_results(cursor, server_id, [(discord_id, 1.0 if won else 0.0)])
+        conn.commit()
+        conn.close()
+    
+    def _record_results(self, cursor, server_id: str, results: List[Tuple], step: int = 1):
+        """Count results (discord_id, score) in wins/losses/total_pugs using an open cursor
+        
+        step=1 also advances streaks - one UPDATE per player, SET expressions all see the old
+        row, so the streak is worked out twice rather than read back first. Same rules as
+        streaks.advance_streak. step=-1 only takes the counts back; streaks can't be stepped
+        backwards and are rebuilt from history instead.
+        Splits (score 0.5) only count towards total PUGs.
+        """
+        winners = [(str(discord_id), str(server_id)) for discord_id, score in results if score == 1]
+        losers = [(str(discord_id), str(server_id)) for discord_id, score in results if score == 0]
+        drawn = [(str(discord_id), str(server_id)) for discord_id, score in results if score == 0.5]
+        
+        if step < 0:
+            cursor.executemany('''
+                UPDATE players SET wins = wins - 1, total_pugs = total_pugs - 1
+                WHERE discord_id = ? AND server_id = ?
+            ''', winners)
+            cursor.executemany('''
+                UPDATE players SET losses = losses - 1, total_pugs = total_pugs - 1
+                WHERE discord_id = ? AND server_id = ?
+            ''', losers)
+        else:
+            # Win: increment positive streak or start new one, and keep the best win streak
+            cursor.executemany('''
                 UPDATE players 
                 SET wins = wins + 1, 
                     total_pugs = total_pugs + 1, 
-                    current_streak = ?,
-                    best_win_streak = ?
+                    current_streak = CASE WHEN COALESCE(current_streak, 0) >= 0
+                                          THEN COALESCE(current_streak, 0) + 1 ELSE 1 END,
+                    best_win_streak = MAX(COALESCE(best_win_streak, 0),
+                                          CASE WHEN COALESCE(current_streak, 0) >= 0
+                                               THEN COALESCE(current_streak, 0) + 1 ELSE 1 END)
                 WHERE discord_id = ? AND server_id = ?
-            ''', (new_streak, new_best_win, str(discord_id), str(server_id)))
-        else:
-            # Loss: decrement negative streak or start new one
-            new_streak = current_streak - 1 if current_streak <= 0 else -1
-            
-            # Update best loss streak if this is a new record (stored as positive number)
-            new_best_loss = max(best_loss_streak, abs(new_streak))
-            
-            cursor.execute('''
+            ''', winners)
+            # Loss: decrement negative streak or start new one (best loss streak stored as positive number)
+            cursor.executemany('''
                 UPDATE players 
                 SET losses = losses + 1, 
                     total_pugs = total_pugs + 1, 
-                    current_streak = ?,
-                    best_loss_streak = ?
+                    current_streak = CASE WHEN COALESCE(current_streak, 0) <= 0
+                                          THEN COALESCE(current_streak, 0) - 1 ELSE -1 END,
+                    best_loss_streak = MAX(COALESCE(best_loss_streak, 0),
+                                           CASE WHEN COALESCE(current_streak, 0) <= 0
+                                                THEN 1 - COALESCE(current_streak, 0) ELSE 1 END)
                 WHERE discord_id = ? AND server_id = ?
-            ''', (new_streak, new_best_loss, str(discord_id), str(server_id)))
-        
-        conn.commit()
-        conn.close()
+            ''', losers)
+        cursor.executemany('''
+            UPDATE players SET total_pugs = total_pugs + ?
+            WHERE discord_id = ? AND server_id = ?
+        ''', [(step, discord_id, sid) for discord_id, sid in drawn])
     
     def update_player_elo(self, discord_id: str, server_id: str, new_elo: float):
         """Update player ELO and peak ELO if new high (server-scoped)"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        # Update ELO and peak_elo
+        self._update_player_elos(cursor, server_id, [discord_id], new_elo)
+        conn.commit()
+        conn.close()
+    
+    def _update_player_elos(self, cursor, server_id: str, discord_ids: List[str], new_elo: float):
+        """Set players' ELO (and peak ELO if new high) using an open cursor"""
         # If peak_elo is NULL (first game), set it to new_elo
         # Otherwise, only update if new_elo is higher
-        cursor.execute('''
+        cursor.executemany('''
             UPDATE players 
             SET elo = ?,
                 peak_elo = CASE 
@@ -500,10 +951,7 @@ class DatabaseManager:
                     ELSE peak_elo 
                 END
             WHERE discord_id = ? AND server_id = ?
-        ''', (new_elo, new_elo, new_elo, new_elo, str(discord_id), str(server_id)))
-        
-        conn.commit()
-        conn.close()
+        ''', [(new_elo, new_elo, new_elo, new_elo, str(discord_id), str(server_id)) for discord_id in discord_ids])
     
     def update_ut2k4_info(self, discord_id: str, server_id: str, ut2k4_name: str):
         """Update player's UT2K4 name (server-scoped)"""
@@ -558,7 +1006,8 @@ class DatabaseManager:
                 SELECT discord_id, server_id, discord_name, display_name,
                        wins, losses, total_pugs, elo, peak_elo,
                        ut2k4_player_name, ut2k4_last_scraped, current_streak, registered,
-                       best_win_streak, best_loss_streak
+                       best_win_streak, best_loss_streak, rating_deviation, rating_volatility,
+                       inactive
                 FROM players 
                 WHERE server_id = ?
             ''', (str(server_id),))
@@ -567,7 +1016,8 @@ class DatabaseManager:
                 SELECT discord_id, server_id, discord_name, display_name,
                        wins, losses, total_pugs, elo, peak_elo,
                        ut2k4_player_name, ut2k4_last_scraped, current_streak, registered,
-                       best_win_streak, best_loss_streak
+                       best_win_streak, best_loss_streak, rating_deviation, rating_volatility,
+                       inactive
                 FROM players
             ''')
         
@@ -590,7 +1040,10 @@ class DatabaseManager:
                 'current_streak': row[11] if len(row) > 11 else 0,
                 'registered': row[12] if len(row) > 12 else 0,
                 'best_win_streak': row[13] if len(row) > 13 else 0,
-                'best_loss_streak': row[14] if len(row) > 14 else 0
+                'best_loss_streak': row[14] if len(row) > 14 else 0,
+                'rating_deviation': row[15] if len(row) > 15 else None,
+                'rating_volatility': row[16] if len(row) > 16 else None,
+                'inactive': bool(row[17]) if len(row) > 17 else False
             })
         
         conn.close()
@@ -632,6 +1085,7 @@ class DatabaseManager:
                         VALUES (?, ?, 0, 0, 0, ?)
                     ''', (str(discord_id), str(server_id), float(new_elo)))
                     success_count += 1
+                self._record_rating_adjustment(cursor, server_id, discord_id, 'importelos', elo=float(new_elo))
             except Exception as e:
                 error_count += 1
                 errors.append(f"Discord ID {discord_id}: {str(e)}")
@@ -643,16 +1097,18 @@ class DatabaseManager:
     
     # PUG operations
     def add_pug(self, red_team: List[str], blue_team: List[str], game_mode: str, 
-                avg_red_elo: float, avg_blue_elo: float, tiebreaker_map: str = None) -> int:
+                avg_red_elo: float, avg_blue_elo: float, tiebreaker_map: str = None,
+                server_id: str = None, predicted_red_win: float = None) -> int:
         """Add a new PUG and return the pug_id"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+
         # Insert PUG
         cursor.execute('''
-            INSERT INTO pugs (game_mode, avg_red_elo, avg_blue_elo, tiebreaker_map)
-            VALUES (?, ?, ?, ?)
-        ''', (game_mode, avg_red_elo, avg_blue_elo, tiebreaker_map))
+            INSERT INTO pugs (game_mode, avg_red_elo, avg_blue_elo, tiebreaker_map, server_id, predicted_red_win)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (game_mode, avg_red_elo, avg_blue_elo, tiebreaker_map,
+              str(server_id) if server_id else None, predicted_red_win))
         
         pug_id = cursor.lastrowid
         
@@ -755,42 +1211,1536 @@ class DatabaseManager:
         conn.close()
         return result
     
-    # Timeout operations
-    def add_timeout(self, discord_id: str, timeout_end: datetime):
-        """Add a timeout for a player"""
+    # Teammate history operations
+    def get_teammate_history(self, server_id: str) -> List[Tuple[str, str, float, int, int]]:
+        """Get all (player_a, player_b, weight, last_pug_id, last_seq) rows for a server"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT player_a, player_b, weight, last_pug_id, last_seq
+            FROM teammate_history
+            WHERE server_id = ?
+        ''', (str(server_id),))
+        rows = cursor.fetchall()
+
+        conn.close()
+        return rows
+
+    def save_teammate_history(self, server_id: str, rows: List[Tuple[str, str, float, int, int]]):
+        """Upsert changed (player_a, player_b, weight, last_pug_id, last_seq) rows for a server"""
+        if not rows:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT OR REPLACE INTO teammate_history (server_id, player_a, player_b, weight, last_pug_id, last_seq)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(str(server_id), a, b, weight, last_pug_id, last_seq)
+              for a, b, weight, last_pug_id, last_seq in rows])
+
+        conn.commit()
+        conn.close()
+
+    def iter_pug_rosters(self, server_id: str, after_pug_id: int = 0):
+        """Stream (pug_id, red_team, blue_team) for a server's PUGs in pug_id order
+        Uses one ordered query instead of a team lookup per PUG"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT t.pug_id, t.discord_id, t.team
+            FROM pugs p
+            JOIN pug_teams t ON t.pug_id = p.pug_id
+            WHERE p.server_id = ? AND p.pug_id > ?
+            ORDER BY t.pug_id
+        ''', (str(server_id), after_pug_id))
+
+        current_id = None
+        red_team, blue_team = [], []
+        try:
+            for pug_id, discord_id, team in cursor:
+                if pug_id != current_id:
+                    if current_id is not None:
+                        yield current_id, red_team, blue_team
+                    current_id = pug_id
+                    red_team, blue_team = [], []
+                (red_team if team == 'red' else blue_team).append(discord_id)
+            if current_id is not None:
+                yield current_id, red_team, blue_team
+        finally:
+            conn.close()
+
+    # Export operations (streamed straight from the cursor)
+    def iter_player_stats(self, server_id: str):
+        """Stream a server's player rows (dicts, highest ELO first)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT discord_id, discord_name, display_name, elo, peak_elo, total_pugs, wins, losses,
+                   current_streak, best_win_streak, best_loss_streak, inactive
+            FROM players
+            WHERE server_id = ?
+            ORDER BY elo DESC
+        ''', (str(server_id),))
+
+        columns = [column[0] for column in cursor.description]
+        try:
+            for row in cursor:
+                yield dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    def iter_match_history(self, server_id: str):
+        """Stream a server's PUGs in order as dicts with red_team/blue_team id lists"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT p.pug_id, p.timestamp, p.game_mode, p.winner, COALESCE(p.status, 'active'),
+                   p.avg_red_elo, p.avg_blue_elo, p.tiebreaker_map, t.discord_id, t.team
+            FROM pugs p
+            LEFT JOIN pug_teams t ON t.pug_id = p.pug_id
+            WHERE p.server_id = ?
+            ORDER BY p.pug_id
+        ''', (str(server_id),))
+
+        current = None
+        try:
+            for (pug_id, timestamp, game_mode, winner, status, avg_red, avg_blue, tiebreaker_map,
+                 discord_id, team) in cursor:
+                if current is None or pug_id != current['pug_id']:
+                    if current is not None:
+                        yield current
+                    current = {'pug_id': pug_id, 'timestamp': timestamp, 'game_mode': game_mode,
+                               'winner': winner, 'status': status, 'avg_red_elo': avg_red,
+                               'avg_blue_elo': avg_blue, 'tiebreaker_map': tiebreaker_map,
+                               'red_team': [], 'blue_team': []}
+                if discord_id is not None:
+                    current['red_team' if team == 'red' else 'blue_team'].append(discord_id)
+            if current is not None:
+                yield current
+        finally:
+            conn.close()
+
+    def iter_rating_history(self, server_id: str):
+        """Stream a server's per-match rating changes (dicts) in PUG order"""
         conn = self.get_connection()
         cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT h.pug_id, p.timestamp, p.game_mode, h.discord_id, h.pool, h.engine, h.score,
+                   h.elo_before, h.elo_after, h.deviation_after
+            FROM rating_history h
+            LEFT JOIN pugs p ON p.pug_id = h.pug_id
+            WHERE h.server_id = ?
+            ORDER BY h.pug_id, h.discord_id
+        ''', (str(server_id),))
+
+        columns = [column[0] for column in cursor.description]
+        try:
+            for row in cursor:
+                yield dict(zip(columns, row))
+        finally:
+            conn.close()
+
+    # Rating ledger / replay operations
+    def _record_rating_adjustment(self, cursor, server_id: str, discord_id: str, source: str, **fields):
+        """Append a ledger row on an open cursor (fields: elo, peak_elo, wins, losses, streak columns)
         
+        The row is placed after the last result recorded on the server (by settle order, not PUG number)
+        """
         cursor.execute('''
-            INSERT OR REPLACE INTO timeouts (discord_id, timeout_end)
-            VALUES (?, ?)
-        ''', (str(discord_id), timeout_end.isoformat()))
+            INSERT INTO rating_adjustments (server_id, discord_id, after_pug_id, after_seq, elo, peak_elo, wins, losses,
+                                            current_streak, best_win_streak, best_loss_streak, source)
+            VALUES (?, ?, COALESCE((SELECT pug_id FROM pugs WHERE server_id = ? AND settled_seq IS NOT NULL
+                                    ORDER BY settled_seq DESC LIMIT 1), 0),
+                    COALESCE((SELECT MAX(settled_seq) FROM pugs WHERE server_id = ?), 0),
+                    ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (str(server_id), str(discord_id), str(server_id), str(server_id),
+              fields.get('elo'), fields.get('peak_elo'), fields.get('wins'), fields.get('losses'),
+              fields.get('current_streak'), fields.get('best_win_streak'), fields.get('best_loss_streak'),
+              source))
+    
+    def set_player_elo(self, server_id: str, discord_id: str, new_elo: float):
+        """Set one player's ELO and record it in the rating ledger in one transaction (.setelo)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        self._update_player_elos(cursor, server_id, [discord_id], new_elo)
+        self._record_rating_adjustment(cursor, server_id, discord_id, 'setelo', elo=new_elo)
         
         conn.commit()
         conn.close()
     
-    def is_timed_out(self, discord_id: str) -> Tuple[bool, Optional[datetime]]:
-        """Check if player is timed out"""
+    def reset_all_elos(self, server_id: str, discord_ids: List[str], elo: float):
+        """Give every listed player the same ELO and record it in the rating ledger in one transaction (.reseteloall)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT timeout_end FROM timeouts WHERE discord_id = ?', 
-                      (str(discord_id),))
-        row = cursor.fetchone()
+        self._update_player_elos(cursor, server_id, discord_ids, elo)
+        for discord_id in discord_ids:
+            self._record_rating_adjustment(cursor, server_id, discord_id, 'reseteloall', elo=elo)
         
-        if row:
-            timeout_end = datetime.fromisoformat(row[0])
-            if datetime.now() < timeout_end:
-                conn.close()
-                return True, timeout_end
-            else:
-                # Timeout expired, remove it
-                cursor.execute('DELETE FROM timeouts WHERE discord_id = ?', 
-                             (str(discord_id),))
-                conn.commit()
+        conn.commit()
+        conn.close()
+    
+    def set_player_peak(self, server_id: str, discord_id: str, peak_elo: float):
+        """Set one player's peak ELO and record it in the rating ledger in one transaction (.setpeak)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE players 
+            SET peak_elo = ?
+            WHERE discord_id = ? AND server_id = ?
+        ''', (peak_elo, str(discord_id), str(server_id)))
+        self._record_rating_adjustment(cursor, server_id, discord_id, 'setpeak', peak_elo=peak_elo)
         
+        conn.commit()
+        conn.close()
+    
+    def reset_all_records(self, server_id: str, discord_ids: List[str]):
+        """Zero every player's wins/losses and record it in the rating ledger in one transaction (.resetplayerpugs)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE players 
+            SET wins = 0, losses = 0
+            WHERE server_id = ?
+        ''', (str(server_id),))
+        for discord_id in discord_ids:
+            self._record_rating_adjustment(cursor, server_id, discord_id, 'resetplayerpugs', wins=0, losses=0)
+        
+        conn.commit()
+        conn.close()
+    
+    def get_rating_adjustments(self, server_id: str, include_baseline: bool = True) -> List[Tuple[int, str, Dict]]:
+        """Ledger rows for a server as (after_seq, discord_id, fields) in the order they happened"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT after_seq, discord_id, elo, peak_elo, wins, losses,
+                   current_streak, best_win_streak, best_loss_streak, elo_delta, elo_floor
+            FROM rating_adjustments
+            WHERE server_id = ? AND (? OR source != 'baseline') AND voided = 0
+            ORDER BY after_seq, id
+        ''', (str(server_id), 1 if include_baseline else 0))
+        
+        adjustments = []
+        for row in cursor.fetchall():
+            adjustments.append((row[0], row[1], {
+                'elo': row[2],
+                'peak_elo': row[3],
+                'wins': row[4],
+                'losses': row[5],
+                'current_streak': row[6],
+                'best_win_streak': row[7],
+                'best_loss_streak': row[8],
+                'elo_delta': row[9],
+                'elo_floor': row[10]
+            }))
+        
+        conn.close()
+        return adjustments
+    
+    def get_player_adjustments(self, server_id: str, discord_id: str, limit: int = 15) -> List[Dict]:
+        """A player's most recent ledger rows (voided ones included), newest first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, after_pug_id, source, elo, elo_delta, peak_elo, wins, losses, created_at, voided
+            FROM rating_adjustments
+            WHERE server_id = ? AND discord_id = ?
+            ORDER BY after_seq DESC, id DESC
+            LIMIT ?
+        ''', (str(server_id), str(discord_id), limit))
+        columns = [d[0] for d in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+        conn.close()
+        return rows
+    
+    def set_adjustment_voided(self, server_id: str, adjustment_id: int, voided: bool = True) -> Optional[Dict]:
+        """Void (or restore) one ledger row so replays skip (or use) it
+        
+        Returns the row as {'id', 'discord_id', 'source', 'voided'} (voided before this call),
+        or None if the server has no such row. Baseline snapshots can't be voided.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, discord_id, source, voided FROM rating_adjustments WHERE id = ? AND server_id = ?
+        ''', (adjustment_id, str(server_id)))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            return None
+        if row[2] != 'baseline':
+            cursor.execute('UPDATE rating_adjustments SET voided = ? WHERE id = ?', (1 if voided else 0, adjustment_id))
+            conn.commit()
+        
+        conn.close()
+        return {'id': row[0], 'discord_id': row[1], 'source': row[2], 'voided': bool(row[3])}
+    
+    def iter_settled_pugs(self, server_id: str):
+        """Stream (pug_id, game_mode, winner, red_team, blue_team, pool, settled_seq, averages, elo_before)
+        for a server's decided, non-killed PUGs in the order their results were recorded
+        
+        pool is the rating pool the PUG was settled in (None = shared server ELO or not logged);
+        averages the (avg_red, avg_blue) stored when the teams were picked (None if not stored);
+        elo_before {discord_id: rating before the result} from the rating history (empty before it)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT p.pug_id, p.game_mode, p.winner, COALESCE(p.settled_seq, p.pug_id), p.avg_red_elo, p.avg_blue_elo,
+                   t.discord_id, t.team, h.pool, h.elo_before
+            FROM pugs p
+            JOIN pug_teams t ON t.pug_id = p.pug_id
+            LEFT JOIN rating_history h ON h.pug_id = t.pug_id AND h.discord_id = t.discord_id
+            WHERE p.server_id = ?
+              AND p.winner IN ('red', 'blue', 'split')
+              AND COALESCE(p.status, 'active') != 'killed'
+            ORDER BY COALESCE(p.settled_seq, p.pug_id), p.pug_id
+        ''', (str(server_id),))
+        
+        # The PUG being gathered, in the order yielded
+        current = None
+        try:
+            for (pug_id, game_mode, winner, settled_seq, avg_red, avg_blue,
+                 discord_id, team, player_pool, elo_before) in cursor:
+                if current is None or pug_id != current[0]:
+                    if current is not None:
+                        yield tuple(current)
+                    averages = (avg_red, avg_blue) if avg_red is not None and avg_blue is not None else None
+                    current = [pug_id, game_mode, winner, [], [], None, settled_seq, averages, {}]
+                current[5] = current[5] or player_pool
+                (current[3] if team == 'red' else current[4]).append(discord_id)
+                if elo_before is not None:
+                    current[8][discord_id] = elo_before
+            if current is not None:
+                yield tuple(current)
+        finally:
+            conn.close()
+    
+    def get_pool_ratings(self, server_id: str) -> Dict[Tuple[str, str], Dict]:
+        """Every per-mode pool rating on a server as {(pool, discord_id): row}"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT pool, discord_id, elo, peak_elo, rating_deviation, rating_volatility, wins, losses, games
+            FROM player_ratings
+            WHERE server_id = ?
+        ''', (str(server_id),))
+        columns = [d[0] for d in cursor.description]
+        ratings = {(row[0], row[1]): dict(zip(columns, row)) for row in cursor.fetchall()}
+        
+        conn.close()
+        return ratings
+    
+    def apply_rating_replay(self, server_id: str, players: List[Dict], pug_averages: Dict[int, Tuple[float, float]],
+                            rating_changes: List[Tuple] = None, pool_ratings: List[Dict] = None) -> int:
+        """Write replayed player stats, pool ratings, PUG averages and rating history back in one transaction
+        
+        pool_ratings: replayed per-mode pool ratings (ReplayState.player plus 'pool'), inserted if missing.
+        PUG averages and history are only rewritten after the server's baseline snapshot - earlier
+        PUGs were replayed from unknown starting ELOs. Returns the number of players updated.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT COALESCE(MAX(after_seq), 0) FROM rating_adjustments
+                WHERE server_id = ? AND source = 'baseline'
+            ''', (str(server_id),))
+            baseline_seq = cursor.fetchone()[0]
+            # PUGs settled after the baseline - the ones replayed from known ratings
+            cursor.execute('''
+                SELECT pug_id FROM pugs WHERE server_id = ? AND COALESCE(settled_seq, pug_id) > ?
+            ''', (str(server_id), baseline_seq))
+            replayed = {row[0] for row in cursor.fetchall()}
+            
+            cursor.executemany('''
+                UPDATE players
+                SET elo = ?, peak_elo = ?, wins = ?, losses = ?,
+                    current_streak = ?, best_win_streak = ?, best_loss_streak = ?,
+                    rating_deviation = COALESCE(?, rating_deviation),
+                    rating_volatility = COALESCE(?, rating_volatility)
+                WHERE discord_id = ? AND server_id = ?
+            ''', [(p['elo'], p['peak_elo'], p['wins'], p['losses'],
+                   p['current_streak'], p['best_win_streak'], p['best_loss_streak'],
+                   p.get('rating_deviation'), p.get('rating_volatility'),
+                   p['discord_id'], str(server_id)) for p in players])
+            updated = cursor.rowcount
+            
+            if pool_ratings:
+                cursor.executemany('''
+                    INSERT INTO player_ratings (server_id, pool, discord_id, elo, peak_elo, rating_deviation,
+                                                rating_volatility, wins, losses, games)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (server_id, pool, discord_id) DO UPDATE SET
+                        elo = excluded.elo,
+                        peak_elo = excluded.peak_elo,
+                        rating_deviation = COALESCE(excluded.rating_deviation, rating_deviation),
+                        rating_volatility = COALESCE(excluded.rating_volatility, rating_volatility),
+                        wins = excluded.wins,
+                        losses = excluded.losses,
+                        games = excluded.games
+                ''', [(str(server_id), r['pool'], r['discord_id'], r['elo'], r['peak_elo'], r.get('rating_deviation'),
+                       r.get('rating_volatility'), r['wins'], r['losses'], r['games']) for r in pool_ratings])
+            
+            cursor.executemany('''
+                UPDATE pugs SET avg_red_elo = ?, avg_blue_elo = ?
+                WHERE pug_id = ?
+            ''', [(avg_red, avg_blue, pug_id)
+                  for pug_id, (avg_red, avg_blue) in pug_averages.items() if pug_id in replayed])
+            
+            if rating_changes is not None:
+                cursor.executemany('DELETE FROM rating_history WHERE server_id = ? AND pug_id = ?',
+                                   [(str(server_id), pug_id) for pug_id in replayed])
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO rating_history (pug_id, discord_id, server_id, engine,
+                                                           elo_before, elo_after, deviation_before, deviation_after,
+                                                           volatility_before, volatility_after, pool, score)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(pug_id, discord_id, str(server_id), engine, old[0], new[0], old[1], new[1], old[2], new[2],
+                       pool, score)
+                      for pug_id, discord_id, engine, old, new, score, pool in rating_changes if pug_id in replayed])
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return updated
+    
+    # Settlement operations
+    def settle_pug(self, server_id: str, pug_id: int, winner: str, engine: str, updates: List[Tuple],
+                   pool: str = None, game_mode: str = None):
+        """Record a PUG result - winner, stats, streaks, ratings and derived tables - in one transaction
+        
+        winner: 'red', 'blue' or 'split'
+        updates: (discord_id, (elo, deviation, volatility) before, (elo, deviation, volatility) after, score)
+        pool: per-mode rating pool to write (None = the shared players.elo)
+        game_mode: also count the result in the players' aggregates, pair stats and prediction calibration
+        Returns False (nothing written) if the PUG already has a result.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Only the first result for a PUG counts (e.g. two votes passing at once)
+            # settled_seq also stays above every ledger row's anchor, so a manual change made before
+            # this result is replayed before it
+            cursor.execute('''
+                UPDATE pugs SET winner = ?,
+                    settled_seq = MAX(COALESCE((SELECT MAX(settled_seq) FROM pugs WHERE server_id = ?), 0),
+                                      COALESCE((SELECT MAX(after_seq) FROM rating_adjustments WHERE server_id = ?), 0)) + 1
+                WHERE pug_id = ? AND winner IS NULL
+            ''', (winner, str(server_id), str(server_id), pug_id))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            self._record_results(cursor, server_id, [(discord_id, score) for discord_id, old, new, score in updates])
+            self._write_match_ratings(cursor, server_id, pug_id, engine, updates, pool)
+            if game_mode is not None:
+                self._update_player_aggregates(cursor, server_id, pug_id, game_mode, [
+                    (discord_id, score, new[0] - old[0] if pool is None else None)
+                    for discord_id, old, new, score in updates])
+                self._update_pair_stats(cursor, server_id, pug_id, 1)
+                self._update_prediction_stats(cursor, server_id, pug_id, 1)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return True
+    
+    def unsettle_pug(self, server_id: str, pug_id: int, legacy_change=None) -> Optional[str]:
+        """Take a PUG result back out in one transaction and clear its winner
+        
+        Logged rating changes are reversed in whichever pool they were written to. PUGs from
+        before the rating history use legacy_change(avg_red, avg_blue, red_score) -> (red, blue)
+        to work out their ELO change. Streaks are left for the caller to rebuild.
+        Returns the winner that was undone (None if the PUG had no result).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT game_mode, winner, avg_red_elo, avg_blue_elo FROM pugs WHERE pug_id = ?', (pug_id,))
+            pug_row = cursor.fetchone()
+            if not pug_row or pug_row[1] not in ('red', 'blue', 'split'):
+                return None
+            game_mode, winner, avg_red, avg_blue = pug_row
+            cursor.execute('SELECT discord_id, team FROM pug_teams WHERE pug_id = ?', (pug_id,))
+            teams = cursor.fetchall()
+            results = [(discord_id, 0.5 if winner == 'split' else (1.0 if team == winner else 0.0))
+                       for discord_id, team in teams]
+            
+            # Derived tables first - they read the PUG's winner, which is still set here
+            self._update_player_aggregates(cursor, server_id, pug_id, game_mode,
+                                           [(discord_id, score, None) for discord_id, score in results], undo=True)
+            self._update_pair_stats(cursor, server_id, pug_id, -1)
+            self._update_prediction_stats(cursor, server_id, pug_id, -1)
+            
+            if self._reverse_match_ratings(cursor, server_id, pug_id) == 0 and legacy_change is not None:
+                red_score = 0.5 if winner == 'split' else (1.0 if winner == 'red' else 0.0)
+                red_change, blue_change = legacy_change(avg_red, avg_blue, red_score)
+                cursor.executemany('''
+                    UPDATE players SET elo = elo - ?
+                    WHERE discord_id = ? AND server_id = ?
+                ''', [(red_change if team == 'red' else blue_change, discord_id, str(server_id))
+                      for discord_id, team in teams])
+            self._record_results(cursor, server_id, results, step=-1)
+            cursor.execute('UPDATE pugs SET winner = NULL, settled_seq = NULL WHERE pug_id = ?', (pug_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return winner
+    
+    def _write_match_ratings(self, cursor, server_id: str, pug_id: int, engine: str, updates: List[Tuple],
+                             pool: str = None):
+        """Write a whole match's new ratings and log them for undo using an open cursor"""
+        if pool is None:
+            # Same peak rule as update_player_elo
+            cursor.executemany('''
+                UPDATE players 
+                SET elo = ?,
+                    peak_elo = CASE 
+                        WHEN peak_elo IS NULL THEN ?
+                        WHEN ? > peak_elo THEN ? 
+                        ELSE peak_elo 
+                    END,
+                    rating_deviation = ?,
+                    rating_volatility = ?,
+                    last_pug_at = CURRENT_TIMESTAMP,
+                    inactive = 0
+                WHERE discord_id = ? AND server_id = ?
+            ''', [(new[0], new[0], new[0], new[0], new[1], new[2], str(discord_id), str(server_id))
+                  for discord_id, old, new, score in updates])
+        else:
+            cursor.executemany('''
+                INSERT INTO player_ratings (server_id, pool, discord_id, elo, peak_elo, rating_deviation,
+                                            rating_volatility, wins, losses, games, last_pug_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (server_id, pool, discord_id) DO UPDATE SET
+                    elo = excluded.elo,
+                    peak_elo = MAX(COALESCE(peak_elo, excluded.elo), excluded.elo),
+                    rating_deviation = excluded.rating_deviation,
+                    rating_volatility = excluded.rating_volatility,
+                    wins = wins + excluded.wins,
+                    losses = losses + excluded.losses,
+                    games = games + 1,
+                    last_pug_at = CURRENT_TIMESTAMP
+            ''', [(str(server_id), pool, str(discord_id), new[0], new[0], new[1], new[2],
+                   1 if score == 1 else 0, 1 if score == 0 else 0)
+                  for discord_id, old, new, score in updates])
+            # Playing any mode still counts as activity for rating decay
+            cursor.executemany('''
+                UPDATE players SET last_pug_at = CURRENT_TIMESTAMP, inactive = 0
+                WHERE discord_id = ? AND server_id = ?
+            ''', [(str(discord_id), str(server_id)) for discord_id, old, new, score in updates])
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO rating_history (pug_id, discord_id, server_id, engine,
+                                                   elo_before, elo_after, deviation_before, deviation_after,
+                                                   volatility_before, volatility_after, pool, score)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(pug_id, str(discord_id), str(server_id), engine, old[0], new[0], old[1], new[1], old[2], new[2],
+               pool, score)
+              for discord_id, old, new, score in updates])
+    
+    def _reverse_match_ratings(self, cursor, server_id: str, pug_id: int) -> int:
+        """Reverse a PUG's logged rating changes (ELO by the logged delta, uncertainty restored)
+        
+        Returns the number of players reversed - 0 if the PUG predates the rating history.
+        """
+        cursor.execute('''
+            SELECT discord_id, elo_after - elo_before, deviation_before, volatility_before, pool, score
+            FROM rating_history
+            WHERE pug_id = ? AND server_id = ?
+        ''', (pug_id, str(server_id)))
+        rows = cursor.fetchall()
+        
+        cursor.executemany('''
+            UPDATE players 
+            SET elo = elo - ?, rating_deviation = ?, rating_volatility = ?
+            WHERE discord_id = ? AND server_id = ?
+        ''', [(change, deviation, volatility, discord_id, str(server_id))
+              for discord_id, change, deviation, volatility, pool, score in rows if pool is None])
+        cursor.executemany('''
+            UPDATE player_ratings 
+            SET elo = elo - ?, rating_deviation = ?, rating_volatility = ?,
+                wins = wins - ?, losses = losses - ?, games = games - 1
+            WHERE server_id = ? AND pool = ? AND discord_id = ?
+        ''', [(change, deviation, volatility, 1 if score == 1 else 0, 1 if score == 0 else 0,
+               str(server_id), pool, discord_id)
+              for discord_id, change, deviation, volatility, pool, score in rows if pool is not None])
+        cursor.execute('DELETE FROM rating_history WHERE pug_id = ? AND server_id = ?', (pug_id, str(server_id)))
+        return len(rows)
+    
+    # Streak operations
+    def iter_player_results(self, server_id: str, discord_ids: List[str] = None):
+        """Stream (discord_id, settled_seq, won) for decided, non-split, non-killed PUGs, by player then settle order"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        params = [str(server_id)]
+        player_filter = ''
+        if discord_ids is not None:
+            player_filter = f"AND t.discord_id IN ({','.join('?' * len(discord_ids))})"
+            params.extend(str(discord_id) for discord_id in discord_ids)
+        
+        cursor.execute(f'''
+            SELECT t.discord_id, COALESCE(p.settled_seq, p.pug_id) AS seq, t.team = p.winner
+            FROM pug_teams t
+            JOIN pugs p ON p.pug_id = t.pug_id
+            WHERE p.server_id = ?
+              AND p.winner IN ('red', 'blue')
+              AND COALESCE(p.status, 'active') != 'killed'
+              {player_filter}
+            ORDER BY t.discord_id, seq
+        ''', params)
+        try:
+            for discord_id, seq, won in cursor:
+                yield discord_id, seq, bool(won)
+        finally:
+            conn.close()
+    
+    def set_player_streaks(self, server_id: str, streaks: List[Tuple[str, Tuple[int, int, int]]]) -> int:
+        """Write (discord_id, (current, best win, best loss)) streaks - returns how many players changed"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            UPDATE players
+            SET current_streak = ?, best_win_streak = ?, best_loss_streak = ?
+            WHERE discord_id = ? AND server_id = ?
+              AND (COALESCE(current_streak, 0) != ? OR COALESCE(best_win_streak, 0) != ?
+                   OR COALESCE(best_loss_streak, 0) != ?)
+        ''', [(current, best_win, best_loss, str(discord_id), str(server_id), current, best_win, best_loss)
+              for discord_id, (current, best_win, best_loss) in streaks])
+        changed = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return changed
+    
+    def get_streak_record(self, server_id: str, kind: str = 'win') -> Optional[Dict]:
+        """Player with the longest win (or loss) streak on the server - walks the streak index, no full scan"""
+        column = 'best_win_streak' if kind == 'win' else 'best_loss_streak'
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT discord_id, {column}, current_streak, elo, display_name, discord_name
+            FROM players
+            WHERE server_id = ? AND {column} > 0
+              AND NOT (CAST(discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+            ORDER BY {column} DESC
+            LIMIT 1
+        ''', (str(server_id),))
+        row = cursor.fetchone()
+        
+        conn.close()
+        if not row:
+            return None
+        return {
+            'discord_id': row[0],
+            'streak': row[1],
+            'current_streak': row[2] or 0,
+            'elo': row[3],
+            'display_name': row[4],
+            'discord_name': row[5]
+        }
+    
+    # Pair statistics operations
+    @staticmethod
+    def _pair_deltas(red_team: List[str], blue_team: List[str], winner: str) -> Dict[Tuple[str, str], List[int]]:
+        """{(player_a, player_b): [together, together_wins, together_losses, against, a_wins, b_wins]} for one PUG"""
+        deltas = {}
+        for team, players in (('red', red_team), ('blue', blue_team)):
+            players = sorted(map(str, players))
+            won = 1 if winner == team else 0
+            lost = 1 if winner in ('red', 'blue') and winner != team else 0
+            for i, player_a in enumerate(players):
+                for player_b in players[i + 1:]:
+                    deltas[(player_a, player_b)] = [1, won, lost, 0, 0, 0]
+        for red in map(str, red_team):
+            for blue in map(str, blue_team):
+                player_a, player_b = min(red, blue), max(red, blue)
+                a_team = 'red' if player_a == red else 'blue'
+                b_team = 'blue' if a_team == 'red' else 'red'
+                deltas[(player_a, player_b)] = [0, 0, 0, 1, 1 if winner == a_team else 0, 1 if winner == b_team else 0]
+        return deltas
+    
+    def _update_pair_stats(self, cursor, server_id: str, pug_id: int, step: int):
+        """Add (step=1) or take back (step=-1) a decided PUG's pair results using an open cursor"""
+        cursor.execute('SELECT winner FROM pugs WHERE pug_id = ?', (pug_id,))
+        row = cursor.fetchone()
+        if not row or row[0] not in ('red', 'blue', 'split'):
+            return
+        cursor.execute('SELECT discord_id, team FROM pug_teams WHERE pug_id = ?', (pug_id,))
+        teams = cursor.fetchall()
+        red_team = [discord_id for discord_id, team in teams if team == 'red']
+        blue_team = [discord_id for discord_id, team in teams if team == 'blue']
+        self._write_pair_deltas(cursor, server_id, self._pair_deltas(red_team, blue_team, row[0]), step)
+    
+    def _write_pair_deltas(self, cursor, server_id: str, deltas: Dict[Tuple[str, str], List[int]], step: int = 1):
+        cursor.executemany('''
+            INSERT INTO pair_stats (server_id, player_a, player_b, together, together_wins, together_losses,
+                                    against, a_wins, b_wins)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (server_id, player_a, player_b) DO UPDATE SET
+                together = together + excluded.together,
+                together_wins = together_wins + excluded.together_wins,
+                together_losses = together_losses + excluded.together_losses,
+                against = against + excluded.against,
+                a_wins = a_wins + excluded.a_wins,
+                b_wins = b_wins + excluded.b_wins
+        ''', [(str(server_id), player_a, player_b, *(value * step for value in counts))
+              for (player_a, player_b), counts in deltas.items()])
+    
+    def rebuild_pair_stats(self, server_id: str) -> int:
+        """Recompute a server's pair statistics from its decided PUGs in one pass - returns the number of pairs"""
+        totals = {}
+        for pug_id, game_mode, winner, red_team, blue_team, *_ in self.iter_settled_pugs(server_id):
+            for pair, counts in self._pair_deltas(red_team, blue_team, winner).items():
+                total = totals.get(pair)
+                if total is None:
+                    totals[pair] = counts
+                else:
+                    for i, value in enumerate(counts):
+                        total[i] += value
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM pair_stats WHERE server_id = ?', (str(server_id),))
+        self._write_pair_deltas(cursor, server_id, totals)
+        conn.commit()
+        conn.close()
+        return len(totals)
+    
+    def get_pair_stats(self, server_id: str, player_1: str, player_2: str) -> Dict:
+        """Together and head-to-head record of two players, from player_1's side (one primary key lookup)"""
+        player_1, player_2 = str(player_1), str(player_2)
+        player_a, player_b = min(player_1, player_2), max(player_1, player_2)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT together, together_wins, together_losses, against, a_wins, b_wins
+            FROM pair_stats
+            WHERE server_id = ? AND player_a = ? AND player_b = ?
+        ''', (str(server_id), player_a, player_b))
+        row = cursor.fetchone() or (0, 0, 0, 0, 0, 0)
+        
+        conn.close()
+        together, together_wins, together_losses, against, a_wins, b_wins = row
+        wins, losses = (a_wins, b_wins) if player_1 == player_a else (b_wins, a_wins)
+        return {
+            'together': together,
+            'together_wins': together_wins,
+            'together_losses': together_losses,
+            'together_splits': together - together_wins - together_losses,
+            'against': against,
+            'wins': wins,
+            'losses': losses,
+            'splits': against - a_wins - b_wins
+        }
+    
+    def get_partner_stats(self, server_id: str, discord_id: str, min_games: int = 5) -> List[Dict]:
+        """Everyone a player has teamed with at least min_games times (index lookups on both pair columns)"""
+        discord_id = str(discord_id)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT player_b, together, together_wins, together_losses FROM pair_stats
+            WHERE server_id = ? AND player_a = ? AND together >= ?
+            UNION ALL
+            SELECT player_a, together, together_wins, together_losses FROM pair_stats
+            WHERE server_id = ? AND player_b = ? AND together >= ?
+        ''', (str(server_id), discord_id, min_games, str(server_id), discord_id, min_games))
+        
+        partners = [{
+            'discord_id': row[0],
+            'together': row[1],
+            'together_wins': row[2],
+            'together_losses': row[3]
+        } for row in cursor.fetchall()]
+        
+        conn.close()
+        return partners
+    
+    # Prediction tracking operations
+    PREDICTION_BUCKETS = 5  # 50-60%, 60-70%, 70-80%, 80-90%, 90-100% for the favourite
+    
+    def _write_prediction_result(self, cursor, server_id: str, game_mode: str, predicted_red_win: float,
+                                 winner: str, step: int):
+        """Add (step=1) or take back (step=-1) one decided prediction in the calibration table"""
+        red_won = 1.0 if winner == 'red' else 0.0
+        favourite_prob = max(predicted_red_win, 1 - predicted_red_win)
+        favourite_won = 1 if (predicted_red_win >= 0.5) == (winner == 'red') else 0
+        bucket = min(int((favourite_prob - 0.5) * 10), self.PREDICTION_BUCKETS - 1)
+        result_prob = min(max(predicted_red_win if red_won else 1 - predicted_red_win, 1e-12), 1.0)
+        cursor.execute('''
+            INSERT INTO prediction_calibration (server_id, game_mode, bucket, predictions, favourite_prob_sum,
+                                                favourite_wins, brier_sum, log_loss_sum)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (server_id, game_mode, bucket) DO UPDATE SET
+                predictions = predictions + excluded.predictions,
+                favourite_prob_sum = favourite_prob_sum + excluded.favourite_prob_sum,
+                favourite_wins = favourite_wins + excluded.favourite_wins,
+                brier_sum = brier_sum + excluded.brier_sum,
+                log_loss_sum = log_loss_sum + excluded.log_loss_sum
+        ''', (str(server_id), game_mode, bucket, step, step * favourite_prob, step * favourite_won,
+              step * (predicted_red_win - red_won) ** 2, step * -math.log(result_prob)))
+    
+    def _update_prediction_stats(self, cursor, server_id: str, pug_id: int, step: int):
+        """Fold a settled PUG's stored prediction in (or out) using an open cursor - splits aren't scored"""
+        cursor.execute('SELECT game_mode, winner, predicted_red_win FROM pugs WHERE pug_id = ?', (pug_id,))
+        row = cursor.fetchone()
+        if row and row[1] in ('red', 'blue') and row[2] is not None:
+            self._write_prediction_result(cursor, server_id, row[0], row[2], row[1], step)
+    
+    def get_prediction_calibration(self, server_id: str) -> Dict[str, Dict]:
+        """{game_mode: {'predictions', 'brier', 'log_loss', 'accuracy', 'buckets'}} from the running totals
+        
+        buckets: [{'low', 'high', 'predictions', 'predicted', 'actual'}] - predicted/actual are the
+        favourite's average win probability and how often the favourite really won
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT game_mode, bucket, predictions, favourite_prob_sum, favourite_wins, brier_sum, log_loss_sum
+            FROM prediction_calibration
+            WHERE server_id = ? AND predictions > 0
+            ORDER BY game_mode, bucket
+        ''', (str(server_id),))
+        
+        modes = {}
+        for game_mode, bucket, predictions, prob_sum, favourite_wins, brier_sum, log_loss_sum in cursor.fetchall():
+            mode = modes.setdefault(game_mode, {'predictions': 0, 'favourite_wins': 0, 'brier_sum': 0.0,
+                                                'log_loss_sum': 0.0, 'buckets': []})
+            mode['predictions'] += predictions
+            mode['favourite_wins'] += favourite_wins
+            mode['brier_sum'] += brier_sum
+            mode['log_loss_sum'] += log_loss_sum
+            mode['buckets'].append({
+                'low': 0.5 + bucket / 10,
+                'high': 0.6 + bucket / 10,
+                'predictions': predictions,
+                'predicted': prob_sum / predictions,
+                'actual': favourite_wins / predictions
+            })
+        
+        conn.close()
+        return {game_mode: {
+            'predictions': mode['predictions'],
+            'brier': mode['brier_sum'] / mode['predictions'],
+            'log_loss': mode['log_loss_sum'] / mode['predictions'],
+            'accuracy': mode['favourite_wins'] / mode['predictions'],
+            'buckets': mode['buckets']
+        } for game_mode, mode in modes.items()}
+    
+    def get_recent_predictions(self, server_id: str, limit: int = 100, game_mode: str = None) -> List[Tuple[float, str]]:
+        """(predicted_red_win, winner) of the last decided, non-split PUGs, newest first - for rolling scores"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT predicted_red_win, winner FROM pugs
+            WHERE server_id = ? AND winner IN ('red', 'blue') AND predicted_red_win IS NOT NULL
+              AND COALESCE(status, 'active') != 'killed'
+              AND (? IS NULL OR game_mode = ?)
+            ORDER BY pug_id DESC
+            LIMIT ?
+        ''', (str(server_id), game_mode, game_mode, limit))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        return rows
+    
+    # Player aggregate operations
+    AGGREGATE_RECENT = 10  # PUGs in the "Last 10 PUGs" net change
+    AGGREGATE_KEEP = 20    # Changes kept per player, so undoing recent PUGs doesn't shorten the window
+    
+    @staticmethod
+    def _mode_result(mode_records: Dict, game_mode: str, score: float, step: int):
+        record = mode_records.setdefault(game_mode, {'wins': 0, 'losses': 0, 'splits': 0})
+        key = 'splits' if score == 0.5 else ('wins' if score == 1 else 'losses')
+        record[key] = max(record[key] + step, 0)
+    
+    def _update_player_aggregates(self, cursor, server_id: str, pug_id: int, game_mode: str,
+                                  results: List[Tuple], undo: bool = False):
+        """Fold one PUG result into (or out of) the players' aggregates using an open cursor
+        
+        results: (discord_id, score, server ELO change or None). Players without an aggregate row
+        are skipped - their row is built from history the next time it is read.
+        """
+        if not results:
+            return
+        ids = [str(r[0]) for r in results]
+        placeholders = ','.join('?' * len(ids))
+        cursor.execute(f'''
+            SELECT discord_id, recent_changes, last_pug_id, last_played, mode_records
+            FROM player_aggregates
+            WHERE server_id = ? AND discord_id IN ({placeholders})
+        ''', (str(server_id), *ids))
+        existing = {row[0]: row[1:] for row in cursor.fetchall()}
+        
+        rows = []
+        for discord_id, score, change in results:
+            if str(discord_id) not in existing:
+                continue
+            recent_json, last_pug_id, last_played, modes_json = existing[str(discord_id)]
+            recent = [entry for entry in json.loads(recent_json or '[]') if entry[0] != pug_id]
+            mode_records = json.loads(modes_json or '{}')
+            if undo:
+                self._mode_result(mode_records, game_mode, score, -1)
+                if last_pug_id == pug_id:
+                    cursor.execute('''
+                        SELECT p.pug_id, p.timestamp
+                        FROM pug_teams t
+                        JOIN pugs p ON p.pug_id = t.pug_id
+                        WHERE t.discord_id = ? AND p.server_id = ? AND p.pug_id != ?
+                          AND p.winner IN ('red', 'blue', 'split')
+                          AND COALESCE(p.status, 'active') != 'killed'
+                        ORDER BY p.pug_id DESC LIMIT 1
+                    ''', (str(discord_id), str(server_id), pug_id))
+                    previous = cursor.fetchone()
+                    last_pug_id, last_played = previous if previous else (None, None)
+            else:
+                self._mode_result(mode_records, game_mode, score, 1)
+                if change is not None:
+                    recent.append([pug_id, change])
+                    recent.sort(key=lambda entry: entry[0], reverse=True)
+                    recent = recent[:self.AGGREGATE_KEEP]
+                if last_pug_id is None or pug_id >= last_pug_id:
+                    last_pug_id = pug_id
+                    last_played = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            rows.append(self._aggregate_row(server_id, discord_id, recent, last_pug_id, last_played, mode_records))
+        
+        self._write_player_aggregates(cursor, rows)
+    
+    def _aggregate_row(self, server_id: str, discord_id: str, recent: List, last_pug_id: Optional[int],
+                       last_played: Optional[str], mode_records: Dict) -> Tuple:
+        window = [change for _, change in recent[:self.AGGREGATE_RECENT]]
+        return (str(server_id), str(discord_id), window[0] if window else None, sum(window),
+                json.dumps(recent), last_pug_id, last_played, json.dumps(mode_records))
+    
+    def _write_player_aggregates(self, cursor, rows: List[Tuple]):
+        cursor.executemany('''
+            INSERT OR REPLACE INTO player_aggregates (server_id, discord_id, last_change, net_last_10,
+                                                      recent_changes, last_pug_id, last_played, mode_records)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    
+    def rebuild_player_aggregates(self, server_id: str, discord_ids: List[str] = None, legacy_change=None) -> int:
+        """Recompute aggregates from PUG history (all of a server's players, or just some)
+        
+        legacy_change(avg_red, avg_blue, red_score) -> (red_change, blue_change) estimates the ELO
+        change of PUGs that predate the rating history; without it they only count towards W/L.
+        Returns the number of players rebuilt.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        params = [str(server_id)]
+        player_filter = ''
+        if discord_ids is not None:
+            if not discord_ids:
+                conn.close()
+                return 0
+            player_filter = f"AND t.discord_id IN ({','.join('?' * len(discord_ids))})"
+            params.extend(str(discord_id) for discord_id in discord_ids)
+        
+        cursor.execute(f'''
+            SELECT t.discord_id, p.pug_id, p.game_mode, p.winner, t.team, p.avg_red_elo, p.avg_blue_elo,
+                   p.timestamp, h.elo_after - h.elo_before, h.pool, h.pug_id IS NOT NULL
+            FROM pug_teams t
+            JOIN pugs p ON p.pug_id = t.pug_id
+            LEFT JOIN rating_history h ON h.pug_id = t.pug_id AND h.discord_id = t.discord_id
+            WHERE p.server_id = ?
+              AND p.winner IN ('red', 'blue', 'split')
+              AND COALESCE(p.status, 'active') != 'killed'
+              {player_filter}
+            ORDER BY t.discord_id, p.pug_id DESC
+        ''', params)
+        
+        players = {}
+        for discord_id, pug_id, game_mode, winner, team, avg_red, avg_blue, timestamp, change, pool, logged in cursor.fetchall():
+            player = players.get(discord_id)
+            if player is None:
+                # Newest PUG first, so the first row is the last one played
+                player = players[discord_id] = {'recent': [], 'last_pug_id': pug_id, 'last_played': timestamp,
+                                                'modes': {}}
+            red_score = 0.5 if winner == 'split' else (1.0 if winner == 'red' else 0.0)
+            score = red_score if team == 'red' else 1.0 - red_score
+            self._mode_result(player['modes'], game_mode, score, 1)
+            if len(player['recent']) >= self.AGGREGATE_KEEP or pool is not None:
+                continue
+            if not logged:
+                if legacy_change is None or avg_red is None or avg_blue is None:
+                    continue
+                red_change, blue_change = legacy_change(avg_red, avg_blue, red_score)
+                change = red_change if team == 'red' else blue_change
+            player['recent'].append([pug_id, change])
+        
+        rows = [self._aggregate_row(server_id, discord_id, player['recent'], player['last_pug_id'],
+                                    player['last_played'], player['modes'])
+                for discord_id, player in players.items()]
+        # Players with no decided PUGs still get a row, so they aren't rebuilt on every read
+        if discord_ids is not None:
+            rows.extend(self._aggregate_row(server_id, discord_id, [], None, None, {})
+                        for discord_id in map(str, discord_ids) if discord_id not in players)
+        else:
+            cursor.execute('SELECT discord_id FROM players WHERE server_id = ?', (str(server_id),))
+            rows.extend(self._aggregate_row(server_id, discord_id, [], None, None, {})
+                        for (discord_id,) in cursor.fetchall() if discord_id not in players)
+        
+        if discord_ids is None:
+            cursor.execute('DELETE FROM player_aggregates WHERE server_id = ?', (str(server_id),))
+        self._write_player_aggregates(cursor, rows)
+        
+        conn.commit()
+        conn.close()
+        return len(rows)
+    
+    def get_player_summary(self, discord_id: str, server_id: str) -> Optional[Dict]:
+        """Everything .mystats/.stats show, in one query: player row, aggregates and leaderboard position
+        
+        'aggregated' is False when the player has no aggregate row yet (see rebuild_player_aggregates).
+        Position counts the players above on the ladder index - simulation players, and inactive
+        players when rating decay hides them, are left out as on the leaderboard.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            WITH hide AS (
+                SELECT COALESCE((SELECT enabled AND hide_inactive FROM rating_decay WHERE server_id = ?), 0) AS inactive
+            )
+            SELECT p.discord_id, p.wins, p.losses, p.total_pugs, p.elo, p.peak_elo, p.current_streak,
+                   a.discord_id IS NOT NULL, a.last_change, a.net_last_10, a.recent_changes, a.last_pug_id,
+                   a.last_played, a.mode_records,
+                   CASE WHEN CAST(p.discord_id AS INTEGER) BETWEEN 1000 AND 1999
+                          OR (hide.inactive AND p.inactive) THEN NULL
+                        ELSE (SELECT COUNT(*) FROM players o
+                              WHERE o.server_id = p.server_id AND o.elo > p.elo
+                                AND NOT (CAST(o.discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+                                AND NOT (hide.inactive AND COALESCE(o.inactive, 0))) + 1
+                   END,
+                   (SELECT COUNT(*) FROM players o
+                    WHERE o.server_id = p.server_id
+                      AND NOT (CAST(o.discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+                      AND NOT (hide.inactive AND COALESCE(o.inactive, 0)))
+            FROM players p
+            CROSS JOIN hide
+            LEFT JOIN player_aggregates a ON a.server_id = p.server_id AND a.discord_id = p.discord_id
+            WHERE p.discord_id = ? AND p.server_id = ?
+        ''', (str(server_id), str(discord_id), str(server_id)))
+        row = cursor.fetchone()
+        
+        conn.close()
+        if not row:
+            return None
+        recent = json.loads(row[10] or '[]')
+        return {
+            'discord_id': row[0],
+            'wins': row[1],
+            'losses': row[2],
+            'total_pugs': row[3],
+            'elo': row[4],
+            'peak_elo': row[5] if row[5] is not None else row[4],
+            'current_streak': row[6] or 0,
+            'aggregated': bool(row[7]),
+            'last_change': row[8],
+            'net_last_10': row[9] or 0,
+            'recent_changes': [change for _, change in recent[:self.AGGREGATE_RECENT]],
+            'last_pug_id': row[11],
+            'last_played': row[12],
+            'mode_records': json.loads(row[13] or '{}'),
+            'position': row[14],
+            'total_players': row[15]
+        }
+    
+    def get_mode_rating_engine(self, mode_name: str) -> str:
+        """Rating engine name for a game mode ('elo' if unset)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT rating_engine FROM game_modes WHERE mode_name = ?', (str(mode_name).lower(),))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row[0] if row and row[0] else 'elo'
+    
+    def get_mode_rating_engines(self) -> Dict[str, str]:
+        """{mode_name: rating engine} for every game mode"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT mode_name, COALESCE(rating_engine, 'elo') FROM game_modes")
+        engines = dict(cursor.fetchall())
+        
+        conn.close()
+        return engines
+    
+    def set_mode_rating_engine(self, mode_name: str, engine: str) -> bool:
+        """Set the rating engine for a game mode - False if the mode doesn't exist"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE game_modes SET rating_engine = ? WHERE mode_name = ?', (engine, mode_name.lower()))
+        updated = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def get_mode_rating_pool(self, mode_name: str) -> Optional[str]:
+        """Rating pool a game mode is rated in (None = the shared server ELO)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT rating_pool FROM game_modes WHERE mode_name = ?', (str(mode_name).lower(),))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row[0] if row and row[0] else None
+    
+    def get_mode_rating_pools(self) -> Dict[str, str]:
+        """{mode_name: rating pool} for every mode with its own pool"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT mode_name, rating_pool FROM game_modes WHERE rating_pool IS NOT NULL')
+        pools = dict(cursor.fetchall())
+        
+        conn.close()
+        return pools
+    
+    def set_mode_rating_pool(self, mode_name: str, pool: Optional[str]) -> bool:
+        """Rate a game mode in its own pool (None = back to the shared server ELO) - False if the mode doesn't exist"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE game_modes SET rating_pool = ? WHERE mode_name = ?',
+                      (pool.lower() if pool else None, mode_name.lower()))
+        updated = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def get_ratings(self, server_id: str, discord_ids: List[str], pool: str = None) -> Dict[str, Dict]:
+        """Ratings of several registered players in one query ({discord_id: rating})
+        
+        Each rating has elo, peak_elo, rating_deviation, rating_volatility, wins, losses and
+        total_pugs. Players who haven't played in a pool yet start from their server ELO with
+        no rating history.
+        """
+        if not discord_ids:
+            return {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(discord_ids))
+        ids = [str(discord_id) for discord_id in discord_ids]
+        if pool is None:
+            cursor.execute(f'''
+                SELECT discord_id, elo, peak_elo, rating_deviation, rating_volatility, wins, losses, total_pugs
+                FROM players
+                WHERE server_id = ? AND discord_id IN ({placeholders})
+            ''', (str(server_id), *ids))
+        else:
+            cursor.execute(f'''
+                SELECT p.discord_id, COALESCE(r.elo, p.elo), COALESCE(r.peak_elo, p.elo),
+                       r.rating_deviation, r.rating_volatility,
+                       COALESCE(r.wins, 0), COALESCE(r.losses, 0), COALESCE(r.games, 0)
+                FROM players p
+                LEFT JOIN player_ratings r
+                    ON r.server_id = p.server_id AND r.pool = ? AND r.discord_id = p.discord_id
+                WHERE p.server_id = ? AND p.discord_id IN ({placeholders})
+            ''', (pool, str(server_id), *ids))
+        
+        ratings = {row[0]: {
+            'elo': row[1],
+            'peak_elo': row[2],
+            'rating_deviation': row[3],
+            'rating_volatility': row[4],
+            'wins': row[5],
+            'losses': row[6],
+            'total_pugs': row[7]
+        } for row in cursor.fetchall()}
+        
+        conn.close()
+        return ratings
+    
+    def get_pool_leaderboard(self, server_id: str, pool: str, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """Highest rated players in a pool (walks the ladder index - cost grows with limit, not pool size)
+        
+        Inactive players are left out when rating decay hides them, as on the main leaderboard.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            WITH hide AS (
+                SELECT COALESCE((SELECT enabled AND hide_inactive FROM rating_decay WHERE server_id = ?), 0) AS inactive
+            )
+            SELECT r.discord_id, r.elo, r.peak_elo, r.wins, r.losses, r.games, p.display_name, p.discord_name
+            FROM player_ratings r
+            CROSS JOIN hide
+            LEFT JOIN players p ON p.discord_id = r.discord_id AND p.server_id = r.server_id
+            WHERE r.server_id = ? AND r.pool = ?
+              AND NOT (CAST(r.discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+              AND NOT (hide.inactive AND COALESCE(p.inactive, 0))
+            ORDER BY r.elo DESC
+            LIMIT ? OFFSET ?
+        ''', (str(server_id), str(server_id), pool, limit, offset))
+        
+        leaderboard = [{
+            'discord_id': row[0],
+            'elo': row[1],
+            'peak_elo': row[2],
+            'wins': row[3],
+            'losses': row[4],
+            'total_pugs': row[5],
+            'display_name': row[6],
+            'discord_name': row[7]
+        } for row in cursor.fetchall()]
+        
+        conn.close()
+        return leaderboard
+    
+    def get_pool_rank(self, server_id: str, pool: str, discord_id: str) -> Optional[Tuple[int, int]]:
+        """(rank, players in pool) for a player, or None if they haven't played in it (or are hidden as inactive)
+        
+        Counted on the (covering) ladder index, so no ranking is built in Python.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT r.elo, COALESCE((SELECT enabled AND hide_inactive FROM rating_decay WHERE server_id = r.server_id), 0)
+                   AND COALESCE(p.inactive, 0)
+            FROM player_ratings r
+            LEFT JOIN players p ON p.discord_id = r.discord_id AND p.server_id = r.server_id
+            WHERE r.server_id = ? AND r.pool = ? AND r.discord_id = ?
+        ''', (str(server_id), pool, str(discord_id)))
+        row = cursor.fetchone()
+        if not row or row[1]:
+            conn.close()
+            return None
+        
+        # Simulation players (IDs 1000-1999), and inactive players when rating decay hides them,
+        # are left off the ladder, as on the main leaderboard
+        cursor.execute('''
+            WITH hide AS (
+                SELECT COALESCE((SELECT enabled AND hide_inactive FROM rating_decay WHERE server_id = ?), 0) AS inactive
+            )
+            SELECT COUNT(CASE WHEN r.elo > ? THEN 1 END), COUNT(*)
+            FROM player_ratings r
+            CROSS JOIN hide
+            LEFT JOIN players p ON p.discord_id = r.discord_id AND p.server_id = r.server_id
+            WHERE r.server_id = ? AND r.pool = ?
+              AND NOT (CAST(r.discord_id AS INTEGER) BETWEEN 1000 AND 1999)
+              AND NOT (hide.inactive AND COALESCE(p.inactive, 0))
+        ''', (str(server_id), row[0], str(server_id), pool))
+        higher, total = cursor.fetchone()
+        
+        conn.close()
+        return higher + 1, total
+    
+    # Rating decay operations
+    DECAY_SETTINGS = ('enabled', 'inactive_days', 'decay_per_week', 'decay_floor', 'hide_inactive')
+    
+    def get_decay_settings(self, server_id: str) -> Dict:
+        """Rating decay settings for a server (defaults if never configured)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT enabled, inactive_days, decay_per_week, decay_floor, hide_inactive, last_run_at
+            FROM rating_decay WHERE server_id = ?
+        ''', (str(server_id),))
+        row = cursor.fetchone()
+        
+        conn.close()
+        if not row:
+            return {'enabled': False, 'inactive_days': 28, 'decay_per_week': 10.0,
+                    'decay_floor': 1000.0, 'hide_inactive': True, 'last_run_at': None}
+        return {
+            'enabled': bool(row[0]),
+            'inactive_days': row[1],
+            'decay_per_week': row[2],
+            'decay_floor': row[3],
+            'hide_inactive': bool(row[4]),
+            'last_run_at': row[5]
+        }
+    
+    def set_decay_setting(self, server_id: str, field: str, value):
+        """Change one rating decay setting - turning decay off clears inactive flags, turning it on restarts the clock"""
+        if field not in self.DECAY_SETTINGS:
+            raise ValueError(f"Unknown decay setting: {field}")
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT OR IGNORE INTO rating_decay (server_id) VALUES (?)', (str(server_id),))
+        cursor.execute(f'UPDATE rating_decay SET {field} = ? WHERE server_id = ?', (value, str(server_id)))
+        if field == 'enabled' and not value:
+            cursor.execute('UPDATE players SET inactive = 0 WHERE server_id = ? AND inactive = 1', (str(server_id),))
+        elif field == 'enabled':
+            # Decay counts from the moment it is turned on, not from the last pass before it was turned off
+            cursor.execute('UPDATE rating_decay SET last_run_at = ? WHERE server_id = ?',
+                           (datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), str(server_id)))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_decay_servers(self) -> List[str]:
+        """Servers with rating decay turned on"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT server_id FROM rating_decay WHERE enabled = 1')
+        servers = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+        return servers
+    
+    def run_rating_decay(self, server_id: str, force: bool = False) -> Optional[Dict]:
+        """Apply one decay pass for a server in a single transaction
+        
+        Players whose last PUG is older than inactive_days are flagged inactive and lose
+        decay_per_week ELO per week since the previous pass (never below decay_floor).
+        Runs at most once a day unless forced, and never while decay is off; returns None if skipped, else
+        {'days', 'decayed', 'flagged', 'inactive', 'total_decay'} (flagged = inactive flags changed).
+        """
+        settings = self.get_decay_settings(server_id)
+        if not settings['enabled']:
+            return None  # Never decay a server that has it off, forced or not
+        now = datetime.utcnow()
+        if settings['last_run_at']:
+            days = (now - datetime.strptime(settings['last_run_at'], '%Y-%m-%d %H:%M:%S')).total_seconds() / 86400
+            if days < 1 and not force:
+                return None
+            days = min(days, 365)
+        else:
+            days = 1.0  # First pass only takes one day's worth
+        
+        run_at = now.strftime('%Y-%m-%d %H:%M:%S')
+        cutoff = (now - timedelta(days=settings['inactive_days'])).strftime('%Y-%m-%d %H:%M:%S')
+        amount = settings['decay_per_week'] * days / 7
+        floor = settings['decay_floor']
+        sid = str(server_id)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Audit trail + replay ledger first (same selection the UPDATE below decays)
+            decayed = 0
+            total_decay = 0.0
+            if amount > 0:
+                cursor.execute('''
+                    INSERT INTO rating_decay_log (run_at, server_id, discord_id, last_pug_at, elo_before, elo_after)
+                    SELECT ?, server_id, discord_id, last_pug_at, elo, MAX(?, elo - ?)
+                    FROM players
+                    WHERE server_id = ? AND last_pug_at < ? AND elo > ?
+                ''', (run_at, floor, amount, sid, cutoff, floor))
+                decayed = cursor.rowcount
+                cursor.execute('''
+                    SELECT COALESCE(SUM(elo - MAX(?, elo - ?)), 0) FROM players
+                    WHERE server_id = ? AND last_pug_at < ? AND elo > ?
+                ''', (floor, amount, sid, cutoff, floor))
+                total_decay = cursor.fetchone()[0]
+                cursor.execute('''
+                    INSERT INTO rating_adjustments (server_id, discord_id, after_pug_id, after_seq,
+                                                    elo_delta, elo_floor, source)
+                    SELECT server_id, discord_id,
+                           COALESCE((SELECT pug_id FROM pugs WHERE pugs.server_id = players.server_id
+                                     AND settled_seq IS NOT NULL ORDER BY settled_seq DESC LIMIT 1), 0),
+                           COALESCE((SELECT MAX(settled_seq) FROM pugs WHERE pugs.server_id = players.server_id), 0),
+                           ?, ?, 'decay'
+                    FROM players
+                    WHERE server_id = ? AND last_pug_at < ? AND elo > ?
+                ''', (-amount, floor, sid, cutoff, floor))
+            
+            cursor.execute('''
+                SELECT COUNT(*) FROM players
+                WHERE server_id = ? AND (last_pug_at < ? OR inactive = 1)
+                  AND inactive != (CASE WHEN last_pug_at < ? THEN 1 ELSE 0 END)
+            ''', (sid, cutoff, cutoff))
+            flagged = cursor.fetchone()[0]
+            
+            # One set-based pass: decay ELO and refresh inactive flags (index on server_id, last_pug_at)
+            cursor.execute('''
+                UPDATE players
+                SET elo = CASE WHEN last_pug_at < ? AND elo > ? THEN MAX(?, elo - ?) ELSE elo END,
+                    inactive = CASE WHEN last_pug_at < ? THEN 1 ELSE 0 END
+                WHERE server_id = ? AND (last_pug_at < ? OR inactive = 1)
+            ''', (cutoff, floor, floor, amount, cutoff, sid, cutoff))
+            
+            cursor.execute('SELECT COUNT(*) FROM players WHERE server_id = ? AND inactive = 1', (sid,))
+            inactive = cursor.fetchone()[0]
+            
+            cursor.execute('INSERT OR IGNORE INTO rating_decay (server_id) VALUES (?)', (sid,))
+            cursor.execute('UPDATE rating_decay SET last_run_at = ? WHERE server_id = ?', (run_at, sid))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return {'days': days, 'decayed': decayed, 'flagged': flagged, 'inactive': inactive, 'total_decay': total_decay}
+    
+    # Timeout operations
+    def add_timeout(self, discord_id: str, timeout_end: datetime):
+        """Add a timeout for a player"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO timeouts (discord_id, timeout_end)
+            VALUES (?, ?)
+        ''', (str(discord_id), timeout_end.isoformat()))
+        
+        conn.commit()
+        conn.close()
+    
+    def is_timed_out(self, discord_id: str) -> Tuple[bool, Optional[datetime]]:
+        """Check if player is timed out"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT timeout_end FROM timeouts WHERE discord_id = ?', 
+                      (str(discord_id),))
+        row = cursor.fetchone()
+        
+        if row:
+            timeout_end = datetime.fromisoformat(row[0])
+            if datetime.now() < timeout_end:
+                conn.close()
+                return True, timeout_end
+            else:
+                # Timeout expired, remove it
+                cursor.execute('DELETE FROM timeouts WHERE discord_id = ?', 
+                             (str(discord_id),))
+                conn.commit()
+        
+        conn.close()
+        return False, None
+    
+    # DM delivery operations
+    def get_dm_failures(self, since: datetime = None) -> Dict[str, datetime]:
+        """{discord_id: last failure} for users whose DMs are closed (failures after `since` only)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT discord_id, last_failed_at FROM dm_failures
+            WHERE ? IS NULL OR last_failed_at >= ?
+        ''', (since.strftime('%Y-%m-%d %H:%M:%S') if since else None,) * 2)
+        failures = {discord_id: datetime.strptime(failed_at, '%Y-%m-%d %H:%M:%S')
+                    for discord_id, failed_at in cursor.fetchall()}
+        
+        conn.close()
+        return failures
+    
+    def record_dm_failure(self, discord_id: str, reason: str):
+        """Remember that a user can't be DMed"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO dm_failures (discord_id, reason, failures, last_failed_at)
+            VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (discord_id) DO UPDATE SET
+                reason = excluded.reason,
+                failures = failures + 1,
+                last_failed_at = CURRENT_TIMESTAMP
+        ''', (str(discord_id), reason))
+        
+        conn.commit()
+        conn.close()
+    
+    def clear_dm_failure(self, discord_id: str) -> bool:
+        """Forget a DM failure (the user can be DMed again)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM dm_failures WHERE discord_id = ?', (str(discord_id),))
+        cleared = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        return cleared
+    
+    # Leaderboard message operations
+    def get_leaderboard_messages(self, server_id: str) -> Optional[Dict]:
+        """{'channel_id', 'message_ids', 'digests'} of the server's leaderboard, in chunk order (None if never posted)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT channel_id, message_id, digest FROM leaderboard_messages
+            WHERE server_id = ?
+            ORDER BY chunk_idx
+        ''', (str(server_id),))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        if not rows:
+            return None
+        return {
+            'channel_id': int(rows[0][0]),
+            'message_ids': [int(row[1]) for row in rows],
+            'digests': [row[2] for row in rows]
+        }
+    
+    def save_leaderboard_messages(self, server_id: str, channel_id, message_ids: List, digests: List):
+        """Replace the server's stored leaderboard messages"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM leaderboard_messages WHERE server_id = ?', (str(server_id),))
+        cursor.executemany('''
+            INSERT INTO leaderboard_messages (server_id, chunk_idx, channel_id, message_id, digest)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(str(server_id), idx, str(channel_id), str(message_id), digests[idx] if idx < len(digests) else None)
+              for idx, message_id in enumerate(message_ids)])
+        
+        conn.commit()
+        conn.close()
+    
+    def clear_leaderboard_messages(self, server_id: str):
+        """Forget the server's leaderboard messages"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM leaderboard_messages WHERE server_id = ?', (str(server_id),))
+        
+        conn.commit()
         conn.close()
-        return False, None
     
     # PUG Admin operations
     def add_pug_admin(self, discord_id: str, server_id: str):
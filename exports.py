@@ -0,0 +1,110 @@
+"""
+PUG Pro Discord Bot - CSV Exports
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Builds the .exportstats files: player stats, match history and the per-match ELO ledger.
+Rows are streamed from the database cursor through the csv module straight into a gzip
+buffer, and names come from the member cache or the names stored with each player, so an
+export of thousands of players makes no Discord API calls.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import csv
+import gzip
+import io
+from typing import Callable, Dict, Iterable, Tuple
+
+from names import stored_name
+
+PLAYER_HEADER = ["Discord ID", "Display Name", "ELO", "Peak ELO", "Total PUGs", "Wins", "Losses",
+                 "Win Rate", "Current Streak"]
+MATCH_HEADER = ["PUG ID", "Date", "Mode", "Winner", "Status", "Red Avg ELO", "Blue Avg ELO",
+                "Tiebreaker Map", "Red Team", "Blue Team"]
+LEDGER_HEADER = ["PUG ID", "Date", "Mode", "Discord ID", "Display Name", "Pool", "Engine", "Score",
+                 "ELO Before", "ELO After", "Change"]
+
+
+def write_csv_gz(header: list, rows: Iterable[list]) -> Tuple[io.BytesIO, int]:
+    """gzip-compressed CSV of the rows, written as they come - returns (buffer at start, row count)"""
+    buffer = io.BytesIO()
+    count = 0
+    with io.TextIOWrapper(gzip.GzipFile(fileobj=buffer, mode='wb'), encoding='utf-8', newline='') as text:
+        writer = csv.writer(text)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    buffer.seek(0)
+    return buffer, count
+
+
+def read_csv_text(filename: str, content: bytes) -> str:
+    """Text of an uploaded .csv or .csv.gz attachment"""
+    if filename.lower().endswith('.gz'):
+        content = gzip.decompress(content)
+    return content.decode('utf-8-sig')
+
+
+def _fmt(value, spec: str = '.0f') -> str:
+    return format(value, spec) if value is not None else ''
+
+
+def player_rows(players: Iterable[Dict], member_names: Dict[str, str]):
+    for player in players:
+        discord_id = player['discord_id']
+        name = member_names.get(discord_id) or stored_name(player) or f"User {discord_id}"
+        elo = player['elo']
+        wins = player['wins']
+        losses = player['losses']
+        # Win rate based on actual games (wins + losses), not total_pugs
+        actual_games = wins + losses
+        win_rate = (wins / actual_games * 100) if actual_games > 0 else 0
+        yield [discord_id, name, f"{elo:.0f}", f"{(player['peak_elo'] or elo):.0f}", player['total_pugs'],
+               wins, losses, f"{win_rate:.1f}%", player['current_streak'] or 0]
+
+
+def match_rows(matches: Iterable[Dict], name_for: Callable[[str], str]):
+    for match in matches:
+        yield [match['pug_id'], match['timestamp'], match['game_mode'], match['winner'] or '', match['status'],
+               _fmt(match['avg_red_elo']), _fmt(match['avg_blue_elo']), match['tiebreaker_map'] or '',
+               "; ".join(name_for(uid) for uid in match['red_team']),
+               "; ".join(name_for(uid) for uid in match['blue_team'])]
+
+
+def ledger_rows(entries: Iterable[Dict], name_for: Callable[[str], str]):
+    for entry in entries:
+        yield [entry['pug_id'], entry['timestamp'] or '', entry['game_mode'] or '', entry['discord_id'],
+               name_for(entry['discord_id']), entry['pool'] or '', entry['engine'], _fmt(entry['score'], 'g'),
+               _fmt(entry['elo_before']), _fmt(entry['elo_after']),
+               _fmt(entry['elo_after'] - entry['elo_before'], '+.0f')]
+
+
+EXPORT_KINDS = ('players', 'matches', 'ledger')
+
+
+def build_export(db, kind: str, server_id: str, member_names: Dict[str, str]) -> Tuple[io.BytesIO, int]:
+    """One export as (gzip CSV buffer, row count) - member_names: {discord_id: name} from the member cache
+
+    Meant to run in a worker thread (asyncio.to_thread); it only touches the database.
+    """
+    if kind == 'players':
+        return write_csv_gz(PLAYER_HEADER, player_rows(db.iter_player_stats(server_id), member_names))
+
+    # Team lists and the ledger name players who may have left - fall back to their stored names
+    names = {player['discord_id']: stored_name(player) for player in db.iter_player_stats(server_id)}
+    names.update(member_names)
+
+    def name_for(discord_id: str) -> str:
+        return names.get(discord_id) or f"User {discord_id}"
+
+    if kind == 'matches':
+        return write_csv_gz(MATCH_HEADER, match_rows(db.iter_match_history(server_id), name_for))
+    if kind == 'ledger':
+        return write_csv_gz(LEDGER_HEADER, ledger_rows(db.iter_rating_history(server_id), name_for))
+    raise ValueError(f"Unknown export '{kind}' (use {', '.join(EXPORT_KINDS)})")
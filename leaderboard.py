@@ -0,0 +1,85 @@
+"""
+PUG Pro Discord Bot - Leaderboard Layout
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Renders the #leaderboard ladder as 3-column text chunks (one embed each) and fingerprints
+every chunk, so an auto-update only edits the messages whose text actually changed. When
+the ladder grows or shrinks, diff_layout works out which messages to add or remove.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+CHUNK_LINES = 60     # Lines per leaderboard message (3 players per line = 180 players)
+NAME_WIDTH = 8       # Names longer than this are cut to 5 chars + "..."
+
+
+def short_name(name: str) -> str:
+    """Name as shown in the ladder (discriminator dropped, long names cut)"""
+    if '#' in name:
+        name = name.split('#')[0]
+    if len(name) > NAME_WIDTH:
+        name = name[:5] + "..."
+    return name
+
+
+def format_ladder_lines(entries: List[Dict]) -> List[str]:
+    """3-column lines going down columns - entries: [{'rank', 'name', 'elo'}] in rank order"""
+    total_players = len(entries)
+    players_per_column = (total_players + 2) // 3  # Round up, divide by 3 columns
+    lines = []
+    for row_idx in range(players_per_column):
+        columns = []
+        for col_idx in range(3):
+            player_idx = row_idx + (col_idx * players_per_column)
+            if player_idx < total_players:
+                entry = entries[player_idx]
+                rank_str = f"#{entry['rank']}".ljust(4)      # "#1  " (4 chars)
+                name_str = entry['name'].ljust(NAME_WIDTH)    # "Name    " (8 chars)
+                elo_str = str(entry['elo']).ljust(4)          # "1850" (4 chars)
+                columns.append(f"{rank_str}{name_str}{elo_str}")
+            else:
+                columns.append(" " * 16)
+        # Columns joined with 2 spaces (52 chars), trailing spaces of incomplete rows removed
+        lines.append("  ".join(columns).rstrip())
+    return lines
+
+
+def render_chunks(entries: List[Dict], chunk_lines: int = CHUNK_LINES) -> List[str]:
+    """Ladder text for each leaderboard message"""
+    lines = format_ladder_lines(entries)
+    return ["\n".join(lines[i:i + chunk_lines]) for i in range(0, len(lines), chunk_lines)]
+
+
+def chunk_digest(chunk_idx: int, text: str, total_players: int) -> str:
+    """Fingerprint of what a chunk shows - the first chunk's footer player count is included,
+    its "Last Updated" time is not (so an unchanged ladder isn't re-edited just for the clock)"""
+    key = f"{chunk_idx}\n{total_players if chunk_idx == 0 else ''}\n{text}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def diff_layout(old_digests: List[Optional[str]], new_digests: List[str]) -> Dict[str, List[int]]:
+    """Fewest message operations to turn the posted layout into the new one
+
+    Chunks are positional (message N shows lines 60*N onwards), so chunk N is compared with
+    message N: unchanged ones are kept, changed ones edited, extra chunks created at the end
+    and leftover messages deleted. Unknown old digests (None) always count as changed.
+    Returns {'keep', 'edit', 'create', 'delete'} -> chunk indexes.
+    """
+    shared = min(len(old_digests), len(new_digests))
+    plan = {'keep': [], 'edit': [], 'create': [], 'delete': []}
+    for idx in range(shared):
+        if old_digests[idx] is not None and old_digests[idx] == new_digests[idx]:
+            plan['keep'].append(idx)
+        else:
+            plan['edit'].append(idx)
+    plan['create'] = list(range(shared, len(new_digests)))
+    plan['delete'] = list(range(shared, len(old_digests)))
+    return plan
@@ -0,0 +1,52 @@
+"""
+PUG Pro Discord Bot - Command Latency
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Keeps how long each command takes to run (from invoke to done), so slow commands show
+up in .status.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+from collections import deque
+from typing import Dict, List
+
+LATENCY_SAMPLES = 100   # Recent runs kept per command for the p95
+
+
+class CommandLatency:
+    """Per-command run count, average, 95th percentile and worst time"""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.samples = samples
+        self.commands: Dict[str, Dict] = {}
+
+    def record(self, command: str, seconds: float):
+        entry = self.commands.get(command)
+        if entry is None:
+            entry = self.commands[command] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                              'recent': deque(maxlen=self.samples)}
+        entry['count'] += 1
+        entry['total'] += seconds
+        entry['max'] = max(entry['max'], seconds)
+        entry['recent'].append(seconds)
+
+    def stats(self) -> List[Dict]:
+        """[{'command', 'count', 'avg', 'p95', 'max'}] in seconds, slowest (by p95) first"""
+        rows = []
+        for command, entry in self.commands.items():
+            recent = sorted(entry['recent'])
+            rows.append({
+                'command': command,
+                'count': entry['count'],
+                'avg': entry['total'] / entry['count'],
+                'p95': recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                'max': entry['max']
+            })
+        rows.sort(key=lambda row: row['p95'], reverse=True)
+        return rows
@@ -0,0 +1,119 @@
+"""
+PUG Pro Discord Bot - Player Names
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Turns player ids into display names for rankings and exports without a REST call per
+player: the gateway member/user cache is tried first, then the names stored in the
+database, and only players with neither are fetched from the API - concurrently, a few
+at a time, and remembered for a while.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable
+
+NAME_FETCH_CONCURRENCY = 5   # API lookups in flight at once
+NAME_CACHE_TTL = 3600        # Seconds a fetched name is reused
+
+
+def stored_name(player: Dict) -> str:
+    """Name saved with the player row (discriminator dropped), or '' if none"""
+    name = player.get('display_name') or player.get('discord_name') or ''
+    if '#' in name:
+        name = name.split('#')[0]
+    return name
+
+
+class NameResolver:
+    """Display names for many players at once, cache first
+
+    get_user: discord_id -> cached user or None (e.g. bot.get_user)
+    fetch_user: coroutine function discord_id -> user, may raise (e.g. bot.fetch_user)
+    """
+
+    def __init__(self, get_user, fetch_user, concurrency: int = NAME_FETCH_CONCURRENCY,
+                 ttl: float = NAME_CACHE_TTL):
+        self.get_user = get_user
+        self.fetch_user = fetch_user
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.ttl = ttl
+        self.fetched: Dict[str, tuple] = {}  # {discord_id: (name or '' if not found, fetched_at)}
+        self.cache_hits = 0
+        self.stored_hits = 0
+        self.api_calls = 0
+        self.failed = 0
+
+    async def names(self, guild, players: Iterable, fallback: str = "User_{}") -> Dict[str, str]:
+        """{discord_id: name} - players are player rows (dicts with discord_id and stored names) or bare ids"""
+        names = {}
+        missing = []
+        now = time.monotonic()
+        for player in players:
+            row = player if isinstance(player, dict) else {'discord_id': player}
+            discord_id = str(row['discord_id'])
+            name = self._cached_name(guild, discord_id)
+            if name:
+                self.cache_hits += 1
+            else:
+                name = stored_name(row)
+                if name:
+                    self.stored_hits += 1
+            if not name:
+                hit = self.fetched.get(discord_id)
+                if hit and now - hit[1] < self.ttl:
+                    # Fetched (or failed to) recently - don't ask the API again
+                    self.cache_hits += 1
+                    name = hit[0] or fallback.format(discord_id)
+            if name:
+                names[discord_id] = name
+            else:
+                missing.append(discord_id)
+
+        fetched = await asyncio.gather(*(self._fetch(discord_id) for discord_id in missing))
+        for discord_id, name in zip(missing, fetched):
+            names[discord_id] = name or fallback.format(discord_id)
+        return names
+
+    async def name(self, guild, player, fallback: str = "User_{}") -> str:
+        """Display name of one player"""
+        row = player if isinstance(player, dict) else {'discord_id': player}
+        return (await self.names(guild, [row], fallback))[str(row['discord_id'])]
+
+    def _cached_name(self, guild, discord_id: str) -> str:
+        try:
+            uid = int(discord_id)
+        except (TypeError, ValueError):
+            return ''
+        member = guild.get_member(uid) if guild else None
+        if member:
+            return member.display_name
+        user = self.get_user(uid)
+        return user.display_name if user else ''
+
+    async def _fetch(self, discord_id: str) -> str:
+        async with self.semaphore:
+            self.api_calls += 1
+            try:
+                user = await self.fetch_user(int(discord_id))
+            except Exception:
+                self.failed += 1
+                self.fetched[discord_id] = ('', time.monotonic())
+                return ''
+        self.fetched[discord_id] = (user.display_name, time.monotonic())
+        return user.display_name
+
+    def stats(self) -> Dict:
+        """{'cache_hits', 'stored_hits', 'api_calls', 'failed'} since startup"""
+        return {
+            'cache_hits': self.cache_hits,
+            'stored_hits': self.stored_hits,
+            'api_calls': self.api_calls,
+            'failed': self.failed
+        }
@@ -0,0 +1,382 @@
+"""
+PUG Pro Discord Bot - Outbound Messages
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Paces queue chatter (joins, promotions, ready check status lines) so busy channels stay
+under Discord's rate limits. Every channel gets its own FIFO queue and token bucket, and
+consecutive short status lines posted within a small window are sent as one message.
+DMs fan out concurrently in the background, and users who don't accept DMs are skipped.
+Live messages (the ready check) are edited at most once per window with their latest state.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# Discord allows about 5 messages per 5 seconds per channel
+SEND_RATE = 1.0          # Tokens added per second
+SEND_BURST = 5           # Sends allowed back to back
+COALESCE_WINDOW = 0.5    # Seconds to wait for more status lines to join a message
+MAX_MESSAGE_LENGTH = 2000
+IDLE_TIMEOUT = 60        # Seconds before an idle channel worker stops
+DM_CONCURRENCY = 5       # DMs in flight at once
+DM_RETRY_AFTER = timedelta(days=7)  # Try users with closed DMs again after this long
+EDIT_COALESCE_WINDOW = 1.0  # Seconds changes to a live message are gathered into one edit
+
+
+class TokenBucket:
+    """Classic token bucket - acquire() waits until a send is allowed"""
+
+    def __init__(self, rate: float = SEND_RATE, capacity: int = SEND_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping if the bucket is empty - returns the seconds waited"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        wait = (1 - self.tokens) / self.rate
+        await asyncio.sleep(wait)
+        self._refill()
+        self.tokens = max(self.tokens - 1, 0.0)
+        return wait
+
+
+class _Outgoing:
+    __slots__ = ('content', 'kwargs', 'coalesce', 'future', 'action')
+
+    def __init__(self, content: Optional[str], kwargs: Dict, coalesce: bool, future: Optional[asyncio.Future],
+                 action=None):
+        self.content = content
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.future = future
+        self.action = action
+
+
+class _ChannelState:
+    def __init__(self, channel, rate: float, burst: int):
+        self.channel = channel
+        self.queue = asyncio.Queue()
+        self.bucket = TokenBucket(rate, burst)
+        self.worker = None
+
+
+class OutboundScheduler:
+    """Per-channel outbound queues with token-bucket pacing and status line coalescing
+
+    post() queues a plain status line and returns at once; lines queued back to back are
+    joined into one message. send() queues anything else (embeds, or text whose Message is
+    needed) behind them, so order in the channel is kept, and returns the sent Message.
+    call() runs any other request on the channel (edit, delete) in the same queue and pacing.
+    """
+
+    def __init__(self, rate: float = SEND_RATE, burst: int = SEND_BURST,
+                 coalesce_window: float = COALESCE_WINDOW, max_length: int = MAX_MESSAGE_LENGTH):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_length = max_length
+        self.channels: Dict[int, _ChannelState] = {}
+        self.requested = 0
+        self.sent = 0
+        self.failed = 0
+        self.throttled_seconds = 0.0
+
+    def post(self, channel, content: str):
+        """Queue a status line (fire and forget - failures are logged)"""
+        self._enqueue(channel, _Outgoing(content, {}, True, None))
+
+    async def send(self, channel, content: Optional[str] = None, **kwargs):
+        """Queue a message in order with the channel's status lines and wait for it to be sent"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(channel, _Outgoing(content, kwargs, False, future))
+        return await future
+
+    async def call(self, channel, action):
+        """Queue an API call for the channel (a coroutine function, e.g. an edit) and return its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(channel, _Outgoing(None, {}, False, future, action))
+        return await future
+
+    def _enqueue(self, channel, item: _Outgoing):
+        self.requested += 1
+        state = self.channels.get(channel.id)
+        if state is None:
+            state = self.channels[channel.id] = _ChannelState(channel, self.rate, self.burst)
+        state.queue.put_nowait(item)
+        if state.worker is None or state.worker.done():
+            state.worker = asyncio.create_task(self._run(channel.id, state))
+
+    async def _run(self, channel_id: int, state: _ChannelState):
+        loop = asyncio.get_running_loop()
+        carry = None
+        while True:
+            if carry is not None:
+                item, carry = carry, None
+            else:
+                try:
+                    item = await asyncio.wait_for(state.queue.get(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if state.queue.empty():
+                        self.channels.pop(channel_id, None)
+                        return
+                    continue
+
+            batch = [item]
+            if item.coalesce:
+                # Gather the status lines that follow within the window (anything else ends the batch)
+                length = len(item.content)
+                deadline = loop.time() + self.coalesce_window
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        following = await asyncio.wait_for(state.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if not following.coalesce or length + 1 + len(following.content) > self.max_length:
+                        carry = following
+                        break
+                    batch.append(following)
+                    length += 1 + len(following.content)
+
+            self.throttled_seconds += await state.bucket.acquire()
+            await self._deliver(state.channel, batch)
+
+    async def _deliver(self, channel, batch: List[_Outgoing]):
+        head = batch[0]
+        content = "\n".join(item.content for item in batch) if head.coalesce else head.content
+        try:
+            if head.action is not None:
+                message = await head.action()
+            else:
+                message = await channel.send(content, **head.kwargs)
+            self.sent += 1
+            for item in batch:
+                if item.future is not None and not item.future.done():
+                    item.future.set_result(message)
+        except Exception as e:
+            self.failed += 1
+            for item in batch:
+                if item.future is not None and not item.future.done():
+                    item.future.set_exception(e)
+            if head.future is None:
+                print(f"⚠️ Could not send queued message to channel {getattr(channel, 'id', '?')}: {e}")
+
+    def stats(self) -> Dict:
+        """{'requested', 'sent', 'failed', 'pending', 'throttled_seconds'} since startup"""
+        return {
+            'requested': self.requested,
+            'sent': self.sent,
+            'failed': self.failed,
+            'pending': sum(state.queue.qsize() for state in self.channels.values()),
+            'throttled_seconds': self.throttled_seconds
+        }
+
+
+class DMDispatcher:
+    """Concurrent, bounded DM fan-out that never holds up the caller
+
+    resolve_user: coroutine function discord_id -> user (cache first, API if needed)
+    store: remembers users whose DMs are closed (get_dm_failures/record_dm_failure/clear_dm_failure)
+    closed_errors: exceptions that mean the user doesn't accept DMs (e.g. discord.Forbidden) -
+    those users are skipped until DM_RETRY_AFTER has passed
+    """
+
+    def __init__(self, resolve_user, store, closed_errors: tuple = (), concurrency: int = DM_CONCURRENCY,
+                 retry_after: timedelta = DM_RETRY_AFTER):
+        self.resolve_user = resolve_user
+        self.store = store
+        self.closed_errors = closed_errors
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.retry_after = retry_after
+        self.closed: Optional[Dict[str, datetime]] = None
+        self.sent = 0
+        self.skipped = 0
+        self.undeliverable = 0
+        self.failed = 0
+
+    def send(self, user_ids: Iterable, content: str) -> asyncio.Task:
+        """DM everyone in the background - returns the task (True/False per user) if anyone needs to wait"""
+        return asyncio.create_task(self._send_all(list(user_ids), content))
+
+    async def _send_all(self, user_ids: List, content: str) -> List[bool]:
+        if self.closed is None:
+            self.closed = await asyncio.to_thread(self.store.get_dm_failures, datetime.utcnow() - self.retry_after)
+        return await asyncio.gather(*(self._send_one(uid, content) for uid in user_ids))
+
+    async def _send_one(self, user_id, content: str) -> bool:
+        key = str(user_id)
+        failed_at = self.closed.get(key)
+        if failed_at and datetime.utcnow() - failed_at < self.retry_after:
+            self.skipped += 1
+            return False
+        async with self.semaphore:
+            try:
+                user = await self.resolve_user(user_id)
+                await user.send(content)
+            except self.closed_errors as e:
+                self.undeliverable += 1
+                self.closed[key] = datetime.utcnow()
+                await asyncio.to_thread(self.store.record_dm_failure, key, str(e))
+                return False
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ Could not DM {key}: {e}")
+                return False
+        self.sent += 1
+        if failed_at:
+            del self.closed[key]
+            await asyncio.to_thread(self.store.clear_dm_failure, key)
+        return True
+
+    def stats(self) -> Dict:
+        """{'sent', 'skipped', 'undeliverable', 'failed', 'closed'} since startup"""
+        return {
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'undeliverable': self.undeliverable,
+            'failed': self.failed,
+            'closed': len(self.closed or ())
+        }
+
+
+def _render_key(embed):
+    """Comparable form of an embed (discord.Embed.to_dict, or the value itself)"""
+    to_dict = getattr(embed, 'to_dict', None)
+    return to_dict() if to_dict else embed
+
+
+class _LiveMessage:
+    __slots__ = ('message', 'last', 'pending', 'task')
+
+    def __init__(self, message, embed):
+        self.message = message
+        self.last = _render_key(embed)
+        self.pending = None
+        self.task = None
+
+
+class MessageStateManager:
+    """Keeps live messages (Message object + last rendered embed) and coalesces their edits
+
+    update() records the new state and returns at once; within the window only the latest
+    state is kept, and it is skipped if it matches what the message already shows. Edits go
+    through the outbound scheduler when one is given, so they're paced with the channel.
+    """
+
+    def __init__(self, scheduler: Optional[OutboundScheduler] = None, window: float = EDIT_COALESCE_WINDOW):
+        self.scheduler = scheduler
+        self.window = window
+        self.messages: Dict[int, _LiveMessage] = {}
+        self.requested = 0
+        self.edits = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def track(self, message, embed):
+        """Start tracking a sent message and the embed it was sent with"""
+        self.messages[message.id] = _LiveMessage(message, embed)
+
+    def update(self, message_id: int, embed):
+        """New state for a tracked message - edited once the window passes (latest state wins)"""
+        state = self.messages.get(message_id)
+        if state is None:
+            return
+        self.requested += 1
+        if state.pending is not None:
+            self.coalesced += 1
+        elif _render_key(embed) == state.last:
+            self.skipped += 1
+            return
+        state.pending = embed
+        if state.task is None:
+            state.task = asyncio.create_task(self._flush_later(state))
+
+    async def close(self, message_id: int):
+        """Stop tracking a message, applying its pending state right away"""
+        state = self.messages.pop(message_id, None)
+        if state is None:
+            return
+        if state.task is not None:
+            state.task.cancel()
+            state.task = None
+        await self._flush(state)
+
+    def forget(self, message_id: int):
+        """Stop tracking a message and drop any pending edit (e.g. the message is being deleted)"""
+        state = self.messages.pop(message_id, None)
+        if state is not None and state.task is not None:
+            state.task.cancel()
+
+    async def _flush_later(self, state: _LiveMessage):
+        try:
+            # Changes made while an edit is in flight wait for the next window
+            while True:
+                await asyncio.sleep(self.window)
+                await self._flush(state)
+                if state.pending is None:
+                    break
+        except asyncio.CancelledError:
+            return
+        finally:
+            state.task = None
+
+    async def _flush(self, state: _LiveMessage):
+        if state.pending is None:
+            return
+        embed, state.pending = state.pending, None
+        key = _render_key(embed)
+        if key == state.last:
+            self.skipped += 1
+            return
+        message = state.message
+        # The message is headed for this state while the edit is in flight, so an update back to
+        # the previous state still counts as a change
+        previous, state.last = state.last, key
+        try:
+            if self.scheduler is not None:
+                edited = await self.scheduler.call(message.channel, lambda: message.edit(embed=embed))
+            else:
+                edited = await message.edit(embed=embed)
+        except asyncio.CancelledError:
+            state.last = None  # Edit may or may not have landed - don't skip the next update
+            raise
+        except Exception as e:
+            state.last = previous
+            self.failed += 1
+            print(f"⚠️ Could not update message {message.id}: {e}")
+            return
+        state.message = edited or message
+        self.edits += 1
+
+    def stats(self) -> Dict:
+        """{'tracked', 'requested', 'edits', 'saved', 'failed'} since startup - saved = updates that
+        didn't need their own edit (superseded within the window, or no visible change)"""
+        return {
+            'tracked': len(self.messages),
+            'requested': self.requested,
+            'edits': self.edits,
+            'saved': self.coalesced + self.skipped,
+            'failed': self.failed
+        }
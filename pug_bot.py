@@ -18,11 +18,24 @@ import discord
 from discord.ext import commands
 import asyncio
 import os
+import time
 from datetime import datetime, timedelta, timezone
 import random
+import re
 from typing import Optional, List, Dict, Tuple
 from database import DatabaseManager
 from scraper import ut2k4_scraper
+from balancer import (TeammateHistory, DraftEvaluator, find_balanced_split, snake_pick_turn,
+                      plan_channel_matches, rating_uncertainty)
+from ratings import replay_history, diff_replay, diff_pool_replay, get_rating_engine, EloEngine, RATING_ENGINES
+from simulate_ratings import run_simulation
+from streaks import compute_streaks
+from votes import VoteManager
+from outbound import OutboundScheduler, DMDispatcher, MessageStateManager
+from leaderboard import short_name, render_chunks, chunk_digest, diff_layout
+from names import NameResolver
+from metrics import CommandLatency
+from exports import build_export, read_csv_text, EXPORT_KINDS
 
 # ============================================================================
 # CUSTOMIZATION SECTION - Configure these for your game/community
@@ -52,6 +65,8 @@ bot = commands.Bot(command_prefix='.', intents=intents, help_command=None)
 CAPTAIN_WAIT_TIME = 10
 READY_CHECK_TIMEOUT = 60
 STARTING_ELO = 1000
+RATING_DECAY_CHECK_INTERVAL = 3600  # Seconds between rating decay checks (each server decays at most daily)
+LEADERBOARD_REFRESH_DELAY = 3  # Seconds to wait after a result so results landing together share one refresh
 
 # Bot state
 bot_enabled = True
@@ -82,7 +97,33 @@ recent_tiebreakers = {}  # {server_id: [map1, map2, map3]}
 promote_cooldowns = {}  # {server_id: datetime}
 
 # Leaderboard auto-update tracking
-leaderboard_auto_update_data = {}  # {server_id: {'channel_id': int, 'message_ids': [int], 'last_update': datetime}}
+# messages/digests: cached Message per chunk and a fingerprint of what each chunk shows
+leaderboard_auto_update_data = {}  # {server_id: {'channel_id': int, 'message_ids': [int], 'messages': {idx: Message}, 'digests': [str], 'last_update': datetime}}
+leaderboard_refresh_tasks = {}  # {server_id: asyncio.Task} - pending debounced refreshes
+leaderboard_locks = {}  # {server_id: asyncio.Lock} - one leaderboard update at a time per server
+
+# Rating and streak writes (settle, undo, decay, replay, .setelo, imports, resets, ...) read ratings
+# then write absolute values from a worker thread - one at a time per server so none of them
+# overwrites another's update
+rating_locks = {}  # {server_id: asyncio.Lock}
+
+def rating_lock(server_id):
+    """The lock serialising rating writes on a server"""
+    return rating_locks.setdefault(str(server_id), asyncio.Lock())
+
+async def run_rating_write(server_id, func, *args, **kwargs):
+    """Run a rating or streak write in a worker thread while holding the server's rating lock"""
+    async with rating_lock(server_id):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+# Reaction votes (.winner, .splitwin, .deadpug) - tallied from gateway reaction events
+vote_manager = VoteManager()
+
+# Queue chatter is paced per channel, and status lines sent close together are merged
+outbound = OutboundScheduler()
+
+# Ready check messages - bursts of ✅ clicks become one edit showing the latest status
+message_states = MessageStateManager(outbound)
 
 # PUG count update backup for undo functionality
 pug_count_backup = {}  # {server_id: {discord_id: old_total_pugs}}
@@ -90,6 +131,88 @@ pug_count_backup = {}  # {server_id: {discord_id: old_total_pugs}}
 # Initialize database
 db_manager = DatabaseManager('pug_data.db')
 
+async def resolve_user(discord_id):
+    """User from the gateway cache, falling back to the API"""
+    return bot.get_user(int(discord_id)) or await bot.fetch_user(int(discord_id))
+
+# Queue DMs go out concurrently in the background; users with closed DMs are remembered and skipped
+dm_dispatcher = DMDispatcher(resolve_user, db_manager, closed_errors=(discord.Forbidden,))
+
+# Player names for rankings: member/user cache, then stored names, then the API (concurrently)
+name_resolver = NameResolver(bot.get_user, bot.fetch_user)
+
+# How long each command takes to run (shown in .status)
+command_latency = CommandLatency()
+
+# Teammate co-play matrix used by autopick (loaded per server on first use)
+teammate_history = TeammateHistory()
+
+def read_teammate_history_rows(server_id: str) -> list:
+    """Stored co-play rows for a server, built once from pug_teams if never saved (runs in a worker thread)"""
+    rows = db_manager.get_teammate_history(server_id)
+    if rows:
+        return rows
+    scratch = TeammateHistory()
+    changed = {}
+    for pug_id, red_team, blue_team in db_manager.iter_pug_rosters(server_id):
+        for row in scratch.record_pug(server_id, pug_id, red_team, blue_team):
+            changed[(row[0], row[1])] = row
+    rows = list(changed.values())
+    db_manager.save_teammate_history(server_id, rows)
+    return rows
+
+async def get_teammate_history(server_id: str) -> TeammateHistory:
+    """Return the co-play matrix with this server loaded (read off the event loop on first use)"""
+    if not teammate_history.is_loaded(server_id):
+        rows = await asyncio.to_thread(read_teammate_history_rows, server_id)
+        if not teammate_history.is_loaded(server_id):  # Another caller may have loaded it meanwhile
+            teammate_history.load(server_id, rows)
+    return teammate_history
+
+# ============================================================================
+# Background Jobs
+# ============================================================================
+# Periodic work (e.g. rating decay) registered with @background_job and started from on_ready
+
+background_jobs = {}  # {name: {'interval': seconds, 'func': coroutine function, 'last_run': datetime, 'last_error': str}}
+background_job_tasks = {}  # {name: asyncio.Task}
+
+def background_job(name, interval):
+    """Register a coroutine function to run every `interval` seconds while the bot is up"""
+    def decorator(func):
+        background_jobs[name] = {'interval': interval, 'func': func, 'last_run': None, 'last_error': None}
+        return func
+    return decorator
+
+async def run_background_job(name):
+    """Run one job forever - a failing run is logged and retried next interval"""
+    job = background_jobs[name]
+    while True:
+        try:
+            await job['func']()
+            job['last_run'] = datetime.now()
+            job['last_error'] = None
+        except Exception as e:
+            job['last_error'] = str(e)
+            print(f"❌ Background job '{name}' failed: {e}")
+            import traceback
+            traceback.print_exc()
+        await asyncio.sleep(job['interval'])
+
+def start_background_jobs():
+    """Start registered jobs (on_ready fires again after reconnects - each job only runs once)"""
+    for name in background_jobs:
+        task = background_job_tasks.get(name)
+        if task is None or task.done():
+            background_job_tasks[name] = asyncio.create_task(run_background_job(name))
+
+def filter_inactive_players(players, server_id):
+    """Drop players flagged inactive by rating decay when the server hides them from rankings"""
+    settings = db_manager.get_decay_settings(server_id)
+    if not settings['enabled'] or not settings['hide_inactive']:
+        return players
+    return [p for p in players if not p.get('inactive')]
+
 # PUG Queue Manager
 class PUGQueue:
     def __init__(self, channel, game_mode='default'):
@@ -123,6 +246,7 @@ class PUGQueue:
         self.persistent_ready = {}  # Track ready status with timestamp {user_id: timestamp}
         self.READY_PERSIST_TIME = 600  # Ready status persists for 10 minutes
         self.selected_tiebreaker = None  # Store selected tiebreaker map for cooldown tracking
+        self.draft_evaluator = None  # Draft outlook engine for manual picking (built in start_picking)
         self.inactivity_timeout = 4 * 60 * 60  # 4 hours in seconds
         self.queue_start_time = None  # Track when first player joins
         self.inactivity_timer = None  # Track inactivity timeout task
@@ -142,6 +266,7 @@ class PUGQueue:
         self.ready_responses = {}
         self.pick_turn = 'red'
         self.pick_count = {'red': 0, 'blue': 0}
+        self.draft_evaluator = None
         
         # Restore queue and go back to captain selection if queue is full
         self.queue = saved_queue
@@ -170,6 +295,7 @@ class PUGQueue:
         self.ready_responses = {}
         self.pick_turn = 'red'
         self.pick_count = {'red': 0, 'blue': 0}
+        self.draft_evaluator = None
         if self.captain_timer:
             self.captain_timer.cancel()
         if self.ready_check_task:
@@ -244,20 +370,12 @@ class PUGQueue:
             else:
                 name = f"Player_{promoted_id}"
             
-            await self.channel.send(
+            outbound.post(self.channel,
                 f"{name} promoted from waiting list to **{mode_data['name']}** ({len(self.queue)}/{self.team_size})"
             )
             
-            # Try to DM in background (don't wait)
-            async def send_dm():
-                try:
-                    user = await bot.fetch_user(promoted_id)
-                    await user.send(f"🔄 You've been promoted to the **{mode_data['name']}** PUG queue!")
-                except:
-                    pass
-            
-            # Fire and forget DM task
-            bot.loop.create_task(send_dm())
+            # DM in the background (don't wait)
+            dm_dispatcher.send([promoted_id], f"🔄 You've been promoted to the **{mode_data['name']}** PUG queue!")
             
             # If we're in ready_check state, initialize ready response for new player
             if self.state == 'ready_check':
@@ -292,6 +410,13 @@ class PUGQueue:
                     queue.waiting_queue.remove(player_id)
                     removed_from[player_id].append(queue.game_mode_name)
         
+        # Refill freed spots from waiting lists (may launch queues that were held back)
+        affected_modes = {mode for modes in removed_from.values() for mode in modes}
+        for queue_key, queue in channel_queues.items():
+            if queue != self and queue.game_mode_name in affected_modes and queue.state == 'waiting':
+                while await queue.promote_from_waiting_queue():
+                    pass
+        
         # Notify players if they were removed from other queues
         if removed_from:
             mode_names = set()
@@ -306,7 +431,7 @@ class PUGQueue:
                         mode_displays.append(mode_data['name'])
                 
                 if mode_displays:
-                    await self.channel.send(
+                    outbound.post(self.channel,
                         f"Players removed from other queues: {', '.join(mode_displays)}"
                     )
     
@@ -342,10 +467,13 @@ class PUGQueue:
                 remaining = len(self.queue)
                 needed = self.team_size - remaining
                 
-                await self.channel.send(
+                outbound.post(self.channel,
                     f"🔄 Ready check cancelled - queue no longer full.\n"
                     f"📊 **{mode_data['name']}** queue status: **{remaining}/{self.team_size}** players ({needed} spot{'s' if needed != 1 else ''} remaining)"
                 )
+                
+                # The remaining players are free again - retry queues held back for them
+                await recheck_held_queues(self.channel, exclude=self)
         
         # Check waiting queue
         elif user_id in self.waiting_queue:
@@ -356,23 +484,35 @@ class PUGQueue:
         
         return removed
     
+    async def begin_ready_check(self):
+        """Notify players and start the ready check for a full queue"""
+        # Send DM notifications if enabled (in the background - the ready check doesn't wait for them)
+        if self.dm_notifications:
+            mode_data = db_manager.get_game_mode(self.game_mode_name)
+            dm_dispatcher.send(self.queue, f"🎮 **PUG Queue Full!**\nYour **{mode_data['name']}** pug is starting! Check #{self.channel.name}")
+        
+        self.state = 'ready_check'
+        await self.start_ready_check()
+    
     async def check_queue_full(self):
         if len(self.queue) == self.team_size:
             # Queue is now full
             if self.state == 'waiting':
                 # Normal flow: start ready check
-                # Send DM notifications if enabled
-                if self.dm_notifications:
-                    for uid in self.queue:
-                        try:
-                            user = await bot.fetch_user(uid)
-                            mode_data = db_manager.get_game_mode(self.game_mode_name)
-                            await user.send(f"🎮 **PUG Queue Full!**\nYour **{mode_data['name']}** pug is starting! Check #{self.channel.name}")
-                        except:
-                            pass  # Ignore DM failures
+                # Plan jointly with the other queues in this channel so shared players
+                # don't decide which mode wins by who filled first
+                launch = await schedule_channel_queues(self.channel)
+                
+                if self not in launch:
+                    mode_data = db_manager.get_game_mode(self.game_mode_name)
+                    outbound.post(self.channel,
+                        f"⏸️ **{mode_data['name']}** queue is full, but some players are already starting another PUG here. "
+                        f"It will start once they are free or replaced."
+                    )
                 
-                self.state = 'ready_check'
-                await self.start_ready_check()
+                for queue in launch:
+                    if queue.state == 'waiting':
+                        await queue.begin_ready_check()
             
             elif self.state == 'ready_check':
                 # Already in ready check and queue just refilled (promoted from waiting)
@@ -387,6 +527,7 @@ class PUGQueue:
                     
                     # Delete ready check message
                     if self.ready_check_message:
+                        message_states.forget(self.ready_check_message.id)
                         try:
                             await self.ready_check_message.delete()
                         except:
@@ -408,7 +549,7 @@ class PUGQueue:
         if elapsed >= self.inactivity_timeout:
             # Queue has been inactive for 4 hours
             mode_data = db_manager.get_game_mode(self.game_mode_name)
-            await self.channel.send(
+            outbound.post(self.channel,
                 f"⏱️ **{mode_data['name']}** queue has been inactive for 4 hours and has been cleared due to inactivity."
             )
             
@@ -470,21 +611,15 @@ class PUGQueue:
             else:
                 self.ready_responses[uid] = False
         
-        embed = discord.Embed(
-            title="🎮 Ready Check", 
-            description=f"**{mode_data['name']}** ({self.max_per_team}v{self.max_per_team}) - Queue is full!\n"
-                       f"React with ✅ within {READY_CHECK_TIMEOUT} seconds.",
-            color=discord.Color.green()
-        )
-        
-        # Show ready status
-        ready_status = self._get_ready_status_text()
-        embed.add_field(name="Status", value=ready_status, inline=False)
+        embed = self._ready_check_embed(mode_data)
         
-        msg = await self.channel.send(embed=embed)
+        msg = await outbound.send(self.channel, embed=embed)
         
         # Store message BEFORE adding reactions (prevents race condition)
+        if self.ready_check_message:
+            message_states.forget(self.ready_check_message.id)
         self.ready_check_message = msg
+        message_states.track(msg, embed)
         
         # Add reactions
         await msg.add_reaction("✅")
@@ -496,6 +631,20 @@ class PUGQueue:
         
         self.ready_check_task = asyncio.create_task(self.wait_for_ready_check(msg))
     
+    def _ready_check_embed(self, mode_data):
+        """Ready check embed with the current status"""
+        embed = discord.Embed(
+            title="🎮 Ready Check", 
+            description=f"**{mode_data['name']}** ({self.max_per_team}v{self.max_per_team}) - Queue is full!\n"
+                       f"React with ✅ within {READY_CHECK_TIMEOUT} seconds.",
+            color=discord.Color.green()
+        )
+        
+        # Show ready status
+        ready_status = self._get_ready_status_text()
+        embed.add_field(name="Status", value=ready_status, inline=False)
+        return embed
+    
     def _get_ready_status_text(self):
         """Generate ready status text for display"""
         ready_count = sum(1 for v in self.ready_responses.values() if v == True)
@@ -534,22 +683,15 @@ class PUGQueue:
         return status_text
     
     async def update_ready_check_display(self):
-        """Update the ready check message with current status"""
+        """Update the ready check message with current status
+        
+        Edits are coalesced by message_states: clicks within a second share one edit, and
+        nothing is sent if the status text didn't change.
+        """
         if hasattr(self, 'ready_check_message') and self.ready_check_message:
             try:
                 mode_data = db_manager.get_game_mode(self.game_mode_name)
-                
-                embed = discord.Embed(
-                    title="🎮 Ready Check", 
-                    description=f"**{mode_data['name']}** ({self.max_per_team}v{self.max_per_team}) - Queue is full!\n"
-                               f"React with ✅ within {READY_CHECK_TIMEOUT} seconds.",
-                    color=discord.Color.green()
-                )
-                
-                ready_status = self._get_ready_status_text()
-                embed.add_field(name="Status", value=ready_status, inline=False)
-                
-                await self.ready_check_message.edit(embed=embed)
+                message_states.update(self.ready_check_message.id, self._ready_check_embed(mode_data))
             except:
                 pass  # Message might be deleted
     
@@ -562,9 +704,13 @@ class PUGQueue:
             # If state is no longer 'ready_check', it was cancelled due to queue no longer being full
             # In that case, don't remove any players
             if self.state != 'ready_check':
+                message_states.forget(msg.id)
                 return
             # Otherwise, it was cancelled because everyone is ready - proceed normally
         
+        # Show the final status now rather than after the coalescing window
+        await message_states.close(msg.id)
+        
         # Only process if still in ready_check state
         if self.state != 'ready_check':
             return
@@ -582,7 +728,7 @@ class PUGQueue:
         
         if not_ready:
             mentions = [f"<@{uid}>" for uid in not_ready]
-            await self.channel.send(
+            outbound.post(self.channel,
                 f"❌ {', '.join(mentions)} removed from pug for not readying up in time."
             )
             self.state = 'waiting'
@@ -591,50 +737,48 @@ class PUGQueue:
             # Try to promote from waiting queue to fill empty spots
             mode_data = db_manager.get_game_mode(self.game_mode_name)
             promoted_count = 0
+            promoted_ids = []
             
             while len(self.queue) < self.team_size and self.waiting_queue:
                 promoted_id = self.waiting_queue.pop(0)
                 self.queue.append(promoted_id)
                 promoted_count += 1
                 
-                try:
-                    user = await bot.fetch_user(promoted_id)
-                    await self.channel.send(
-                        f"🔄 <@{promoted_id}> promoted from waiting list to **{mode_data['name']}** queue! ({len(self.queue)}/{self.team_size})"
-                    )
-                    # Try to DM
-                    try:
-                        await user.send(f"🔄 You've been promoted to the **{mode_data['name']}** PUG queue!")
-                    except:
-                        pass
-                except:
-                    await self.channel.send(
-                        f"🔄 A player was promoted from waiting list to **{mode_data['name']}** queue! ({len(self.queue)}/{self.team_size})"
-                    )
+                outbound.post(self.channel,
+                    f"🔄 <@{promoted_id}> promoted from waiting list to **{mode_data['name']}** queue! ({len(self.queue)}/{self.team_size})"
+                )
+                promoted_ids.append(promoted_id)
+            
+            # DM everyone promoted at once, in the background
+            if promoted_ids:
+                dm_dispatcher.send(promoted_ids, f"🔄 You've been promoted to the **{mode_data['name']}** PUG queue!")
             
             # Announce queue status after promotions
             remaining = len(self.queue)
             needed = self.team_size - remaining
             
             if promoted_count > 0:
-                await self.channel.send(
+                outbound.post(self.channel,
                     f"📊 **{mode_data['name']}** queue status: **{remaining}/{self.team_size}** players ({needed} spots remaining)"
                 )
             else:
-                await self.channel.send(
+                outbound.post(self.channel,
                     f"📊 **{mode_data['name']}** queue status: **{remaining}/{self.team_size}** players ({needed} spots remaining)"
                 )
             
             # Check if queue filled back up after promotions
             if len(self.queue) == self.team_size:
                 await self.check_queue_full()
+            
+            # Players who did ready up are free again - retry queues held back for them
+            await recheck_held_queues(self.channel, exclude=self)
         else:
             # Save initial queue order NOW before any picks happen
             self.initial_queue = self.queue.copy()
             
             # Check if this is a 1v1 mode (2 players total)
             if self.team_size == 2:
-                await self.channel.send("✅ All players ready! Starting 1v1 match...")
+                outbound.post(self.channel, "✅ All players ready! Starting 1v1 match...")
                 # Automatically assign players to teams for 1v1
                 self.red_team = [self.queue[0]]
                 self.blue_team = [self.queue[1]]
@@ -648,7 +792,7 @@ class PUGQueue:
                 # Check if autopick is enabled
                 if self.autopick_mode:
                     # Skip captain selection entirely, go straight to autopick
-                    await self.channel.send("All players ready! Auto-balancing teams...")
+                    outbound.post(self.channel, "All players ready! Auto-balancing teams...")
                     self.state = 'picking'
                     
                     # Validate queue is still in good state before autopicking
@@ -656,11 +800,12 @@ class PUGQueue:
                         await self.autopick_teams()
                     else:
                         # Queue changed during ready check, abort
-                        await self.channel.send(f"❌ Queue changed during ready check. Current: {len(self.queue)}/{self.team_size}")
+                        outbound.post(self.channel, f"❌ Queue changed during ready check. Current: {len(self.queue)}/{self.team_size}")
                         self.state = 'waiting'
+                        await recheck_held_queues(self.channel, exclude=self)
                 else:
                     # Manual pick mode - need captain selection
-                    await self.channel.send(f"All players ready! Use `.captain` to become a captain! Auto-selecting in {CAPTAIN_WAIT_TIME} seconds...")
+                    outbound.post(self.channel, f"All players ready! Use `.captain` to become a captain! Auto-selecting in {CAPTAIN_WAIT_TIME} seconds...")
                     self.state = 'selecting_captains'
                     await self.start_captain_selection()
     
@@ -682,13 +827,13 @@ class PUGQueue:
             available.remove(self.red_captain)
             member = self.channel.guild.get_member(self.red_captain)
             name = member.display_name if member else f"Player_{self.red_captain}"
-            await self.channel.send(f"{name} auto-selected as Red Captain")
+            outbound.post(self.channel, f"{name} auto-selected as Red Captain")
         
         if not self.blue_captain and available:
             self.blue_captain = random.choice(available)
             member = self.channel.guild.get_member(self.blue_captain)
             name = member.display_name if member else f"Player_{self.blue_captain}"
-            await self.channel.send(f"{name} auto-selected as Blue Captain")
+            outbound.post(self.channel, f"{name} auto-selected as Blue Captain")
         
         if self.red_captain and self.blue_captain:
             await self.start_picking()
@@ -704,20 +849,20 @@ class PUGQueue:
             if self.red_captain:
                 return False, "Red captain already selected!"
             self.red_captain = user_id
-            await self.channel.send(f"{name} is now the Red Captain")
+            outbound.post(self.channel, f"{name} is now the Red Captain")
         elif team == 'blue':
             if self.blue_captain:
                 return False, "Blue captain already selected!"
             self.blue_captain = user_id
-            await self.channel.send(f"{name} is now the Blue Captain")
+            outbound.post(self.channel, f"{name} is now the Blue Captain")
         else:
             # Auto-assign to first available
             if not self.red_captain:
                 self.red_captain = user_id
-                await self.channel.send(f"{name} is now the Red Captain")
+                outbound.post(self.channel, f"{name} is now the Red Captain")
             elif not self.blue_captain:
                 self.blue_captain = user_id
-                await self.channel.send(f"{name} is now the Blue Captain")
+                outbound.post(self.channel, f"{name} is now the Blue Captain")
             else:
                 return False, "Both captains are already selected!"
         
@@ -736,11 +881,11 @@ class PUGQueue:
         if team == 'red':
             old_captain = self.red_captain
             self.red_captain = user_id
-            await self.channel.send(f"🔴 <@{user_id}> took over as Red Captain!")
+            outbound.post(self.channel, f"🔴 <@{user_id}> took over as Red Captain!")
         elif team == 'blue':
             old_captain = self.blue_captain
             self.blue_captain = user_id
-            await self.channel.send(f"🔵 <@{user_id}> took over as Blue Captain!")
+            outbound.post(self.channel, f"🔵 <@{user_id}> took over as Blue Captain!")
         else:
             return False, "Invalid team!"
         
@@ -761,9 +906,30 @@ class PUGQueue:
         if self.autopick_mode:
             await self.autopick_teams()
         else:
+            self.draft_evaluator = await self.build_draft_evaluator()
             await self.show_teams()
             await self.prompt_pick()
     
+    async def build_draft_evaluator(self):
+        """Capture ELOs and teammate history once so each pick can be evaluated without DB calls"""
+        try:
+            all_players = list(self.queue)
+            all_elos = {}
+            all_sigmas = {}
+            ratings = self.get_ratings(all_players)
+            for uid in all_players:
+                player_data = ratings.get(uid)
+                if not player_data:
+                    return None
+                all_elos[uid] = player_data['elo']
+                all_sigmas[uid] = rating_uncertainty(player_data['total_pugs'], player_data.get('rating_deviation'))
+            history = await get_teammate_history(self.server_id)
+            pair_weights = history.weight_matrix(self.server_id, all_players)
+            return DraftEvaluator(all_players, all_elos, pair_weights, sigmas=all_sigmas)
+        except Exception as e:
+            print(f"⚠️ Could not build draft evaluator: {e}")
+            return None
+    
     async def autopick_teams(self):
         """Automatically balance teams based on ELO using optimal combinations with variance minimization"""
         try:
@@ -780,103 +946,38 @@ class PUGQueue:
             
             # Validate we have enough players
             if len(all_players) != self.team_size:
-                await self.channel.send(f"❌ Cannot autopick: expected {self.team_size} players, got {len(all_players)}")
+                outbound.post(self.channel, f"❌ Cannot autopick: expected {self.team_size} players, got {len(all_players)}")
                 self.state = 'waiting'
+                await recheck_held_queues(self.channel, exclude=self)
                 return
             
-            # Get all player ELOs
+            # Get all player ELOs and how sure we are of them
             all_elos = {}
+            all_sigmas = {}
+            ratings = self.get_ratings(all_players)
             for uid in all_players:
-                player_data = db_manager.get_player(uid, self.server_id)
+                player_data = ratings.get(uid)
                 if not player_data:
-                    await self.channel.send(f"❌ Cannot autopick: player data missing for <@{uid}>")
+                    outbound.post(self.channel, f"❌ Cannot autopick: player data missing for <@{uid}>")
                     self.state = 'waiting'
+                    await recheck_held_queues(self.channel, exclude=self)
                     return
                 all_elos[uid] = player_data['elo']
+                all_sigmas[uid] = rating_uncertainty(player_data['total_pugs'], player_data.get('rating_deviation'))
             
-            # Calculate how many players per team
-            players_per_team = self.max_per_team
+            # Penalise pairs who were recently teammates (precomputed co-play matrix)
+            history = await get_teammate_history(self.server_id)
+            pair_weights = history.weight_matrix(self.server_id, all_players)
             
             # Try to find the most balanced split
-            from itertools import combinations
             import random
-            
-            best_diff = float('inf')
-            best_red_picks = None
-            best_variance = float('inf')  # For tie-breaking
-            best_win_probability_diff = float('inf')  # Additional metric
-            
-            # Calculate total ELO for optimization
-            total_elo = sum(all_elos.values())
-            target_per_team = total_elo / 2  # Ideal ELO per team
-            
-            # Try all possible combinations of players for red team
-            for red_picks in combinations(all_players, players_per_team):
-                # Calculate red team total
-                red_total = sum(all_elos[uid] for uid in red_picks)
-                
-                # Calculate blue team total (optimization: use total instead of recalculating)
-                blue_total = total_elo - red_total
-                
-                # Find the combination with smallest ELO difference
-                diff = abs(red_total - blue_total)
-                
-                # Calculate average ELOs
-                red_avg = red_total / players_per_team
-                blue_avg = blue_total / players_per_team
-                
-                # Calculate win probability (based on ELO system)
-                red_win_prob = 1 / (1 + 10 ** ((blue_avg - red_avg) / 400))
-                win_prob_diff = abs(red_win_prob - 0.5)  # Distance from 50/50
-                
-                # Calculate variance (skill distribution within teams)
-                red_elos = [all_elos[uid] for uid in red_picks]
-                blue_picks = [uid for uid in all_players if uid not in red_picks]
-                blue_elos = [all_elos[uid] for uid in blue_picks]
-                
-                # Variance calculation - how spread out are skills within each team
-                red_var = sum((elo - red_avg) ** 2 for elo in red_elos) / players_per_team
-                blue_var = sum((elo - blue_avg) ** 2 for elo in blue_elos) / players_per_team
-                total_var = red_var + blue_var
-                
-                # Early termination: if we found perfect balance, use it
-                if diff == 0 and win_prob_diff < 0.01:  # Perfect balance
-                    best_diff = 0
-                    best_red_picks = red_picks
-                    best_variance = total_var
-                    best_win_probability_diff = win_prob_diff
-                    break
-                
-                # Multi-criteria optimization:
-                # 1. Minimize ELO difference (most important)
-                # 2. Minimize win probability difference (second priority)
-                # 3. Minimize variance (tie-breaker for same ELO diff)
-                
-                is_better = False
-                
-                if diff < best_diff:
-                    # Significantly better ELO balance
-                    is_better = True
-                elif diff == best_diff:
-                    # Same ELO difference, check win probability
-                    if win_prob_diff < best_win_probability_diff:
-                        is_better = True
-                    elif win_prob_diff == best_win_probability_diff:
-                        # Same win probability, check variance
-                        if total_var < best_variance:
-                            is_better = True
-                
-                if is_better:
-                    best_diff = diff
-                    best_red_picks = red_picks
-                    best_variance = total_var
-                    best_win_probability_diff = win_prob_diff
+            result = find_balanced_split(all_players, all_elos, pair_weights, sigmas=all_sigmas)
             
             # Assign the best combination
-            if best_red_picks is not None:
+            if result is not None:
                 # Assign teams
-                self.red_team = list(best_red_picks)
-                self.blue_team = [uid for uid in all_players if uid not in best_red_picks]
+                self.red_team = result['red']
+                self.blue_team = result['blue']
                 
                 # Calculate final stats for logging
                 red_total = sum(all_elos[uid] for uid in self.red_team)
@@ -885,7 +986,7 @@ class PUGQueue:
                 blue_avg = blue_total / len(self.blue_team)
                 
                 # Log balancing results (for debugging)
-                print(f"[AUTOPICK] Red: {red_avg:.0f} avg | Blue: {blue_avg:.0f} avg | Diff: {abs(red_avg - blue_avg):.0f}")
+                print(f"[AUTOPICK] Red: {red_avg:.0f} avg | Blue: {blue_avg:.0f} avg | Diff: {abs(red_avg - blue_avg):.0f} | Repeat penalty: {result['repeat_penalty']:.2f}")
                 print(f"[AUTOPICK] Red ELOs: {sorted([all_elos[uid] for uid in self.red_team], reverse=True)}")
                 print(f"[AUTOPICK] Blue ELOs: {sorted([all_elos[uid] for uid in self.blue_team], reverse=True)}")
                 
@@ -896,10 +997,10 @@ class PUGQueue:
                 # Finish picking (this will show teams)
                 await self.finish_picking()
             else:
-                await self.channel.send("❌ Error: Could not balance teams. Please try manual picking.")
+                outbound.post(self.channel, "❌ Error: Could not balance teams. Please try manual picking.")
                 self.state = 'selecting_captains'
         except Exception as e:
-            await self.channel.send(f"❌ Error in autopick: {str(e)}")
+            outbound.post(self.channel, f"❌ Error in autopick: {str(e)}")
             import traceback
             traceback.print_exc()
             self.state = 'selecting_captains'
@@ -908,6 +1009,25 @@ class PUGQueue:
         picked = self.red_team + self.blue_team
         return [uid for uid in self.queue if uid not in picked]
     
+    def get_ratings(self, uids):
+        """{uid: rating} from this mode's rating pool, one query for the whole list (unregistered players are left out)"""
+        pool = db_manager.get_mode_rating_pool(self.game_mode_name)
+        ratings = db_manager.get_ratings(self.server_id, list(uids), pool)
+        return {uid: ratings[str(uid)] for uid in uids if str(uid) in ratings}
+    
+    def match_prediction(self):
+        """(avg_red_elo, avg_blue_elo, red_win_prob) for the picked teams, from the mode's rating engine"""
+        engine = get_rating_engine(db_manager.get_mode_rating_engine(self.game_mode_name))
+        ratings = self.get_ratings(self.red_team + self.blue_team)
+        seeded = {uid: engine.seed(r['elo'], r['rating_deviation'], r['rating_volatility'], r['wins'] + r['losses'])
+                  for uid, r in ratings.items()}
+        avg_red_elo = sum(ratings[uid]['elo'] for uid in self.red_team) / len(self.red_team)
+        avg_blue_elo = sum(ratings[uid]['elo'] for uid in self.blue_team) / len(self.blue_team)
+        red_win_prob = engine.win_probability([seeded[uid] for uid in self.red_team],
+                                              [seeded[uid] for uid in self.blue_team],
+                                              (avg_red_elo, avg_blue_elo))
+        return avg_red_elo, avg_blue_elo, red_win_prob
+    
     async def pick_player(self, captain_id, player_id, team, admin_override=False):
         # Validate captain (skip for admin override)
         if not admin_override:
@@ -928,10 +1048,10 @@ class PUGQueue:
         # Add to team
         if team == 'red':
             self.red_team.append(player_id)
-            await self.channel.send(f"🔴 RED picks <@{player_id}>!")
+            outbound.post(self.channel, f"🔴 RED picks <@{player_id}>!")
         else:
             self.blue_team.append(player_id)
-            await self.channel.send(f"🔵 BLUE picks <@{player_id}>!")
+            outbound.post(self.channel, f"🔵 BLUE picks <@{player_id}>!")
         
         # Update pick count
         self.pick_count[team] += 1
@@ -944,10 +1064,10 @@ class PUGQueue:
             # Determine which team needs the player
             if len(self.red_team) < self.max_per_team:
                 self.red_team.append(last_player)
-                await self.channel.send(f"🔴 RED gets the last player <@{last_player}>!")
+                outbound.post(self.channel, f"🔴 RED gets the last player <@{last_player}>!")
             else:
                 self.blue_team.append(last_player)
-                await self.channel.send(f"🔵 BLUE gets the last player <@{last_player}>!")
+                outbound.post(self.channel, f"🔵 BLUE gets the last player <@{last_player}>!")
             
             total_players += 1
         
@@ -975,31 +1095,11 @@ class PUGQueue:
             available = self.get_available_players()
             if available:
                 self.blue_team.append(available[0])
-                await self.channel.send(f"🔵 BLUE gets the last player: <@{available[0]}>!")
+                outbound.post(self.channel, f"🔵 BLUE gets the last player: <@{available[0]}>!")
             return
         
         # Snake draft pattern: RED → BLUE → BLUE → RED → RED → BLUE → BLUE...
-        # Pattern: R, BB, RR, BB, RR, BB...
-        
-        if total_picked == 0:
-            # First pick after captains: RED picks
-            self.pick_turn = 'red'
-        elif total_picked == 1:
-            # After RED's first pick: BLUE picks
-            self.pick_turn = 'blue'
-        else:
-            # For picks 2+, alternate in pairs
-            # total_picked: 2=B, 3=R, 4=R, 5=B, 6=B, 7=R, 8=R...
-            # Pattern after pick 1: BB RR BB RR...
-            picks_after_first = total_picked - 1
-            pair_position = picks_after_first % 4
-            
-            if pair_position in [0, 1]:
-                # Positions 0,1 in cycle: BLUE picks
-                self.pick_turn = 'blue'
-            else:
-                # Positions 2,3 in cycle: RED picks
-                self.pick_turn = 'red'
+        self.pick_turn = snake_pick_turn(total_picked)
     
     async def prompt_pick(self):
         available = self.get_available_players()
@@ -1043,7 +1143,7 @@ class PUGQueue:
         if is_double_pick:
             pick_instruction += " (you can pick 2: `.pick 3 5`)"
         
-        await self.channel.send(
+        outbound.post(self.channel,
             f"{'🔴' if self.pick_turn == 'red' else '🔵'} <@{captain_id}>, pick a player using {pick_instruction}\n\n{player_list}"
         )
 
@@ -1087,15 +1187,8 @@ class PUGQueue:
         
         # Include match prediction if picking is complete
         if include_prediction and len(self.red_team) == self.max_per_team and len(self.blue_team) == self.max_per_team:
-            # Calculate team ELO averages
-            red_elos = [db_manager.get_player(uid, self.server_id)['elo'] for uid in self.red_team]
-            blue_elos = [db_manager.get_player(uid, self.server_id)['elo'] for uid in self.blue_team]
-            
-            avg_red_elo = sum(red_elos) / len(red_elos)
-            avg_blue_elo = sum(blue_elos) / len(blue_elos)
-            
-            # Calculate win probability
-            red_win_prob = 1 / (1 + 10 ** ((avg_blue_elo - avg_red_elo) / 400))
+            # Team ELO averages and win probability (same prediction that is stored with the PUG)
+            avg_red_elo, avg_blue_elo, red_win_prob = self.match_prediction()
             blue_win_prob = 1 - red_win_prob
             
             # Determine prediction
@@ -1137,6 +1230,7 @@ class PUGQueue:
             available = self.get_available_players()
             
             # Show numbered list for picking using INITIAL queue order WITH ELO
+            ratings = self.get_ratings(available) if available else {}
             if available and self.initial_queue:
                 # Number players based on their position in initial_queue
                 available_players_list = []
@@ -1145,8 +1239,7 @@ class PUGQueue:
                         # Find position in initial queue (1-indexed)
                         position = self.initial_queue.index(uid) + 1
                         # Get player ELO and rank
-                        player_data = db_manager.get_player(uid, self.server_id)
-                        elo = player_data['elo']
+                        elo = ratings[uid]['elo']
                         rank = get_elo_rank(elo)
                         member = self.channel.guild.get_member(uid)
                         name = member.display_name if member else f"Player_{uid}"
@@ -1156,8 +1249,7 @@ class PUGQueue:
                 # Fallback if initial_queue not set
                 available_players_list = []
                 for i, uid in enumerate(available):
-                    player_data = db_manager.get_player(uid, self.server_id)
-                    elo = player_data['elo']
+                    elo = ratings[uid]['elo']
                     rank = get_elo_rank(elo)
                     member = self.channel.guild.get_member(uid)
                     name = member.display_name if member else f"Player_{uid}"
@@ -1167,8 +1259,26 @@ class PUGQueue:
                 available_players = "None"
             
             embed.add_field(name="Available Players", value=available_players, inline=False)
+            
+            # Draft outlook: best balance still reachable and where greedy picking would land
+            if available and self.draft_evaluator and self.state == 'picking':
+                outlook = await asyncio.to_thread(self.draft_evaluator.evaluate, list(self.red_team),
+                                                  list(self.blue_team), sum(self.pick_count.values()))
+                if outlook:
+                    best_red = outlook['best_red_win_prob']
+                    projected_red = outlook['projected_red_win_prob']
+                    embed.add_field(
+                        name="Draft Outlook",
+                        value=(
+                            f"Best possible: {outlook['best_avg_diff']:.0f} ELO apart "
+                            f"(Red {best_red*100:.1f}% vs Blue {(1-best_red)*100:.1f}%)\n"
+                            f"If captains take the highest ELO left: {outlook['projected_avg_diff']:.0f} ELO apart "
+                            f"(Red {projected_red*100:.1f}% vs Blue {(1-projected_red)*100:.1f}%)"
+                        ),
+                        inline=False
+                    )
         
-        await self.channel.send(embed=embed)
+        await outbound.send(self.channel, embed=embed)
     
     async def finish_picking(self):
         try:
@@ -1177,12 +1287,11 @@ class PUGQueue:
             
             mode_data = db_manager.get_game_mode(self.game_mode_name)
             
-            # Calculate team ELO averages for database
-            red_elos = [db_manager.get_player(uid, self.server_id)['elo'] for uid in self.red_team]
-            blue_elos = [db_manager.get_player(uid, self.server_id)['elo'] for uid in self.blue_team]
+            # Team ELO averages (from the mode's rating pool) and the prediction shown above, for the database
+            avg_red_elo, avg_blue_elo, red_win_prob = self.match_prediction()
             
-            avg_red_elo = sum(red_elos) / len(red_elos)
-            avg_blue_elo = sum(blue_elos) / len(blue_elos)
+            # Load the co-play matrix first - a first load rebuilds it from pug_teams and must not see this PUG
+            history = await get_teammate_history(self.server_id)
             
             # Save PUG data
             pug_number = db_manager.add_pug(
@@ -1191,10 +1300,18 @@ class PUGQueue:
                 game_mode=self.game_mode_name,
                 avg_red_elo=avg_red_elo,
                 avg_blue_elo=avg_blue_elo,
-                tiebreaker_map=self.selected_tiebreaker if self.team_size == 8 else None
+                tiebreaker_map=self.selected_tiebreaker if self.team_size == 8 else None,
+                server_id=self.server_id,
+                predicted_red_win=red_win_prob
+            )
+            
+            # Fold these teams into the co-play matrix (only this PUG's pairs are touched)
+            changed_pairs = history.record_pug(
+                self.server_id, pug_number, self.red_team, self.blue_team
             )
+            db_manager.save_teammate_history(self.server_id, changed_pairs)
             
-            await self.channel.send(f"This is PUG #{pug_number}. Use `.winner red` or `.winner blue` to report the result")
+            outbound.post(self.channel, f"This is PUG #{pug_number}. Use `.winner red` or `.winner blue` to report the result")
             
             # Add tiebreaker to cooldown list (keep last 3)
             if self.selected_tiebreaker and self.team_size == 8:
@@ -1225,7 +1342,7 @@ class PUGQueue:
             if had_waiting_players:
                 promoted_count = len(self.queue)
                 if promoted_count > 0:
-                    await self.channel.send(
+                    outbound.post(self.channel,
                         f"🔄 **{promoted_count}** player{'s' if promoted_count != 1 else ''} promoted from waiting list to **{mode_data['name']}** queue!\n"
                         f"Current queue: {promoted_count}/{self.team_size}"
                     )
@@ -1233,7 +1350,7 @@ class PUGQueue:
                     # Check if the queue filled immediately
                     await self.check_queue_full()
         except Exception as e:
-            await self.channel.send(f"❌ Error in finish_picking: {str(e)}")
+            outbound.post(self.channel, f"❌ Error in finish_picking: {str(e)}")
             import traceback
             traceback.print_exc()
     
@@ -1252,16 +1369,8 @@ class PUGQueue:
             if user_id in self.queue:
                 self.queue.remove(user_id)
                 mode_data = db_manager.get_game_mode(self.game_mode_name)
-                try:
-                    user = await bot.fetch_user(user_id)
-                    await self.channel.send(f"⏰ <@{user_id}> has been removed from **{mode_data['name']}** queue (timer expired)")
-                    # Try to DM the user
-                    try:
-                        await user.send(f"⏰ You've been removed from the **{mode_data['name']}** PUG queue - your timer expired!")
-                    except:
-                        pass
-                except:
-                    await self.channel.send(f"⏰ A player has been removed from **{mode_data['name']}** queue (timer expired)")
+                outbound.post(self.channel, f"⏰ <@{user_id}> has been removed from **{mode_data['name']}** queue (timer expired)")
+                dm_dispatcher.send([user_id], f"⏰ You've been removed from the **{mode_data['name']}** PUG queue - your timer expired!")
             
             # Clean up timer
             if user_id in self.expire_timers:
@@ -1294,6 +1403,90 @@ def get_channel_queues(channel):
     """Get all active queues for a channel"""
     return {k: v for k, v in queues.items() if k.startswith(f"{channel.id}_")}
 
+def channel_launch_pools(channel_queues):
+    """({queue_key: available players in join order}, {queue_key: team size}) for the full waiting queues"""
+    committed = set()
+    for queue in channel_queues.values():
+        if queue.state != 'waiting':
+            committed.update(queue.queue)
+    
+    pools = {}
+    sizes = {}
+    for queue_key, queue in channel_queues.items():
+        if queue.state != 'waiting' or len(queue.queue) < queue.team_size:
+            continue
+        pools[queue_key] = [uid for uid in queue.queue + queue.waiting_queue if uid not in committed]
+        sizes[queue_key] = queue.team_size
+    return pools, sizes
+
+def plan_server_matches(server_id, pools, sizes):
+    """plan_channel_matches with the players' server ELOs and rating deviations (runs in a worker thread)"""
+    # ELOs feed the balance tie-break between equally good plans
+    # (server ELO - the same player can be in queues rated in different pools)
+    all_uids = list({uid for pool in pools.values() for uid in pool})
+    ratings = db_manager.get_ratings(server_id, all_uids)
+    elos = {}
+    sigmas = {}
+    for uid in all_uids:
+        player_data = ratings.get(str(uid))
+        elos[uid] = player_data['elo'] if player_data else STARTING_ELO
+        sigmas[uid] = rating_uncertainty(player_data['total_pugs'] if player_data else 0,
+                                         player_data.get('rating_deviation') if player_data else None)
+    return plan_channel_matches(pools, sizes, elos, sigmas)
+
+async def schedule_channel_queues(channel):
+    """Decide which full queues in a channel launch together when they share players
+    
+    Players already in a ready check or picking elsewhere are unavailable. Launched queues
+    get the assigned players as their roster (displaced players move to the front of the
+    waiting list). Returns the list of queues to launch.
+    """
+    pools, sizes = channel_launch_pools(get_channel_queues(channel))
+    if not pools:
+        return []
+    
+    # Balancing the rosters runs in a worker thread; if the queues changed meanwhile, plan again
+    server_id = str(channel.guild.id)
+    while True:
+        plan = await asyncio.to_thread(plan_server_matches, server_id, pools, sizes)
+        channel_queues = get_channel_queues(channel)
+        current = channel_launch_pools(channel_queues)
+        if current == (pools, sizes):
+            break
+        pools, sizes = current
+        if not pools:
+            return []
+    
+    launch = []
+    for queue_key, players in plan['launch'].items():
+        queue = channel_queues[queue_key]
+        displaced = [uid for uid in queue.queue if uid not in players]
+        if displaced:
+            queue.waiting_queue = displaced + [uid for uid in queue.waiting_queue if uid not in players]
+            queue.queue = list(players)
+            
+            mode_data = db_manager.get_game_mode(queue.game_mode_name)
+            mentions = ", ".join(f"<@{uid}>" for uid in displaced)
+            outbound.post(channel,
+                f"🔀 {mentions} moved to the **{mode_data['name']}** waiting list so more PUGs can start at once"
+            )
+        launch.append(queue)
+    
+    if len(launch) > 1:
+        print(f"[SCHEDULER] Channel {channel.id}: launching {len(launch)} queues together "
+              f"(balance cost {plan['balance_cost']:.0f})")
+    return launch
+
+async def recheck_held_queues(channel, exclude=None):
+    """Re-run the full-queue check for queues that were held back for shared players
+    
+    Called wherever a ready check or picking ends without a PUG being recorded (failed or
+    cancelled ready check, aborted autopick, .reset), since that frees its players again.
+    """
+    for queue in get_channel_queues(channel).values():
+        if queue is not exclude and queue.state == 'waiting' and len(queue.queue) == queue.team_size:
+            await queue.check_queue_full()
+
 @bot.check
 async def globally_check_bot_state(ctx):
     """Global check for bot enabled status and channel restriction"""
@@ -1355,6 +1548,18 @@ async def resolve_player(ctx, player_identifier: str):
     
     return None, None
 
+async def resolve_player_token(ctx, token: str):
+    """Resolve one argument that may be a mention - for commands that take several players"""
+    match = re.fullmatch(r'<@!?(\d+)>', token.strip())
+    if match:
+        member = ctx.guild.get_member(int(match.group(1)))
+        return (member, str(member.id)) if member else (None, None)
+    for guild_member in ctx.guild.members:
+        if (guild_member.display_name.lower() == token.lower() or
+            guild_member.name.lower() == token.lower()):
+            return guild_member, str(guild_member.id)
+    return None, None
+
 def get_elo_rank(elo):
     """
     S+: 1800+
@@ -1377,30 +1582,6 @@ def get_elo_rank(elo):
     else:
         return 'D'
 
-def get_leaderboard_position(discord_id, server_id):
-    """Get player's position on the leaderboard"""
-    players = db_manager.get_all_players(server_id)
-    
-    # Filter out simulation players
-    active_players = []
-    for p in players:
-        try:
-            player_id = int(p['discord_id'])
-            if player_id < 1000 or player_id >= 2000:
-                active_players.append(p)
-        except (ValueError, TypeError):
-            active_players.append(p)
-    
-    # Sort by ELO (highest first)
-    active_players.sort(key=lambda x: x['elo'], reverse=True)
-    
-    # Find position
-    for i, player in enumerate(active_players):
-        if str(player['discord_id']) == str(discord_id):
-            return i + 1, len(active_players)
-    
-    return None, len(active_players)
-
 # Commands
 @bot.event
 async def on_ready():
@@ -1408,130 +1589,90 @@ async def on_ready():
     print(f'Bot is ready to manage PUGs!')
     print(f'Database: pug_data.db')
     
-    # Auto-initialize leaderboard for all guilds
-    print("\n🔄 Initializing leaderboards...")
+    # Periodic jobs (rating decay, ...)
+    start_background_jobs()
+    
+    # One-time streak backfill - best streaks weren't always tracked and undo never rolled streaks back
+    if db_manager.get_setting('streaks_backfilled') != '1':
+        for guild in bot.guilds:
+            changed = await run_rating_write(guild.id, repair_streaks, str(guild.id))
+            if changed:
+                print(f"✅ Rebuilt streaks for {changed} players in {guild.name}")
+        db_manager.set_setting('streaks_backfilled', '1')
+    
+    # One-time pair statistics build for .h2h/.synergy (kept current at settlement after this)
+    if db_manager.get_setting('pair_stats_built') != '1':
+        for guild in bot.guilds:
+            db_manager.rebuild_pair_stats(str(guild.id))
+        db_manager.set_setting('pair_stats_built', '1')
+    
+    # Load each server's teammate history now so the first PUG after a restart doesn't wait on it
     for guild in bot.guilds:
-        try:
-            # Check if leaderboard already exists for this guild
-            str_guild_id = str(guild.id)
-            
-            # Find or create #leaderboard channel
-            leaderboard_channel = discord.utils.get(guild.text_channels, name='leaderboard')
-            
-            if not leaderboard_channel:
-                print(f"⚠️ No #leaderboard channel found in {guild.name}, skipping auto-init")
-                continue
-            
-            # Check if leaderboard data already exists
-            if str_guild_id in leaderboard_auto_update_data:
-                print(f"✅ Leaderboard already initialized for {guild.name}")
-                continue
-            
-            # Check if there are any players
-            players = db_manager.get_all_players(str_guild_id)
-            if not players:
-                print(f"⚠️ No players found for {guild.name}, skipping leaderboard init")
-                continue
-            
-            # Initialize leaderboard by calling the leaderboard logic
-            print(f"📊 Initializing leaderboard for {guild.name} in #{leaderboard_channel.name}...")
-            
-            # Filter out simulation players
-            active_players = []
-            for p in players:
-                try:
-                    player_id = int(p['discord_id'])
-                    if player_id < 1000 or player_id >= 2000:
-                        active_players.append(p)
-                except (ValueError, TypeError):
-                    active_players.append(p)
-            
-            if not active_players:
-                print(f"⚠️ No active players found for {guild.name}")
-                continue
-            
-            # Sort by ELO
-            active_players.sort(key=lambda x: x['elo'], reverse=True)
-            
-            # Build player entries
-            entries = []
-            for i, player in enumerate(active_players):
-                discord_id = player['discord_id']
-                elo = int(player['elo'])
-                rank = i + 1
-                
-                member = guild.get_member(int(discord_id))
-                if member:
-                    name = member.display_name
-                else:
-                    player_data = db_manager.get_player(discord_id, str_guild_id)
-                    name = player_data.get('display_name') or player_data.get('discord_name') or f"Player_{discord_id}"
-                    if '#' in name:
-                        name = name.split('#')[0]
-                
-                if len(name) > 8:
-                    name = name[:5] + "..."
-                
-                entries.append({'rank': rank, 'name': name, 'elo': elo})
-            
-            # Build 3-column layout
-            all_lines = []
-            total_players = len(entries)
-            players_per_column = (total_players + 2) // 3
-            
-            for row_idx in range(players_per_column):
-                columns = []
-                for col_idx in range(3):
-                    player_idx = row_idx + (col_idx * players_per_column)
-                    if player_idx < total_players:
-                        entry = entries[player_idx]
-                        rank_str = f"#{entry['rank']}".ljust(4)
-                        name_str = entry['name'].ljust(8)
-                        elo_str = str(entry['elo']).ljust(4)
-                        column = f"{rank_str}{name_str}{elo_str}"
-                        columns.append(column)
-                    else:
-                        columns.append(" " * 16)
-                line = "  ".join(columns)
-                all_lines.append(line.rstrip())
-            
-            # Split into chunks
-            chunk_size = 60
-            chunks = [all_lines[i:i + chunk_size] for i in range(0, len(all_lines), chunk_size)]
-            
-            # Send embeds and store message IDs
-            leaderboard_message_ids = []
-            for chunk_idx, chunk in enumerate(chunks):
-                chunk_text = "\n".join(chunk)
-                embed = discord.Embed(
-                    title="🏆 Server ELO Leaderboard" if chunk_idx == 0 else f"🏆 Leaderboard (continued)",
-                    description=f"```\n{chunk_text}\n```",
-                    color=discord.Color.gold()
-                )
-                if chunk_idx == 0:
-                    current_time = datetime.now()
-                    embed.set_footer(
-                        text=f"Total Players: {len(active_players)} • Auto-updates on ELO changes • Last Updated: {current_time.strftime('%I:%M %p')}"
-                    )
-                msg = await leaderboard_channel.send(embed=embed)
-                leaderboard_message_ids.append(msg.id)
-            
-            # Store for auto-updates
-            leaderboard_auto_update_data[str_guild_id] = {
-                'channel_id': leaderboard_channel.id,
-                'message_ids': leaderboard_message_ids,
-                'last_update': datetime.now()
-            }
-            
-            print(f"✅ Leaderboard initialized for {guild.name} with {len(active_players)} players")
-            
-        except Exception as e:
-            print(f"❌ Error initializing leaderboard for {guild.name}: {e}")
-            import traceback
-            traceback.print_exc()
+        await get_teammate_history(str(guild.id))
+    
+    # Auto-initialize leaderboard for all guilds (reusing the messages from the last run)
+    print("\n🔄 Initializing leaderboards...")
+    await asyncio.gather(*(init_guild_leaderboard(guild) for guild in bot.guilds))
     
     print("✅ Leaderboard initialization complete!\n")
 
+async def init_guild_leaderboard(guild):
+    """Bring a server's auto-update leaderboard up to date on startup
+    
+    Messages stored from the last run are reused once checked to still exist - unchanged chunks
+    aren't touched, changed or missing ones are edited, and chunks are added or deleted as the ladder grew or shrank. A fresh
+    leaderboard is only posted the first time (or when the old one is gone).
+    """
+    try:
+        # Check if leaderboard already exists for this guild
+        str_guild_id = str(guild.id)
+        if str_guild_id in leaderboard_auto_update_data:
+            print(f"✅ Leaderboard already initialized for {guild.name}")
+            return
+        
+        stored = await asyncio.to_thread(db_manager.get_leaderboard_messages, str_guild_id)
+        
+        # The channel it was last posted in, otherwise #leaderboard
+        leaderboard_channel = bot.get_channel(stored['channel_id']) if stored else None
+        if not leaderboard_channel:
+            leaderboard_channel = discord.utils.get(guild.text_channels, name='leaderboard')
+        
+        if not leaderboard_channel:
+            print(f"⚠️ No #leaderboard channel found in {guild.name}, skipping auto-init")
+            return
+        
+        chunks, total_players = await asyncio.to_thread(build_leaderboard_chunks, guild, str_guild_id)
+        if not chunks:
+            print(f"⚠️ No active players found for {guild.name}, skipping leaderboard init")
+            return
+        
+        if stored and stored['channel_id'] == leaderboard_channel.id:
+            print(f"📊 Restoring leaderboard for {guild.name} in #{leaderboard_channel.name}...")
+            data = {'channel_id': leaderboard_channel.id, 'message_ids': stored['message_ids'], 'messages': {},
+                    'digests': stored['digests'], 'last_update': datetime.now()}
+            missing = await check_leaderboard_messages(leaderboard_channel, data)
+            if missing:
+                print(f"   {missing} stored message(s) no longer exist")
+            counts = await sync_leaderboard(leaderboard_channel, data, chunks, total_players)
+            print(f"   {counts['keep']} unchanged, {counts['edit']} edited, "
+                  f"{counts['create']} added, {counts['delete']} removed")
+        else:
+            print(f"📊 Initializing leaderboard for {guild.name} in #{leaderboard_channel.name}...")
+            data = await post_leaderboard(leaderboard_channel, chunks, total_players, "Auto-updates on ELO changes • ")
+        
+        leaderboard_auto_update_data[str_guild_id] = data
+        await asyncio.to_thread(save_leaderboard_state, str_guild_id, data)
+        print(f"✅ Leaderboard initialized for {guild.name} with {total_players} players")
+        
+    except Exception as e:
+        print(f"❌ Error initializing leaderboard for {guild.name}: {e}")
+        import traceback
+        traceback.print_exc()
+
+def save_leaderboard_state(server_id, data):
+    """Persist a server's leaderboard messages so the next startup can reuse them"""
+    db_manager.save_leaderboard_messages(server_id, data['channel_id'], data['message_ids'], data['digests'])
+
 @bot.event
 async def on_message(message):
     # Ignore bot messages
@@ -1617,7 +1758,7 @@ async def on_message(message):
             mode_display = mode_data['name']
             spots_filled = len(queue.queue)
             spots_remaining = queue.team_size - spots_filled
-            await ctx.send(f"{ctx.author.display_name} joined **{mode_display}** ({spots_filled}/{queue.team_size})")
+            outbound.post(ctx.channel, f"{ctx.author.display_name} joined **{mode_display}** ({spots_filled}/{queue.team_size})")
         else:
             await ctx.send(f"❌ {error}")
         return
@@ -1676,7 +1817,7 @@ async def on_message(message):
                 mode_display = mode_data['name']
                 spots_filled = len(queue.queue)
                 spots_remaining = queue.team_size - spots_filled
-                await ctx.send(f"{ctx.author.display_name} left **{mode_display}** ({spots_filled}/{queue.team_size})")
+                outbound.post(ctx.channel, f"{ctx.author.display_name} left **{mode_display}** ({spots_filled}/{queue.team_size})")
             else:
                 await ctx.send(f"❌ You are not in the **{mode_data['name']}** queue!")
         except Exception as e:
@@ -1688,6 +1829,15 @@ async def on_message(message):
     # Process other commands normally
     await bot.process_commands(message)
 
+@bot.event
+async def on_raw_reaction_add(payload):
+    # Vote tallies come from the gateway event - no message fetch needed
+    vote_manager.handle_reaction(payload.message_id, payload.user_id, str(payload.emoji), True)
+
+@bot.event
+async def on_raw_reaction_remove(payload):
+    vote_manager.handle_reaction(payload.message_id, payload.user_id, str(payload.emoji), False)
+
 @bot.event
 async def on_reaction_add(reaction, user):
     if user.bot:
@@ -1734,7 +1884,7 @@ async def on_reaction_add(reaction, user):
                     member = reaction.message.guild.get_member(user.id)
                     name = member.display_name if member else f"Player_{user.id}"
                     
-                    await reaction.message.channel.send(
+                    outbound.post(reaction.message.channel,
                         f"{name} declined the ready check and has been removed from the queue"
                     )
                     
@@ -1754,9 +1904,12 @@ async def on_reaction_add(reaction, user):
                         remaining = len(queue.queue)
                         needed = queue.team_size - remaining
                         
-                        await reaction.message.channel.send(
+                        outbound.post(reaction.message.channel,
                             f"Ready check cancelled - queue no longer full | **{mode_data['name']}**: {remaining}/{queue.team_size} ({needed} spot{'s' if needed != 1 else ''} remaining)"
                         )
+                        
+                        # The remaining players are free again - retry queues held back for them
+                        await recheck_held_queues(queue.channel, exclude=queue)
                     else:
                         # Queue is still full, update display and check if all ready
                         await queue.update_ready_check_display()
@@ -1768,6 +1921,17 @@ async def on_reaction_add(reaction, user):
                                 # Everyone else is ready, proceed immediately!
                                 queue.ready_check_task.cancel()
 
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_latency(ctx):
+    """Runs after every command, even one that failed"""
+    started_at = getattr(ctx, 'started_at', None)
+    if started_at is not None and ctx.command:
+        command_latency.record(ctx.command.qualified_name, time.perf_counter() - started_at)
+
 @bot.event
 async def on_command_error(ctx, error):
     """Global error handler to silently ignore check failures from wrong channels"""
@@ -1832,7 +1996,7 @@ async def join_with_code(ctx, mode_or_code: str = None, code: str = None):
         if errors:
             messages.append(f"❌ Errors: {', '.join(errors)}")
         
-        await ctx.send("\n".join(messages))
+        outbound.post(ctx.channel, "\n".join(messages))
         return
     
     # Mode was provided, proceed with normal join logic
@@ -1871,10 +2035,10 @@ async def join_with_code(ctx, mode_or_code: str = None, code: str = None):
         if error and error.startswith("queue_full:"):
             position = error.split(":")[1]
             msg = f"{ctx.author.display_name} added to **{mode_display}** waiting list (#{position}) - {len(queue.queue)}/{queue.team_size} in queue"
-            await ctx.send(msg)
+            outbound.post(ctx.channel, msg)
         else:
             msg = f"{ctx.author.display_name} joined **{mode_display}** ({len(queue.queue)}/{queue.team_size})"
-            await ctx.send(msg)
+            outbound.post(ctx.channel, msg)
     else:
         await ctx.send(f"❌ {error}")
 
@@ -1921,11 +2085,11 @@ async def join_quick(ctx, game_mode: str = None):
             # Check if added to waiting queue
             if error and error.startswith("queue_full:"):
                 position = error.split(":")[1]
-                await ctx.send(
+                outbound.post(ctx.channel,
                     f"{ctx.author.display_name} added to **{mode_display}** waiting list (#{position})"
                 )
             else:
-                await ctx.send(f"{ctx.author.display_name} joined **{mode_display}** ({len(queue.queue)}/{queue.team_size})")
+                outbound.post(ctx.channel, f"{ctx.author.display_name} joined **{mode_display}** ({len(queue.queue)}/{queue.team_size})")
         else:
             await ctx.send(f"❌ {error}")
     else:
@@ -1968,7 +2132,7 @@ async def join_quick(ctx, game_mode: str = None):
         if errors:
             messages.append(f"❌ Errors: {', '.join(errors)}")
         
-        await ctx.send("\n".join(messages))
+        outbound.post(ctx.channel, "\n".join(messages))
 
 @bot.command(name='leave', aliases=['l'])
 async def leave(ctx, game_mode: str = None):
@@ -1983,7 +2147,7 @@ async def leave(ctx, game_mode: str = None):
         queue = get_queue(ctx.channel, game_mode_resolved)
         if await queue.remove_player(ctx.author.id):
             mode_data = db_manager.get_game_mode(game_mode_resolved)
-            await ctx.send(f"{ctx.author.display_name} left **{mode_data['name']}** ({len(queue.queue)}/{queue.team_size})")
+            outbound.post(ctx.channel, f"{ctx.author.display_name} left **{mode_data['name']}** ({len(queue.queue)}/{queue.team_size})")
         else:
             await ctx.send(f"You're not in the {game_mode_input} pug!")
     else:
@@ -1996,7 +2160,7 @@ async def leave(ctx, game_mode: str = None):
         
         if removed_from:
             modes_str = ", ".join(removed_from)
-            await ctx.send(f"{ctx.author.display_name} left: {modes_str}")
+            outbound.post(ctx.channel, f"{ctx.author.display_name} left: {modes_str}")
         else:
             await ctx.send("You're not in any pug!")
 
@@ -2016,7 +2180,7 @@ async def leave_all(ctx):
     
     if removed_from:
         modes_str = ", ".join(removed_from)
-        await ctx.send(f"{ctx.author.display_name} left all: {modes_str}")
+        outbound.post(ctx.channel, f"{ctx.author.display_name} left all: {modes_str}")
     else:
         await ctx.send("You're not in any pug!")
 
@@ -2630,6 +2794,9 @@ async def reset_queue(ctx, game_mode: str = None):
             elif queue.state == 'selecting_captains':
                 # Manual pick mode - restart captain selection
                 await queue.start_captain_selection()
+        
+        # Players the reset freed can fill queues that were held back for them
+        await recheck_held_queues(ctx.channel, exclude=queue)
     else:
         channel_queues = get_channel_queues(ctx.channel)
         for queue_key, queue in channel_queues.items():
@@ -2646,6 +2813,8 @@ async def reset_queue(ctx, game_mode: str = None):
                     # Manual pick mode - restart captain selection
                     await queue.start_captain_selection()
         
+        # Players the reset freed can fill queues that were held back for them
+        await recheck_held_queues(ctx.channel)
         await ctx.send("✅ All pugs have been reset!")
 
 @bot.command(name='addplayer')
@@ -2819,6 +2988,7 @@ async def simulation_off(ctx, game_mode: str = 'default'):
     
     mode_data = db_manager.get_game_mode(game_mode_resolved)
     await ctx.send(f"✅ Simulation mode disabled for **{mode_data['name']}**!")
+    await recheck_held_queues(ctx.channel, exclude=queue)
 
 @bot.command(name='skipcheckin')
 async def skip_checkin(ctx, game_mode: str = 'default'):
@@ -2930,7 +3100,7 @@ async def report_winner(ctx, team_or_pug: str, team: str = None):
     # Check if user is admin
     if is_admin(ctx):
         # Admin override - instant result
-        await process_winner(ctx, pug, winning_team, admin_override=True)
+        await settle_result(ctx, pug, winning_team, admin_override=True)
     else:
         # Player must be in the PUG to vote
         all_players = pug['red_team'] + pug['blue_team']
@@ -2942,67 +3112,40 @@ async def report_winner(ctx, team_or_pug: str, team: str = None):
         # Start voting
         await start_winner_vote(ctx, pug, winning_team, all_players)
 
+async def run_reaction_vote(ctx, text, all_players, votes_needed, timeout):
+    """Post a ✅/❌ vote and wait for it - passes as soon as votes_needed players in the PUG react ✅
+    
+    Returns (passed, yes_votes).
+    """
+    vote_msg = await ctx.send(text)
+    # Register before adding reactions so no early vote is missed
+    vote = vote_manager.start(vote_msg.id, all_players, votes_needed, timeout, rest_calls=1)
+    try:
+        await vote_msg.add_reaction("✅")
+        await vote_msg.add_reaction("❌")
+        vote.rest_calls += 2
+        passed = await vote_manager.wait(vote)
+    finally:
+        vote_manager.finish(vote)
+    return passed, vote.yes_votes
+
 async def start_winner_vote(ctx, pug, team, all_players):
     """Start voting process for declaring winner"""
     votes_needed = len(all_players) // 2 + 1
-    
-    # Create vote message
     team_emoji = '🔴' if team == 'red' else '🔵'
-    vote_msg = await ctx.send(
-        f"🗳️ **Vote to declare {team_emoji} {team.upper()} team winner of PUG #{pug['number']}**\n"
-        f"Players in this PUG, react with ✅ to confirm.\n"
-        f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
-        f"Vote ends in 60 seconds or when majority is reached."
-    )
-    
-    # Add reactions
-    await vote_msg.add_reaction("✅")
-    await vote_msg.add_reaction("❌")
-    
-    # Monitor reactions for 60 seconds
-    start_time = asyncio.get_event_loop().time()
-    timeout = 60
     
     try:
-        while True:
-            elapsed = asyncio.get_event_loop().time() - start_time
-            remaining = timeout - elapsed
-            
-            if remaining <= 0:
-                break
-            
-            # Check current vote count
-            vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-            yes_votes = 0
-            
-            for reaction in vote_msg.reactions:
-                if str(reaction.emoji) == "✅":
-                    users = [user async for user in reaction.users()]
-                    yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                    break
-            
-            # If majority reached, process winner immediately
-            if yes_votes >= votes_needed:
-                await process_winner(ctx, pug, team, admin_override=False)
+        passed, yes_votes = await run_reaction_vote(
+            ctx,
+            f"🗳️ **Vote to declare {team_emoji} {team.upper()} team winner of PUG #{pug['number']}**\n"
+            f"Players in this PUG, react with ✅ to confirm.\n"
+            f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
+            f"Vote ends in 60 seconds or when majority is reached.",
+            all_players, votes_needed, 60)
+        
+        if passed:
+            if await settle_result(ctx, pug, team):
                 await ctx.send(f"✅ **Vote passed! {team.upper()} team wins PUG #{pug['number']}** ({yes_votes}/{len(all_players)} votes)")
-                return
-            
-            # Wait before checking again
-            await asyncio.sleep(min(2, remaining))
-        
-        # Timeout reached, count final votes
-        vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-        yes_votes = 0
-        
-        for reaction in vote_msg.reactions:
-            if str(reaction.emoji) == "✅":
-                users = [user async for user in reaction.users()]
-                yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                break
-        
-        if yes_votes >= votes_needed:
-            await process_winner(ctx, pug, team, admin_override=False)
-            await ctx.send(f"✅ **Vote passed! {team.upper()} team wins PUG #{pug['number']}** ({yes_votes}/{len(all_players)} votes)")
         else:
             await ctx.send(f"❌ **Vote failed.** Only {yes_votes}/{votes_needed} votes received. PUG #{pug['number']} result not recorded.")
     
@@ -3072,325 +3215,237 @@ async def split_win(ctx, pug_number: int = None):
     all_players = pug['red_team'] + pug['blue_team']
     votes_needed = len(all_players) // 2 + 1
     
-    # Create vote message
-    vote_msg = await ctx.send(
-        f"🤝 **Split Win Vote for PUG #{pug['number']}**\n"
-        f"Declaring this match a 1-1 split (incomplete BO3).\n"
-        f"Both teams will receive small ELO changes based on a draw.\n\n"
-        f"Players in this PUG, react with ✅ to vote for split win.\n"
-        f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
-        f"Vote ends in 15 minutes or when majority is reached."
-    )
-    
-    await vote_msg.add_reaction("✅")
-    await vote_msg.add_reaction("❌")
-    
-    # Monitor voting
-    start_time = asyncio.get_event_loop().time()
-    timeout = 900  # 15 minutes
-    
     try:
-        while True:
-            elapsed = asyncio.get_event_loop().time() - start_time
-            remaining = timeout - elapsed
-            
-            if remaining <= 0:
-                break
-            
-            # Check current vote count
-            vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-            yes_votes = 0
-            
-            for reaction in vote_msg.reactions:
-                if str(reaction.emoji) == "✅":
-                    users = [user async for user in reaction.users()]
-                    yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                    break
-            
-            # If majority reached, process immediately
-            if yes_votes >= votes_needed:
-                await process_split_win(ctx, pug)
-                return
-            
-            await asyncio.sleep(min(5, remaining))
-        
-        # Timeout reached, count final votes
-        vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-        yes_votes = 0
-        
-        for reaction in vote_msg.reactions:
-            if str(reaction.emoji) == "✅":
-                users = [user async for user in reaction.users()]
-                yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                break
-        
-        if yes_votes >= votes_needed:
-            await process_split_win(ctx, pug)
+        passed, yes_votes = await run_reaction_vote(
+            ctx,
+            f"🤝 **Split Win Vote for PUG #{pug['number']}**\n"
+            f"Declaring this match a 1-1 split (incomplete BO3).\n"
+            f"Both teams will receive small ELO changes based on a draw.\n\n"
+            f"Players in this PUG, react with ✅ to vote for split win.\n"
+            f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
+            f"Vote ends in 15 minutes or when majority is reached.",
+            all_players, votes_needed, 900)
+        
+        if passed:
+            await settle_result(ctx, pug, 'split')
         else:
             await ctx.send(f"❌ **Vote failed.** Only {yes_votes}/{votes_needed} votes received. PUG #{pug['number']} remains open.")
     
     except Exception as e:
         await ctx.send(f"⚠️ Error during voting: {e}")
 
-async def process_split_win(ctx, pug):
-    """Process split win (draw) and update ELO for both teams"""
-    # Mark as split in database
-    db_manager.update_pug_winner(pug['pug_id'], 'split')
-    
-    # Get server_id
-    server_id = pug.get('server_id', str(ctx.guild.id))
+def settle_pug_result(pug, server_id, winner):
+    """Rate a decided PUG with its game mode's rating engine and save the result in one transaction
     
-    # Get teams
+    winner: 'red', 'blue' or 'split'
+    Returns {uid: {'old': elo, 'new': elo, 'change': delta}}, or None if the PUG already had a result
+    """
+    red_score = 0.5 if winner == 'split' else (1.0 if winner == 'red' else 0.0)
+    engine = get_rating_engine(db_manager.get_mode_rating_engine(pug['game_mode']))
+    pool = db_manager.get_mode_rating_pool(pug['game_mode'])
     red_team = pug['red_team']
     blue_team = pug['blue_team']
     
-    # For a split, we DON'T update wins/losses (it's a draw)
-    # But we DO update total_pugs for both teams
+    # Ratings are read before the result is counted - engines seed new players from games played before this PUG
+    stored = db_manager.get_ratings(server_id, red_team + blue_team, pool)
+    ratings = {}
     for uid in red_team + blue_team:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE players 
-            SET total_pugs = total_pugs + 1
-            WHERE discord_id = ? AND server_id = ?
-        ''', (uid, server_id))
-        conn.commit()
-        conn.close()
-    
-    # Calculate ELO changes for a DRAW (score = 0.5 for both teams)
-    K_FACTOR = 32
-    avg_red_elo = pug['avg_red_elo']
-    avg_blue_elo = pug['avg_blue_elo']
-    
-    # Calculate expected scores
-    expected_red = 1 / (1 + 10 ** ((avg_blue_elo - avg_red_elo) / 400))
-    expected_blue = 1 - expected_red
-    
-    # Store ELO changes
-    elo_changes = {}
-    
-    # Update ELO for red team (score = 0.5 for draw)
-    for uid in red_team:
-        player = db_manager.get_player(uid, server_id)
-        old_elo = player['elo']
-        new_elo = player['elo'] + K_FACTOR * (0.5 - expected_red)
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        elo_changes[uid] = {'old': old_elo, 'new': new_elo, 'change': new_elo - old_elo}
-    
-    # Update ELO for blue team (score = 0.5 for draw)
-    for uid in blue_team:
-        player = db_manager.get_player(uid, server_id)
-        old_elo = player['elo']
-        new_elo = player['elo'] + K_FACTOR * (0.5 - expected_blue)
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        elo_changes[uid] = {'old': old_elo, 'new': new_elo, 'change': new_elo - old_elo}
-    
-    # Show results
-    embed = discord.Embed(
-        title=f"🤝 PUG #{pug['number']} Split Result",
-        description=f"**Match ended 1-1 (Incomplete BO3)**\nBoth teams receive ELO for a draw.",
-        color=discord.Color.purple()
-    )
-    
-    # Show ELO changes for red team
-    red_changes = []
-    for uid in red_team:
-        change = elo_changes[uid]
-        player = db_manager.get_player(uid, server_id)
-        rank = get_elo_rank(player['elo'])
-        red_changes.append(f"<@{uid}>: {change['old']:.0f} → **{change['new']:.0f}** ({change['change']:+.0f}) - {rank}")
-    
-    # Show ELO changes for blue team
-    blue_changes = []
-    for uid in blue_team:
-        change = elo_changes[uid]
-        player = db_manager.get_player(uid, server_id)
-        rank = get_elo_rank(player['elo'])
-        blue_changes.append(f"<@{uid}>: {change['old']:.0f} → **{change['new']:.0f}** ({change['change']:+.0f}) - {rank}")
-    
-    embed.add_field(name="🔴 Red Team", value="\n".join(red_changes), inline=False)
-    embed.add_field(name="🔵 Blue Team", value="\n".join(blue_changes), inline=False)
-    
-    await ctx.send(embed=embed)
-    
-    # Auto-update leaderboard after ELO changes
-    try:
-        print(f"🔄 Calling update_leaderboard from process_split_win for guild {ctx.guild.id}")
-        await update_leaderboard(ctx.guild.id)
-        print(f"✅ update_leaderboard completed from process_split_win")
-    except Exception as e:
-        print(f"❌ Error calling update_leaderboard from process_split_win: {e}")
-        import traceback
-        traceback.print_exc()
+        player = stored[str(uid)]
+        ratings[uid] = engine.seed(player['elo'], player.get('rating_deviation'),
+                                   player.get('rating_volatility'), player['wins'] + player['losses'])
+    
+    # Stored averages, so the result matches the odds shown when teams were picked
+    new_red, new_blue = engine.rate_match([ratings[uid] for uid in red_team], [ratings[uid] for uid in blue_team],
+                                          red_score, (pug['avg_red_elo'], pug['avg_blue_elo']))
+    scores = [red_score] * len(red_team) + [1.0 - red_score] * len(blue_team)
+    updates = [(uid, ratings[uid], new, score)
+               for uid, new, score in zip(red_team + blue_team, new_red + new_blue, scores)]
+    if not db_manager.settle_pug(server_id, pug['pug_id'], winner, engine.name, updates, pool,
+                                 game_mode=pug['game_mode']):
+        return None
+    
+    return {uid: {'old': old[0], 'new': new[0], 'change': new[0] - old[0]} for uid, old, new, score in updates}
+
+def unsettle_pug_result(pug, server_id):
+    """Take a PUG's result back out (ratings, stats, derived tables) and rebuild its players' streaks
+    
+    Returns the winner that was undone.
+    """
+    winner = db_manager.unsettle_pug(server_id, pug['pug_id'], legacy_change=EloEngine().team_changes)
+    # Streaks can't be stepped backwards - rebuild them for this PUG's players from their history
+    if winner in ('red', 'blue'):
+        repair_streaks(server_id, pug['red_team'] + pug['blue_team'])
+    return winner
 
-async def process_winner(ctx, pug, team, admin_override=False):
-    """Process winner and update stats/ELO"""
-    # Update winner in database
-    db_manager.update_pug_winner(pug['pug_id'], team)
-    
-    # Get server_id from pug or ctx
-    server_id = pug.get('server_id', str(ctx.guild.id))
+def repair_streaks(server_id, discord_ids=None):
+    """Rebuild streaks from the settled match sequence (a whole server, or just some players)
     
-    # Get teams
-    winner_team = pug['red_team'] if team == 'red' else pug['blue_team']
-    loser_team = pug['blue_team'] if team == 'red' else pug['red_team']
+    Manual ledger changes are kept; the baseline snapshot is not - it may hold drifted streaks.
+    Returns the number of players whose streaks changed.
+    """
+    if discord_ids is not None:
+        discord_ids = [str(uid) for uid in discord_ids]
+    streaks = compute_streaks(db_manager.iter_player_results(server_id, discord_ids),
+                              db_manager.get_rating_adjustments(server_id, include_baseline=False),
+                              discord_ids)
+    return db_manager.set_player_streaks(server_id, list(streaks))
+
+def replay_server_ratings(server_id, record_changes=False):
+    """Replay a server's settled PUGs (see ratings.replay_history) and compare with the stored ratings
+    
+    Returns (replay result, stored players, changes) - changes from diff_replay followed by the
+    per-mode pool ratings from diff_pool_replay (pool set).
+    """
+    result = replay_history(db_manager.iter_settled_pugs(server_id), db_manager.get_rating_adjustments(server_id),
+                            db_manager.get_mode_rating_engines(), record_changes=record_changes)
+    players = db_manager.get_all_players(server_id)
+    changes = diff_replay(result['state'], players)
+    changes += diff_pool_replay(result['state'], db_manager.get_pool_ratings(server_id),
+                                [p['discord_id'] for p in players])
+    return result, players, changes
+
+def apply_server_replay(server_id):
+    """Replay a server's history and write it back - run under the rating lock (run_rating_write) so
+    no result is settled between the replay and the write. Returns (players updated, pool ratings written).
+    """
+    result, players, changes = replay_server_ratings(server_id, record_changes=True)
+    pool_ratings = [dict(change['new'], pool=change['pool']) for change in changes if change['pool'] is not None]
+    updated = db_manager.apply_rating_replay(server_id, [change['new'] for change in changes if change['pool'] is None],
+                                             result['pug_averages'], result['rating_changes'], pool_ratings)
+    db_manager.rebuild_player_aggregates(server_id, legacy_change=EloEngine().team_changes)
+    return updated, len(pool_ratings)
+
+def get_player_summary(discord_id, server_id):
+    """Player stats, aggregates and leaderboard position for .mystats/.stats (one row read)
+    
+    The first read for a player builds their aggregates from history; settlement and undo
+    keep them current after that.
+    """
+    summary = db_manager.get_player_summary(discord_id, server_id)
+    if summary and not summary['aggregated']:
+        # PUGs from before the rating history get their change from the stored averages
+        db_manager.rebuild_player_aggregates(server_id, [str(discord_id)], legacy_change=EloEngine().team_changes)
+        summary = db_manager.get_player_summary(discord_id, server_id)
+    return summary
+
+def add_player_summary_fields(embed, summary):
+    """Stat fields shared by .mystats and .stats"""
+    total = summary['total_pugs']
+    wins = summary['wins']
+    losses = summary['losses']
+    elo = summary['elo']
+    rank = get_elo_rank(elo)
+    # Win rate based on actual games played (wins + losses), not total_pugs
+    actual_games = wins + losses
+    win_rate = (wins / actual_games * 100) if actual_games > 0 else 0
     
-    # Update wins/losses
-    for uid in winner_team:
-        db_manager.update_player_stats(uid, server_id, won=True)
+    embed.add_field(name="Total PUGs", value=total, inline=True)
+    embed.add_field(name="Wins", value=wins, inline=True)
+    embed.add_field(name="Losses", value=losses, inline=True)
+    embed.add_field(name="Win Rate", value=f"{win_rate:.1f}%", inline=True)
     
-    for uid in loser_team:
-        db_manager.update_player_stats(uid, server_id, won=False)
+    # Show ELO with recent change
+    last_elo_change = summary['last_change']
+    if last_elo_change is not None:
+        elo_display = f"{elo:.0f} ({last_elo_change:+.0f})"
+    else:
+        elo_display = f"{elo:.0f}"
     
-    # Update ELO
-    K_FACTOR = 32
-    avg_red_elo = pug['avg_red_elo']
-    avg_blue_elo = pug['avg_blue_elo']
+    # Net ELO over last 10 PUGs
+    net_elo_10 = summary['net_last_10']
+    net_elo_display = f"{net_elo_10:+.0f}" if round(net_elo_10) != 0 else "0"
     
-    # Calculate expected scores
-    expected_red = 1 / (1 + 10 ** ((avg_blue_elo - avg_red_elo) / 400))
-    expected_blue = 1 - expected_red
+    embed.add_field(name="ELO", value=elo_display, inline=True)
+    embed.add_field(name="Peak ELO", value=f"{summary['peak_elo']:.0f}", inline=True)
+    embed.add_field(name="Rank", value=rank, inline=True)
+    embed.add_field(name="Last 10 PUGs", value=f"{net_elo_display} ELO", inline=True)
     
-    # Store ELO changes
-    elo_changes = {}
+    # Add streak
+    streak = summary['current_streak']
+    if streak > 0:
+        streak_display = f"🔥 {streak}W"
+    elif streak < 0:
+        streak_display = f"❄️ {abs(streak)}L"
+    else:
+        streak_display = "—"
+    embed.add_field(name="Streak", value=streak_display, inline=True)
     
-    # Update ELO for winners
-    for uid in winner_team:
-        player = db_manager.get_player(uid, server_id)
-        old_elo = player['elo']
-        if team == 'red':
-            new_elo = player['elo'] + K_FACTOR * (1 - expected_red)
-        else:
-            new_elo = player['elo'] + K_FACTOR * (1 - expected_blue)
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        elo_changes[uid] = {'old': old_elo, 'new': new_elo, 'change': new_elo - old_elo}
-    
-    # Update ELO for losers
-    for uid in loser_team:
-        player = db_manager.get_player(uid, server_id)
-        old_elo = player['elo']
-        if team == 'red':
-            new_elo = player['elo'] + K_FACTOR * (0 - expected_blue)
-        else:
-            new_elo = player['elo'] + K_FACTOR * (0 - expected_red)
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        elo_changes[uid] = {'old': old_elo, 'new': new_elo, 'change': new_elo - old_elo}
+    # Add leaderboard position
+    if summary['position']:
+        embed.add_field(name="Leaderboard", value=f"#{summary['position']} of {summary['total_players']}", inline=True)
+    
+    # Record per game mode (most played first)
+    modes = sorted(summary['mode_records'].items(),
+                   key=lambda item: -(item[1]['wins'] + item[1]['losses'] + item[1]['splits']))
+    mode_lines = []
+    for mode_name, record in modes:
+        if not (record['wins'] or record['losses'] or record['splits']):
+            continue
+        line = f"**{mode_name}**: {record['wins']}W-{record['losses']}L"
+        if record['splits']:
+            line += f" ({record['splits']} split)"
+        mode_lines.append(line)
+    if mode_lines:
+        embed.add_field(name="By Mode", value="\n".join(mode_lines[:10]), inline=False)
+    
+    if summary['last_played']:
+        embed.set_footer(text=f"Last played: {summary['last_played']} UTC (PUG #{summary['last_pug_id']})")
+
+def build_result_embed(pug, winner, elo_changes, admin_override=False):
+    """Result embed for a settled PUG - wins and splits share one layout"""
+    def change_lines(team):
+        lines = []
+        for uid in team:
+            change = elo_changes[uid]
+            rank = get_elo_rank(change['new'])
+            lines.append(f"<@{uid}>: {change['old']:.0f} → **{change['new']:.0f}** ({change['change']:+.0f}) - {rank}")
+        return "\n".join(lines)
+    
+    if winner == 'split':
+        embed = discord.Embed(
+            title=f"🤝 PUG #{pug['number']} Split Result",
+            description=f"**Match ended 1-1 (Incomplete BO3)**\nBoth teams receive ELO for a draw.",
+            color=discord.Color.purple()
+        )
+        embed.add_field(name="🔴 Red Team", value=change_lines(pug['red_team']), inline=False)
+        embed.add_field(name="🔵 Blue Team", value=change_lines(pug['blue_team']), inline=False)
+        return embed
     
-    # Show results
     embed = discord.Embed(
         title=f"🏆 PUG #{pug['number']} Result",
-        description=f"**{'🔴 RED' if team == 'red' else '🔵 BLUE'} TEAM WINS!**" + (" ⚡ (Admin Override)" if admin_override else ""),
-        color=discord.Color.red() if team == 'red' else discord.Color.blue()
+        description=f"**{'🔴 RED' if winner == 'red' else '🔵 BLUE'} TEAM WINS!**" + (" ⚡ (Admin Override)" if admin_override else ""),
+        color=discord.Color.red() if winner == 'red' else discord.Color.blue()
     )
-    
-    # Show ELO changes for winners
-    winner_changes = []
-    for uid in winner_team:
-        change = elo_changes[uid]
-        player = db_manager.get_player(uid, server_id)
-        rank = get_elo_rank(player['elo'])
-        winner_changes.append(f"<@{uid}>: {change['old']:.0f} → **{change['new']:.0f}** ({change['change']:+.0f}) - {rank}")
-    
-    # Show ELO changes for losers
-    loser_changes = []
-    for uid in loser_team:
-        change = elo_changes[uid]
-        player = db_manager.get_player(uid, server_id)
-        rank = get_elo_rank(player['elo'])
-        loser_changes.append(f"<@{uid}>: {change['old']:.0f} → **{change['new']:.0f}** ({change['change']:+.0f}) - {rank}")
-    
-    if team == 'red':
-        embed.add_field(name="🔴 Red Team (Winners)", value="\n".join(winner_changes), inline=False)
-        embed.add_field(name="🔵 Blue Team (Losers)", value="\n".join(loser_changes), inline=False)
+    if winner == 'red':
+        embed.add_field(name="🔴 Red Team (Winners)", value=change_lines(pug['red_team']), inline=False)
+        embed.add_field(name="🔵 Blue Team (Losers)", value=change_lines(pug['blue_team']), inline=False)
     else:
-        embed.add_field(name="🔵 Blue Team (Winners)", value="\n".join(winner_changes), inline=False)
-        embed.add_field(name="🔴 Red Team (Losers)", value="\n".join(loser_changes), inline=False)
+        embed.add_field(name="🔵 Blue Team (Winners)", value=change_lines(pug['blue_team']), inline=False)
+        embed.add_field(name="🔴 Red Team (Losers)", value=change_lines(pug['red_team']), inline=False)
+    return embed
+
+async def settle_result(ctx, pug, winner, admin_override=False):
+    """Record a PUG result - 'red', 'blue' or 'split' - and announce it
     
-    await ctx.send(embed=embed)
+    Every result takes the same path: ratings worked out, everything written in one transaction
+    (off the event loop), one result embed, one debounced leaderboard refresh.
+    Returns False if the PUG already had a result.
+    """
+    server_id = pug.get('server_id', str(ctx.guild.id))
+    elo_changes = await run_rating_write(server_id, settle_pug_result, pug, server_id, winner)
+    if elo_changes is None:
+        await ctx.send(f"❌ PUG #{pug['number']} already has a result recorded!")
+        return False
     
-    # Auto-update leaderboard after ELO changes
-    try:
-        print(f"🔄 Calling update_leaderboard from process_winner for guild {ctx.guild.id}")
-        await update_leaderboard(ctx.guild.id)
-        print(f"✅ update_leaderboard completed from process_winner")
-    except Exception as e:
-        print(f"❌ Error calling update_leaderboard from process_winner: {e}")
-        import traceback
-        traceback.print_exc()
+    await ctx.send(embed=build_result_embed(pug, winner, elo_changes, admin_override))
+    schedule_leaderboard_refresh(ctx.guild.id)
+    return True
 
 async def undo_winner_logic(ctx, pug):
     """Undo a PUG winner - reverses ELO and stats (shared logic)"""
     server_id = pug.get('server_id', str(ctx.guild.id))
-    winning_team_name = pug['winner']
-    winner_team = pug['red_team'] if winning_team_name == 'red' else pug['blue_team']
-    loser_team = pug['blue_team'] if winning_team_name == 'red' else pug['red_team']
-    
-    # Calculate what the ELO changes were
-    K_FACTOR = 32
-    avg_red_elo = pug['avg_red_elo']
-    avg_blue_elo = pug['avg_blue_elo']
-    
-    expected_red = 1 / (1 + 10 ** ((avg_blue_elo - avg_red_elo) / 400))
-    expected_blue = 1 - expected_red
-    
-    # Reverse ELO changes for winners
-    for uid in winner_team:
-        player = db_manager.get_player(uid, server_id)
-        current_elo = player['elo']
-        
-        # Calculate what the change was
-        if winning_team_name == 'red':
-            elo_change = K_FACTOR * (1 - expected_red)
-        else:
-            elo_change = K_FACTOR * (1 - expected_blue)
-        
-        # Reverse it
-        new_elo = current_elo - elo_change
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        
-        # Reverse win counter
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE players 
-            SET wins = wins - 1, total_pugs = total_pugs - 1
-            WHERE discord_id = ? AND server_id = ?
-        """, (uid, server_id))
-        conn.commit()
-        conn.close()
-    
-    # Reverse ELO changes for losers
-    for uid in loser_team:
-        player = db_manager.get_player(uid, server_id)
-        current_elo = player['elo']
-        
-        # Calculate what the change was
-        if winning_team_name == 'red':
-            elo_change = K_FACTOR * (0 - expected_blue)
-        else:
-            elo_change = K_FACTOR * (0 - expected_red)
-        
-        # Reverse it
-        new_elo = current_elo - elo_change
-        db_manager.update_player_elo(uid, server_id, new_elo)
-        
-        # Reverse loss counter
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE players 
-            SET losses = losses - 1, total_pugs = total_pugs - 1
-            WHERE discord_id = ? AND server_id = ?
-        """, (uid, server_id))
-        conn.commit()
-        conn.close()
-    
-    # Reset winner to NULL
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE pugs SET winner = NULL WHERE pug_id = ?", (pug['pug_id'],))
-    conn.commit()
-    conn.close()
+    await run_rating_write(server_id, unsettle_pug_result, pug, server_id)
+    schedule_leaderboard_refresh(ctx.guild.id)
 
 @bot.command(name='undowinner')
 async def undo_winner(ctx, pug_number: int = None):
@@ -3444,13 +3499,15 @@ async def undo_winner(ctx, pug_number: int = None):
     
     embed = discord.Embed(
         title=f"↩️ PUG #{pug['number']} Winner Undone",
-        description=f"Reversed {'🔴 RED' if winning_team_name == 'red' else '🔵 BLUE'} team victory",
+        description="Reversed split result" if winning_team_name == 'split' else
+                    f"Reversed {'🔴 RED' if winning_team_name == 'red' else '🔵 BLUE'} team victory",
         color=discord.Color.orange()
     )
     
     embed.add_field(
         name="Stats Updated",
-        value=f"• Winners: -1 win, -1 total PUG\n• Losers: -1 loss, -1 total PUG",
+        value="• All players: -1 total PUG" if winning_team_name == 'split' else
+              "• Winners: -1 win, -1 total PUG\n• Losers: -1 loss, -1 total PUG",
         inline=False
     )
     
@@ -3462,9 +3519,6 @@ async def undo_winner(ctx, pug_number: int = None):
     )
     
     await ctx.send(embed=embed)
-    
-    # Auto-update leaderboard after ELO changes
-    await update_leaderboard(ctx.guild.id)
 
 @bot.command(name='setwinner')
 async def set_winner_admin(ctx, pug_id: int, team: str):
@@ -3515,7 +3569,8 @@ async def set_winner_admin(ctx, pug_id: int, team: str):
                 break
     
     # Process the new winner (this will update stats/ELO)
-    await process_winner(ctx, pug, team, admin_override=True)
+    if not await settle_result(ctx, pug, team, admin_override=True):
+        return
     await ctx.send(f"⚡ **Admin override - Set PUG #{pug_id} winner to {team.upper()} team**")
 
 @bot.command(name='register')
@@ -3613,120 +3668,38 @@ async def register(ctx):
 @bot.command(name='mystats')
 async def my_stats(ctx):
     """View your PUG statistics"""
-    player_data = db_manager.get_player(ctx.author.id, str(ctx.guild.id))
-    
-    total = player_data['total_pugs']
-    wins = player_data['wins']
-    losses = player_data['losses']
-    elo = player_data['elo']
-    rank = get_elo_rank(elo)
-    # Win rate based on actual games played (wins + losses), not total_pugs
-    actual_games = wins + losses
-    win_rate = (wins / actual_games * 100) if actual_games > 0 else 0
-    
-    # Get leaderboard position
-    position, total_players = get_leaderboard_position(ctx.author.id, str(ctx.guild.id))
-    
-    # Find player's most recent PUG to show ELO change
-    recent_pugs = db_manager.get_recent_pugs(20)
-    last_elo_change = None
-    
-    for pug in recent_pugs:
-        if pug.get('winner'):  # Only check PUGs with results
-            player_id = str(ctx.author.id)
-            if player_id in pug['red_team'] or player_id in pug['blue_team']:
-                # Calculate what the ELO change was
-                K_FACTOR = 32
-                expected_red = 1 / (1 + 10 ** ((pug['avg_blue_elo'] - pug['avg_red_elo']) / 400))
-                expected_blue = 1 - expected_red
-                
-                # Determine if player won
-                won = (player_id in pug['red_team'] and pug['winner'] == 'red') or \
-                      (player_id in pug['blue_team'] and pug['winner'] == 'blue')
-                
-                # Calculate change
-                if pug['winner'] == 'red':
-                    if player_id in pug['red_team']:
-                        last_elo_change = K_FACTOR * (1 - expected_red)
-                    else:
-                        last_elo_change = K_FACTOR * (0 - expected_blue)
-                else:  # blue won
-                    if player_id in pug['blue_team']:
-                        last_elo_change = K_FACTOR * (1 - expected_blue)
-                    else:
-                        last_elo_change = K_FACTOR * (0 - expected_red)
-                break
+    summary = get_player_summary(ctx.author.id, str(ctx.guild.id))
+    if not summary:
+        await ctx.send("❌ You are not registered! Use `.register` first.")
+        return
     
     embed = discord.Embed(
         title=f"📊 Statistics for {ctx.author.display_name}",
         color=discord.Color.gold()
     )
-    
-    embed.add_field(name="Total PUGs", value=total, inline=True)
-    embed.add_field(name="Wins", value=wins, inline=True)
-    embed.add_field(name="Losses", value=losses, inline=True)
-    embed.add_field(name="Win Rate", value=f"{win_rate:.1f}%", inline=True)
-    
-    # Show ELO with recent change
-    if last_elo_change is not None:
-        elo_display = f"{elo:.0f} ({last_elo_change:+.0f})"
-    else:
-        elo_display = f"{elo:.0f}"
-    
-    peak_elo = player_data.get('peak_elo')
-    if peak_elo is None:
-        peak_elo = elo
-    
-    # Calculate net ELO over last 10 PUGs
-    recent_pugs_10 = db_manager.get_recent_pugs(100)  # Get more to find player's 10
-    player_pugs = [p for p in recent_pugs_10 if (str(ctx.author.id) in p['red_team'] or str(ctx.author.id) in p['blue_team']) and p.get('winner')]
-    player_pugs = player_pugs[:10]  # Take first 10
-    
-    net_elo_10 = 0
-    if len(player_pugs) > 0:
-        K_FACTOR = 32
-        for pug in player_pugs:
-            expected_red = 1 / (1 + 10 ** ((pug['avg_blue_elo'] - pug['avg_red_elo']) / 400))
-            expected_blue = 1 - expected_red
-            
-            player_id = str(ctx.author.id)
-            if pug['winner'] == 'red':
-                if player_id in pug['red_team']:
-                    net_elo_10 += K_FACTOR * (1 - expected_red)
-                else:
-                    net_elo_10 += K_FACTOR * (0 - expected_blue)
-            else:  # blue won
-                if player_id in pug['blue_team']:
-                    net_elo_10 += K_FACTOR * (1 - expected_blue)
-                else:
-                    net_elo_10 += K_FACTOR * (0 - expected_red)
-    
-    net_elo_display = f"{net_elo_10:+.0f}" if net_elo_10 != 0 else "0"
-    
-    embed.add_field(name="ELO", value=elo_display, inline=True)
-    embed.add_field(name="Peak ELO", value=f"{peak_elo:.0f}", inline=True)
-    embed.add_field(name="Rank", value=rank, inline=True)
-    embed.add_field(name="Last 10 PUGs", value=f"{net_elo_display} ELO", inline=True)
-    
-    # Add streak
-    streak = player_data.get('current_streak', 0)
-    if streak > 0:
-        streak_display = f"🔥 {streak}W"
-    elif streak < 0:
-        streak_display = f"❄️ {abs(streak)}L"
-    else:
-        streak_display = "—"
-    embed.add_field(name="Streak", value=streak_display, inline=True)
-    
-    # Add leaderboard position
-    if position:
-        embed.add_field(name="Leaderboard", value=f"#{position} of {total_players}", inline=True)
+    add_player_summary_fields(embed, summary)
     
     await ctx.send(embed=embed)
 
 @bot.command(name='topelo')
-async def top_elo(ctx):
-    """Show top 10 players by ELO for this server (excludes simulation players and 0-0 players)"""
+async def top_elo(ctx, game_mode: str = None):
+    """Show top 10 players by ELO for this server (excludes simulation players and 0-0 players)
+    
+    Usage:
+    .topelo        - Server ELO
+    .topelo ctf    - ctf's own rating pool (if it has one)
+    """
+    if game_mode is not None:
+        game_mode_resolved = db_manager.resolve_mode_alias(game_mode.lower())
+        mode_data = db_manager.get_game_mode(game_mode_resolved)
+        if not mode_data:
+            await ctx.send(f"❌ Game mode '{game_mode}' not found!")
+            return
+        pool = db_manager.get_mode_rating_pool(game_mode_resolved)
+        if pool is not None:
+            await show_pool_leaderboard(ctx, mode_data, pool)
+            return
+    
     players = db_manager.get_all_players(str(ctx.guild.id))
     
     # Filter out simulation players AND players with 0 pugs (0-0 record)
@@ -3741,6 +3714,7 @@ async def top_elo(ctx):
             # If discord_id is not numeric, include them if they have pugs
             if p['total_pugs'] > 0:
                 active_players.append(p)
+    active_players = filter_inactive_players(active_players, str(ctx.guild.id))
     
     if not active_players:
         await ctx.send("📊 No players with games played found on this server!")
@@ -3750,14 +3724,10 @@ async def top_elo(ctx):
     active_players.sort(key=lambda x: float(x['elo']), reverse=True)
     
     embed = discord.Embed(title="🏆 Top 10 Players by ELO", color=discord.Color.gold())
+    names = await name_resolver.names(ctx.guild, active_players[:10])
     
     for i, player in enumerate(active_players[:10]):
-        try:
-            user = await bot.fetch_user(int(player['discord_id']))
-            name = user.display_name
-        except:
-            name = f"User_{player['discord_id']}"
-        
+        name = names[str(player['discord_id'])]
         rank = get_elo_rank(player['elo'])
         stats = f"ELO: {player['elo']:.0f} ({rank} rank) | {player['wins']}W-{player['losses']}L"
         
@@ -3769,6 +3739,155 @@ async def top_elo(ctx):
     
     await ctx.send(embed=embed)
 
+async def show_pool_leaderboard(ctx, mode_data, pool):
+    """Top 10 of a per-mode rating pool, with the caller's place in it"""
+    server_id = str(ctx.guild.id)
+    leaders = db_manager.get_pool_leaderboard(server_id, pool, limit=10)
+    if not leaders:
+        await ctx.send(f"📊 Nobody has played in the **{pool}** rating pool yet!")
+        return
+    
+    embed = discord.Embed(title=f"🏆 Top 10 Players - {mode_data['name']} ({pool} pool)", color=discord.Color.gold())
+    for i, player in enumerate(leaders):
+        name = player['display_name'] or player['discord_name'] or f"User_{player['discord_id']}"
+        rank = get_elo_rank(player['elo'])
+        embed.add_field(
+            name=f"{i+1}. {name}",
+            value=f"ELO: {player['elo']:.0f} ({rank} rank) | {player['wins']}W-{player['losses']}L",
+            inline=False
+        )
+    
+    position = db_manager.get_pool_rank(server_id, pool, str(ctx.author.id))
+    if position:
+        embed.set_footer(text=f"Your rank: #{position[0]} of {position[1]}")
+    await ctx.send(embed=embed)
+
+@bot.command(name='h2h', aliases=['headtohead'])
+async def head_to_head(ctx, player_1: str = None, player_2: str = None):
+    """Head-to-head record of two players, plus how they do on the same team
+    
+    Usage: .h2h @PlayerA @PlayerB
+    """
+    if player_1 is None or player_2 is None:
+        await ctx.send("❌ Usage: `.h2h @PlayerA @PlayerB`")
+        return
+    
+    member_1, id_1 = await resolve_player_token(ctx, player_1)
+    member_2, id_2 = await resolve_player_token(ctx, player_2)
+    if not member_1 or not member_2:
+        await ctx.send(f"❌ Could not find '{player_1 if not member_1 else player_2}'. Use @mention or exact display name.")
+        return
+    if id_1 == id_2:
+        await ctx.send("❌ Pick two different players!")
+        return
+    
+    pair = db_manager.get_pair_stats(str(ctx.guild.id), id_1, id_2)
+    if not pair['against'] and not pair['together']:
+        await ctx.send(f"📊 {member_1.display_name} and {member_2.display_name} haven't played a PUG together yet!")
+        return
+    
+    embed = discord.Embed(
+        title=f"⚔️ {member_1.display_name} vs {member_2.display_name}",
+        color=discord.Color.orange()
+    )
+    if pair['against']:
+        decided = pair['wins'] + pair['losses']
+        share = f" ({pair['wins'] / decided * 100:.0f}% - {pair['losses'] / decided * 100:.0f}%)" if decided else ""
+        against = f"**{pair['wins']} - {pair['losses']}**{share}"
+        if pair['splits']:
+            against += f" | {pair['splits']} split"
+        embed.add_field(name=f"Head-to-head ({pair['against']} PUGs)", value=against, inline=False)
+    if pair['together']:
+        together = f"{pair['together_wins']}W-{pair['together_losses']}L"
+        if pair['together_splits']:
+            together += f" ({pair['together_splits']} split)"
+        embed.add_field(name=f"Same team ({pair['together']} PUGs)", value=together, inline=False)
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='synergy')
+async def synergy(ctx, player_1: str = None, player_2: str = None):
+    """How two players do as teammates compared with their usual win rate, or a player's best partners
+    
+    Usage:
+    .synergy @PlayerA @PlayerB
+    .synergy @Player           - Best and worst teammates (5+ PUGs together)
+    """
+    if player_1 is None:
+        await ctx.send("❌ Usage: `.synergy @PlayerA [@PlayerB]`")
+        return
+    
+    server_id = str(ctx.guild.id)
+    member_1, id_1 = await resolve_player_token(ctx, player_1)
+    if not member_1:
+        await ctx.send(f"❌ Could not find '{player_1}'. Use @mention or exact display name.")
+        return
+    
+    def win_rate(wins, losses):
+        return wins / (wins + losses) * 100 if wins + losses else None
+    
+    if player_2 is None:
+        partners = [p for p in db_manager.get_partner_stats(server_id, id_1)
+                    if p['together_wins'] + p['together_losses'] > 0]
+        if not partners:
+            await ctx.send(f"📊 {member_1.display_name} hasn't played 5+ PUGs with anyone yet!")
+            return
+        for partner in partners:
+            partner['rate'] = win_rate(partner['together_wins'], partner['together_losses'])
+        partners.sort(key=lambda p: (p['rate'], p['together']), reverse=True)
+        
+        def partner_line(partner):
+            member = ctx.guild.get_member(int(partner['discord_id']))
+            name = member.display_name if member else f"Player_{partner['discord_id']}"
+            return (f"{name}: {partner['rate']:.0f}% "
+                    f"({partner['together_wins']}W-{partner['together_losses']}L)")
+        
+        embed = discord.Embed(title=f"🤝 Teammates of {member_1.display_name}", color=discord.Color.green())
+        embed.add_field(name="Best", value="\n".join(partner_line(p) for p in partners[:5]), inline=False)
+        if len(partners) > 5:
+            embed.add_field(name="Worst", value="\n".join(partner_line(p) for p in partners[::-1][:min(5, len(partners) - 5)]),
+                            inline=False)
+        embed.set_footer(text="Teammates with 5+ PUGs together")
+        await ctx.send(embed=embed)
+        return
+    
+    member_2, id_2 = await resolve_player_token(ctx, player_2)
+    if not member_2:
+        await ctx.send(f"❌ Could not find '{player_2}'. Use @mention or exact display name.")
+        return
+    if id_1 == id_2:
+        await ctx.send("❌ Pick two different players!")
+        return
+    
+    pair = db_manager.get_pair_stats(server_id, id_1, id_2)
+    together_rate = win_rate(pair['together_wins'], pair['together_losses'])
+    if together_rate is None:
+        await ctx.send(f"📊 {member_1.display_name} and {member_2.display_name} haven't won or lost a PUG on the same team yet!")
+        return
+    
+    embed = discord.Embed(
+        title=f"🤝 {member_1.display_name} + {member_2.display_name}",
+        color=discord.Color.green()
+    )
+    together = f"**{together_rate:.0f}%** ({pair['together_wins']}W-{pair['together_losses']}L)"
+    if pair['together_splits']:
+        together += f" | {pair['together_splits']} split"
+    embed.add_field(name=f"Together ({pair['together']} PUGs)", value=together, inline=False)
+    
+    # Compare with how each does overall
+    usual = []
+    for member, discord_id in ((member_1, id_1), (member_2, id_2)):
+        player = db_manager.get_player(discord_id, server_id)
+        rate = win_rate(player['wins'], player['losses']) if player else None
+        if rate is not None:
+            usual.append(rate)
+            embed.add_field(name=member.display_name, value=f"{rate:.0f}% overall", inline=True)
+    if len(usual) == 2:
+        lift = together_rate - sum(usual) / 2
+        embed.add_field(name="Synergy", value=f"{lift:+.0f} points vs their average", inline=False)
+    
+    await ctx.send(embed=embed)
+
 @bot.command(name='top10')
 async def top_10(ctx):
     """Show top 10 most active players for this server (excludes simulation players)"""
@@ -3785,13 +3904,10 @@ async def top_10(ctx):
     active_players.sort(key=lambda x: x['total_pugs'], reverse=True)
     
     embed = discord.Embed(title="🎮 Top 10 Most Active Players", color=discord.Color.blue())
+    names = await name_resolver.names(ctx.guild, active_players[:10])
     
     for i, player in enumerate(active_players[:10]):
-        try:
-            user = await bot.fetch_user(int(player['discord_id']))
-            name = user.display_name
-        except:
-            name = f"User_{player['discord_id']}"
+        name = names[str(player['discord_id'])]
         
         # Win rate based on actual games (wins + losses), not total_pugs
         actual_games = player['wins'] + player['losses']
@@ -3886,50 +4002,12 @@ async def player_elos_dm(ctx):
 @bot.command(name='longestwin', aliases=['beststreak'])
 async def longest_win_streak(ctx):
     """Show the player with the longest winning streak (all-time)"""
-    players = db_manager.get_all_players(str(ctx.guild.id))
-    
-    # Filter out simulation players
-    active_players = []
-    for p in players:
-        try:
-            discord_id_int = int(p['discord_id'])
-            if not (1000 <= discord_id_int <= 1999):
-                active_players.append(p)
-        except ValueError:
-            active_players.append(p)
-    
-    if not active_players:
-        await ctx.send("📊 No players found!")
-        return
-    
-    # Find player with highest positive streak (current_streak field tracks this)
-    # But we need to check historical max, not just current
-    # For now, use current_streak and get_player data
-    max_streak = 0
-    max_streak_player = None
-    
-    for player in active_players:
-        # Get best_win_streak from database if it exists, otherwise use current_streak if positive
-        best_streak = player.get('best_win_streak', 0)
-        current_streak = player.get('current_streak', 0)
-        
-        # Use the best available value
-        player_best = max(best_streak, current_streak if current_streak > 0 else 0)
-        
-        if player_best > max_streak:
-            max_streak = player_best
-            max_streak_player = player
-    
-    if not max_streak_player or max_streak == 0:
+    record = db_manager.get_streak_record(str(ctx.guild.id), 'win')
+    if not record:
         await ctx.send("📊 No winning streaks recorded yet!")
         return
     
-    # Get Discord member
-    try:
-        member = await ctx.guild.fetch_member(int(max_streak_player['discord_id']))
-        display_name = member.display_name
-    except:
-        display_name = f"Player {max_streak_player['discord_id']}"
+    display_name = await name_resolver.name(ctx.guild, record, fallback="Player {}")
     
     embed = discord.Embed(
         title="🔥 Longest Winning Streak",
@@ -3937,11 +4015,11 @@ async def longest_win_streak(ctx):
         color=discord.Color.gold()
     )
     
-    embed.add_field(name="Streak", value=f"{max_streak} wins in a row", inline=True)
+    embed.add_field(name="Streak", value=f"{record['streak']} wins in a row", inline=True)
     embed.add_field(name="Player", value=display_name, inline=True)
-    embed.add_field(name="Current ELO", value=f"{max_streak_player['elo']:.0f}", inline=True)
+    embed.add_field(name="Current ELO", value=f"{record['elo']:.0f}", inline=True)
     
-    current_streak = max_streak_player.get('current_streak', 0)
+    current_streak = record['current_streak']
     if current_streak > 0:
         embed.add_field(name="Current Streak", value=f"🔥 {current_streak}W (Active!)", inline=True)
     
@@ -3950,48 +4028,12 @@ async def longest_win_streak(ctx):
 @bot.command(name='longestloss', aliases=['worststreak'])
 async def longest_loss_streak(ctx):
     """Show the player with the longest losing streak (all-time)"""
-    players = db_manager.get_all_players(str(ctx.guild.id))
-    
-    # Filter out simulation players
-    active_players = []
-    for p in players:
-        try:
-            discord_id_int = int(p['discord_id'])
-            if not (1000 <= discord_id_int <= 1999):
-                active_players.append(p)
-        except ValueError:
-            active_players.append(p)
-    
-    if not active_players:
-        await ctx.send("📊 No players found!")
-        return
-    
-    # Find player with highest loss streak (stored as negative in current_streak or best_loss_streak)
-    max_loss_streak = 0
-    max_loss_player = None
-    
-    for player in active_players:
-        # Get best_loss_streak from database if it exists, otherwise use current_streak if negative
-        best_loss = player.get('best_loss_streak', 0)
-        current_streak = player.get('current_streak', 0)
-        
-        # Use the best (worst) available value
-        player_worst = max(best_loss, abs(current_streak) if current_streak < 0 else 0)
-        
-        if player_worst > max_loss_streak:
-            max_loss_streak = player_worst
-            max_loss_player = player
-    
-    if not max_loss_player or max_loss_streak == 0:
+    record = db_manager.get_streak_record(str(ctx.guild.id), 'loss')
+    if not record:
         await ctx.send("📊 No losing streaks recorded yet!")
         return
     
-    # Get Discord member
-    try:
-        member = await ctx.guild.fetch_member(int(max_loss_player['discord_id']))
-        display_name = member.display_name
-    except:
-        display_name = f"Player {max_loss_player['discord_id']}"
+    display_name = await name_resolver.name(ctx.guild, record, fallback="Player {}")
     
     embed = discord.Embed(
         title="❄️ Longest Losing Streak",
@@ -3999,11 +4041,11 @@ async def longest_loss_streak(ctx):
         color=discord.Color.blue()
     )
     
-    embed.add_field(name="Streak", value=f"{max_loss_streak} losses in a row", inline=True)
+    embed.add_field(name="Streak", value=f"{record['streak']} losses in a row", inline=True)
     embed.add_field(name="Player", value=display_name, inline=True)
-    embed.add_field(name="Current ELO", value=f"{max_loss_player['elo']:.0f}", inline=True)
+    embed.add_field(name="Current ELO", value=f"{record['elo']:.0f}", inline=True)
     
-    current_streak = max_loss_player.get('current_streak', 0)
+    current_streak = record['current_streak']
     if current_streak < 0:
         embed.add_field(name="Current Streak", value=f"❄️ {abs(current_streak)}L (Active!)", inline=True)
     
@@ -4369,6 +4411,47 @@ async def bot_status(ctx):
     embed.add_field(name="🤖 Autopick (Default)", value=autopick_status, inline=True)
     embed.add_field(name="📡 Stats Scraping", value=scraping_status, inline=True)
     
+    # Reaction votes are counted from gateway events - REST calls only post the vote and its reactions
+    vote_stats = vote_manager.stats()
+    embed.add_field(name="🗳️ Active Votes",
+                    value=f"{vote_stats['active']} ({vote_stats['active_rest_calls']} REST calls)", inline=True)
+    embed.add_field(name="📨 Vote REST Calls",
+                    value=f"{vote_stats['rest_calls']} over {vote_stats['finished'] + vote_stats['active']} votes",
+                    inline=True)
+    embed.add_field(name="👆 Vote Reactions", value=vote_stats['events'], inline=True)
+    
+    dm_stats = dm_dispatcher.stats()
+    embed.add_field(name="✉️ Queue DMs",
+                    value=f"{dm_stats['sent']} sent, {dm_stats['skipped']} skipped "
+                          f"({dm_stats['closed']} users with DMs closed), {dm_stats['failed']} failed",
+                    inline=False)
+    
+    name_stats = name_resolver.stats()
+    embed.add_field(name="🏷️ Name Lookups",
+                    value=f"{name_stats['cache_hits']} cached, {name_stats['stored_hits']} stored, "
+                          f"{name_stats['api_calls']} API ({name_stats['failed']} failed)",
+                    inline=False)
+    
+    slowest = command_latency.stats()[:5]
+    if slowest:
+        embed.add_field(name="⏱️ Slowest Commands (p95)",
+                        value="\n".join(f".{row['command']}: {row['p95'] * 1000:.0f}ms "
+                                        f"(avg {row['avg'] * 1000:.0f}ms, {row['count']} runs)" for row in slowest),
+                        inline=False)
+    
+    edit_stats = message_states.stats()
+    embed.add_field(name="✏️ Ready Check Edits",
+                    value=f"{edit_stats['edits']} made for {edit_stats['requested']} updates "
+                          f"({edit_stats['saved']} saved)",
+                    inline=False)
+    
+    # Channel messages queued through the outbound scheduler vs. sends actually made
+    outbound_stats = outbound.stats()
+    embed.add_field(name="📤 Queue Messages",
+                    value=f"{outbound_stats['requested']} in {outbound_stats['sent']} sends "
+                          f"({outbound_stats['pending']} queued, {outbound_stats['throttled_seconds']:.0f}s paced)",
+                    inline=False)
+    
     # Game Modes List
     embed.add_field(name="🎮 Available Game Modes", value=modes_text, inline=False)
     
@@ -4459,59 +4542,42 @@ async def undo_player_pugs(ctx):
         await ctx.send("❌ Confirmation timed out. Undo cancelled.")
 
 @bot.command(name='exportstats')
-async def export_stats(ctx):
-    """Export player stats as CSV for this server (Admin only)"""
-    if not is_full_admin(ctx):
+async def export_stats(ctx, kind: str = 'players'):
+    """Export server data as a gzipped CSV (Admin only)
+    
+    Usage:
+    .exportstats           - Player stats (can be edited and re-imported with .importelos)
+    .exportstats matches   - Every PUG with its teams and result
+    .exportstats ledger    - ELO change of every player in every rated PUG
+    """
+    if not is_full_admin(ctx):
         await ctx.send("❌ You don't have permission to use this command!")
         return
     
-    # Get players for this server only
-    players = db_manager.get_all_players(str(ctx.guild.id))
-    
-    if not players:
-        await ctx.send("❌ No player data to export for this server!")
+    kind = kind.lower()
+    if kind not in EXPORT_KINDS:
+        await ctx.send(f"❌ Unknown export '{kind}'. Use one of: {', '.join(EXPORT_KINDS)}")
         return
     
-    # Create CSV content in memory
-    import io
-    csv_buffer = io.StringIO()
-    csv_buffer.write("Discord ID,Display Name,ELO,Peak ELO,Total PUGs,Wins,Losses,Win Rate,Current Streak\n")
+    # Names from the member cache - players who left use the name stored with them (no API calls)
+    member_names = {str(member.id): member.display_name for member in ctx.guild.members}
+    file_bytes, row_count = await asyncio.to_thread(build_export, db_manager, kind, str(ctx.guild.id), member_names)
     
-    for player in players:
-        discord_id = player['discord_id']
-        try:
-            member = await ctx.guild.fetch_member(int(discord_id))
-            display_name = member.display_name
-        except:
-            display_name = f"User {discord_id}"
-        
-        elo = player['elo']
-        peak_elo = player.get('peak_elo', elo)
-        total = player['total_pugs']
-        wins = player['wins']
-        losses = player['losses']
-        # Win rate based on actual games (wins + losses), not total_pugs
-        actual_games = wins + losses
-        win_rate = (wins / actual_games * 100) if actual_games > 0 else 0
-        streak = player.get('current_streak', 0)
-        
-        # Escape display name for CSV (in case it has commas)
-        display_name_escaped = f'"{display_name}"' if ',' in display_name else display_name
-        
-        csv_buffer.write(f"{discord_id},{display_name_escaped},{elo:.0f},{peak_elo:.0f},{total},{wins},{losses},{win_rate:.1f}%,{streak}\n")
+    if not row_count:
+        await ctx.send(f"❌ No {'player data' if kind == 'players' else kind} to export for this server!")
+        return
     
     # Create filename
-    filename = f"pug_stats_{ctx.guild.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    
-    # Convert StringIO to BytesIO for Discord
-    csv_buffer.seek(0)
-    file_bytes = io.BytesIO(csv_buffer.getvalue().encode('utf-8'))
+    prefix = {'players': 'pug_stats', 'matches': 'pug_matches', 'ledger': 'pug_elo_ledger'}[kind]
+    filename = f"{prefix}_{ctx.guild.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv.gz"
+    label = {'players': 'Player statistics', 'matches': 'Match history', 'ledger': 'ELO ledger'}[kind]
+    count_label = {'players': 'Total players', 'matches': 'Total PUGs', 'ledger': 'Rows'}[kind]
     
     try:
         # Send file via DM
         await ctx.author.send(
-            f"📊 Player statistics export for **{ctx.guild.name}**\n"
-            f"Total players: {len(players)}\n"
+            f"📊 {label} export for **{ctx.guild.name}**\n"
+            f"{count_label}: {row_count}\n"
             f"Exported: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}", 
             file=discord.File(file_bytes, filename)
         )
@@ -4521,7 +4587,7 @@ async def export_stats(ctx):
         file_bytes.seek(0)  # Reset buffer
         await ctx.send(f"⚠️ I couldn't DM you. Sending here instead:")
         await ctx.send(
-            f"📊 Player statistics export for **{ctx.guild.name}**", 
+            f"📊 {label} export for **{ctx.guild.name}**", 
             file=discord.File(file_bytes, filename)
         )
     except Exception as e:
@@ -4531,7 +4597,7 @@ async def export_stats(ctx):
 async def import_elos(ctx):
     """Import ELO updates from CSV (Admin only - must be used in server channel)
     
-    Usage: Use this command in #tampro and attach a CSV file
+    Usage: Use this command in #tampro and attach a CSV file (.csv or .csv.gz from .exportstats)
     CSV Format: discord_id,elo OR display_name,elo
     Example:
     123456789,1200
@@ -4576,7 +4642,7 @@ Discord ID,Display Name,ELO,Total PUGs,Wins,Losses,Win Rate
 ```
 
 **Steps:**
-1. Export current ELOs: `.exportstats`
+1. Export current ELOs: `.exportstats` (a .csv.gz - attach it as is, or unzip it to edit)
 2. Edit the CSV file with new ELOs (column 3)
 3. In #tampro: `.importelos` + attach edited CSV
 4. Type CONFIRM to apply changes
@@ -4586,23 +4652,24 @@ Discord ID,Display Name,ELO,Total PUGs,Wins,Losses,Win Rate
     attachment = ctx.message.attachments[0]
     
     # Check if it's a CSV file
-    if not attachment.filename.endswith('.csv'):
-        await ctx.send("❌ File must be a CSV (.csv extension)")
+    if not attachment.filename.lower().endswith(('.csv', '.csv.gz')):
+        await ctx.send("❌ File must be a CSV (.csv or .csv.gz extension)")
         return
     
     try:
-        # Download and parse CSV
+        # Download and parse CSV (quoted names with commas are kept together)
         import io
+        import csv
         file_content = await attachment.read()
-        csv_text = file_content.decode('utf-8')
+        csv_text = read_csv_text(attachment.filename, file_content)
         
         elo_updates = []
         errors = []
-        line_num = 0
+        reader = csv.reader(io.StringIO(csv_text))
         
-        for line in csv_text.strip().split('\n'):
-            line_num += 1
-            line = line.strip()
+        for parts in reader:
+            line_num = reader.line_num
+            line = ",".join(parts).strip()
             
             if not line or line.startswith('#'):  # Skip empty lines and comments
                 continue
@@ -4611,7 +4678,6 @@ Discord ID,Display Name,ELO,Total PUGs,Wins,Losses,Win Rate
             if 'discord' in line.lower() and 'elo' in line.lower():
                 continue
             
-            parts = line.split(',')
             if len(parts) < 2:
                 errors.append(f"Line {line_num}: Invalid format (need at least 2 columns)")
                 continue
@@ -4683,7 +4749,8 @@ You have 30 seconds to respond.
             return
         
         # Perform bulk update
-        success_count, error_count, db_errors = db_manager.bulk_update_elos(str(ctx.guild.id), elo_updates)
+        success_count, error_count, db_errors = await run_rating_write(ctx.guild.id, db_manager.bulk_update_elos,
+                                                                       str(ctx.guild.id), elo_updates)
         
         await ctx.send(f"""
 ✅ **ELO Import Complete**
@@ -4702,7 +4769,7 @@ Use `.topelo` to see the updated rankings!
             await ctx.send(f"**Database Errors:**\n```\n{error_msg}\n```")
         
         # Auto-update leaderboard after ELO changes
-        await update_leaderboard(ctx.guild.id)
+        schedule_leaderboard_refresh(ctx.guild.id)
         
     except Exception as e:
         await ctx.send(f"❌ Error processing CSV: {e}")
@@ -5184,7 +5251,7 @@ async def set_elo(ctx, player_name: str, new_elo: int):
         return
     
     # Update ELO
-    db_manager.update_player_elo(discord_id, str(ctx.guild.id), new_elo)
+    await run_rating_write(ctx.guild.id, db_manager.set_player_elo, str(ctx.guild.id), discord_id, new_elo)
     new_rank = get_elo_rank(new_elo)
     
     # Show confirmation
@@ -5203,7 +5270,7 @@ async def set_elo(ctx, player_name: str, new_elo: int):
     await ctx.send(embed=embed)
     
     # Auto-update leaderboard after ELO change
-    await update_leaderboard(ctx.guild.id)
+    schedule_leaderboard_refresh(ctx.guild.id)
 
 @bot.command(name='setpugs')
 async def set_pugs(ctx, player_name: str, total_pugs: int):
@@ -5304,15 +5371,7 @@ async def set_peak(ctx, player_name: str, peak_elo: int):
     current_elo = player_data['elo']
     
     # Update peak_elo directly
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE players 
-        SET peak_elo = ?
-        WHERE discord_id = ? AND server_id = ?
-    """, (peak_elo, discord_id, str(ctx.guild.id)))
-    conn.commit()
-    conn.close()
+    await run_rating_write(ctx.guild.id, db_manager.set_player_peak, str(ctx.guild.id), discord_id, peak_elo)
     
     # Show confirmation
     embed = discord.Embed(
@@ -5416,13 +5475,12 @@ async def reset_elo_all(ctx):
         return
     
     # Reset each player to 700
-    for player in players:
-        db_manager.update_player_elo(player['discord_id'], str(ctx.guild.id), 700)
+    await run_rating_write(ctx.guild.id, db_manager.reset_all_elos, str(ctx.guild.id), [p['discord_id'] for p in players], 700)
     
     await ctx.send(f"✅ **Reset complete!** All {len(players)} players on this server now have 700 ELO.")
     
     # Auto-update leaderboard after ELO changes
-    await update_leaderboard(ctx.guild.id)
+    schedule_leaderboard_refresh(ctx.guild.id)
 
 @bot.command(name='resetplayerpugs')
 async def reset_player_pugs(ctx):
@@ -5454,17 +5512,7 @@ async def reset_player_pugs(ctx):
         return
     
     # Reset wins and losses for each player
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE players 
-        SET wins = 0, losses = 0
-        WHERE server_id = ?
-    ''', (str(ctx.guild.id),))
-    
-    conn.commit()
-    conn.close()
+    await run_rating_write(ctx.guild.id, db_manager.reset_all_records, str(ctx.guild.id), [p['discord_id'] for p in players])
     
     await ctx.send(f"✅ **Reset complete!** All {len(players)} players now have 0 wins and 0 losses.")
 
@@ -5506,56 +5554,488 @@ async def reset_pug_stats(ctx):
     
     await ctx.send(f"✅ **Reset complete!** Total PUGs count reset for {affected} players on this server.")
 
-@bot.command(name='cleanduplicates')
-async def clean_duplicates(ctx):
-    """Remove duplicate player entries (keeps real Discord users, removes failures) (Admin only)"""
+@bot.command(name='replayratings')
+async def replay_ratings(ctx, mode: str = None):
+    """Recompute every rating from PUG history (Admin role only)
+    
+    Usage:
+    .replayratings        - Dry run: show what would change (with a CSV diff)
+    .replayratings apply  - Write the replayed ratings back
+    
+    Replays all settled PUGs in order with each game mode's rating engine, keeping
+    manual changes (.setelo, .importelos, resets) at the point they were made.
+    Modes with their own rating pool are re-rated in that pool.
+    """
     if not is_full_admin(ctx):
         await ctx.send("❌ You don't have permission to use this command!")
         return
     
-    # Get all players for this server
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
+    apply = mode is not None and mode.lower() == 'apply'
+    if mode is not None and not apply:
+        await ctx.send("❌ Usage: `.replayratings` (dry run) or `.replayratings apply`")
+        return
     
-    cursor.execute('''
-        SELECT discord_id, elo FROM players 
-        WHERE server_id = ?
-        ORDER BY elo DESC
-    ''', (str(ctx.guild.id),))
+    server_id = str(ctx.guild.id)
+    # Replays run in a worker thread so the bot keeps responding
+    result, players, changes = await asyncio.to_thread(replay_server_ratings, server_id)
+    
+    rate = result['pugs'] / result['seconds'] if result['seconds'] > 0 else 0
+    player_changes = sum(1 for change in changes if change['pool'] is None)
+    pool_changes = len(changes) - player_changes
+    description = (f"Replayed **{result['pugs']}** PUGs in {result['seconds']:.2f}s ({rate:,.0f} PUGs/sec)\n"
+                   f"**{player_changes}** of {len(players)} players would change")
+    if pool_changes:
+        description += f", plus **{pool_changes}** rating pool entries"
+    embed = discord.Embed(
+        title="🔄 Rating Replay" + ("" if apply else " (Dry Run)"),
+        description=description,
+        color=discord.Color.blue()
+    )
+    
+    if changes:
+        lines = []
+        largest = sorted(changes, key=lambda c: abs(c['new']['elo'] - (c['old']['elo'] or c['new']['elo'])), reverse=True)
+        for change in largest[:10]:
+            member = ctx.guild.get_member(int(change['discord_id'])) if change['discord_id'].isdigit() else None
+            name = member.display_name if member else f"User {change['discord_id']}"
+            if change['pool'] is not None:
+                name += f" [{change['pool']}]"
+            old_elo = change['old']['elo']
+            new_elo = change['new']['elo']
+            if old_elo is None:
+                lines.append(f"{name}: new → {new_elo:.0f}")
+            else:
+                lines.append(f"{name}: {old_elo:.0f} → {new_elo:.0f} ({new_elo - old_elo:+.0f})")
+        embed.add_field(name="Largest ELO Changes", value="\n".join(lines), inline=False)
+    
+    if not changes:
+        await ctx.send(embed=embed)
+        await ctx.send("✅ Stored ratings already match the replayed history.")
+        return
+    
+    # Full diff as CSV
+    import io
+    csv_buffer = io.StringIO()
+    csv_buffer.write("Discord ID,Pool,Old ELO,New ELO,Old Peak,New Peak,Old Wins,New Wins,Old Losses,New Losses,Changed\n")
+    for change in changes:
+        old, new = change['old'], change['new']
+        old_elo = f"{old['elo']:.1f}" if old['elo'] is not None else ""
+        old_peak = f"{old['peak_elo']:.1f}" if old['peak_elo'] is not None else ""
+        new_peak = f"{new['peak_elo']:.1f}" if new['peak_elo'] is not None else ""
+        old_wins = old['wins'] if old['wins'] is not None else ""
+        old_losses = old['losses'] if old['losses'] is not None else ""
+        csv_buffer.write(f"{change['discord_id']},{change['pool'] or ''},{old_elo},{new['elo']:.1f},{old_peak},{new_peak},"
+                         f"{old_wins},{new['wins']},{old_losses},{new['losses']},{' '.join(change['fields'])}\n")
+    file_bytes = io.BytesIO(csv_buffer.getvalue().encode('utf-8'))
+    filename = f"rating_replay_{ctx.guild.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    
+    await ctx.send(embed=embed, file=discord.File(file_bytes, filename))
+    
+    if not apply:
+        await ctx.send("ℹ️ Nothing was changed. Use `.replayratings apply` to write these ratings.")
+        return
+    
+    await ctx.send(f"⚠️ **WARNING:** This will overwrite ELO, peak, wins/losses and streaks for {player_changes} players"
+                   + (f" and {pool_changes} rating pool entries" if pool_changes else "")
+                   + "!\nType `CONFIRM` to proceed or `CANCEL` to abort.")
+    
+    def check(m):
+        return m.author == ctx.author and m.channel == ctx.channel
+    
+    try:
+        msg = await bot.wait_for('message', check=check, timeout=30.0)
+        
+        if msg.content.upper() != 'CONFIRM':
+            await ctx.send("❌ Replay cancelled.")
+            return
+    except asyncio.TimeoutError:
+        await ctx.send("❌ Replay cancelled (timeout).")
+        return
+    
+    # Replayed again under the lock - results settled while waiting for CONFIRM are included
+    updated, pool_updated = await run_rating_write(server_id, apply_server_replay, server_id)
+    await ctx.send(f"✅ **Replay applied!** Updated {updated} players"
+                   + (f" and {pool_updated} rating pool entries." if pool_updated else "."))
+    
+    # Auto-update leaderboard after ELO changes
+    schedule_leaderboard_refresh(ctx.guild.id)
+
+@bot.command(name='ledger')
+async def rating_ledger(ctx, player_name: str):
+    """Show a player's recent manual rating changes with their ledger IDs (Admin role only)
+    
+    Usage:
+    .ledger @Player
+    
+    Use the IDs with .voidadjustment to stop a mistaken change being kept by .replayratings.
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    member, discord_id = await resolve_player(ctx, player_name)
+    if not member:
+        await ctx.send(f"❌ Could not find player '{player_name}'!")
+        return
+    
+    rows = db_manager.get_player_adjustments(str(ctx.guild.id), discord_id)
+    if not rows:
+        await ctx.send(f"ℹ️ No rating changes recorded for {member.display_name}.")
+        return
+    
+    lines = []
+    for row in rows:
+        changes = []
+        if row['elo'] is not None:
+            changes.append(f"ELO {row['elo']:.0f}")
+        if row['elo_delta'] is not None:
+            changes.append(f"ELO {row['elo_delta']:+.1f}")
+        if row['peak_elo'] is not None:
+            changes.append(f"peak {row['peak_elo']:.0f}")
+        if row['wins'] is not None or row['losses'] is not None:
+            changes.append(f"W/L {row['wins'] if row['wins'] is not None else '-'}/"
+                           f"{row['losses'] if row['losses'] is not None else '-'}")
+        line = (f"`#{row['id']}` {row['source']} after PUG #{row['after_pug_id']} - "
+                f"{', '.join(changes) or 'streaks'} ({(row['created_at'] or '')[:10]})")
+        lines.append(f"~~{line}~~ (voided)" if row['voided'] else line)
+    
+    embed = discord.Embed(
+        title=f"📒 Rating Ledger - {member.display_name}",
+        description="\n".join(lines),
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text="Newest first • .voidadjustment <id> to exclude a change from .replayratings")
+    await ctx.send(embed=embed)
+
+@bot.command(name='voidadjustment')
+async def void_adjustment(ctx, adjustment_id: int, action: str = None):
+    """Exclude a mistaken rating change from .replayratings (Admin role only)
+    
+    Usage:
+    .voidadjustment 123          - Void ledger row #123 (see .ledger @Player)
+    .voidadjustment 123 restore  - Use it again
+    
+    Current ratings are not touched - run .replayratings apply to recompute them without it.
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
     
-    all_players = cursor.fetchall()
+    restore = action is not None and action.lower() == 'restore'
+    if action is not None and not restore:
+        await ctx.send("❌ Usage: `.voidadjustment <id>` or `.voidadjustment <id> restore`")
+        return
+    
+    row = db_manager.set_adjustment_voided(str(ctx.guild.id), adjustment_id, voided=not restore)
+    if row is None:
+        await ctx.send(f"❌ No ledger entry #{adjustment_id} on this server!")
+        return
+    if row['source'] == 'baseline':
+        await ctx.send(f"❌ #{adjustment_id} is the starting snapshot and can't be voided - use `.setelo` instead.")
+        return
+    if row['voided'] != restore:
+        await ctx.send(f"ℹ️ #{adjustment_id} is already {'active' if restore else 'voided'}.")
+        return
     
-    # Find duplicates: same ELO, but one user can't be fetched from Discord
-    to_delete = []
-    seen_elos = {}
+    await ctx.send(f"✅ Ledger entry #{adjustment_id} ({row['source']}, <@{row['discord_id']}>) "
+                   f"{'restored' if restore else 'voided'}. Run `.replayratings` to see the effect, "
+                   f"then `.replayratings apply` to write it.")
+
+@bot.command(name='whatif')
+async def what_if_ratings(ctx, *options):
+    """Simulate PUG history under different rating settings - nothing is saved (Admin role only)
     
-    for discord_id, elo in all_players:
-        # Try to fetch the user from Discord
+    Usage:
+    .whatif k=24                 - ELO with a different K-factor
+    .whatif engine=glicko2 tau=0.3
+    .whatif seed=1000            - Everyone starts from 1000 ELO at the first PUG
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    usage = "❌ Usage: `.whatif [engine=elo|glicko2] [k=24] [tau=0.5] [seed=1000]`"
+    settings = {}
+    for option in options:
+        key, _, value = option.partition('=')
+        key = key.lower()
+        if key == 'engine' and value.lower() in RATING_ENGINES:
+            settings['engine'] = value.lower()
+            continue
+        if key not in ('k', 'tau', 'seed'):
+            await ctx.send(usage)
+            return
         try:
-            user = await bot.fetch_user(int(discord_id))
-            # User exists in Discord - this is a valid entry
-            if elo in seen_elos:
-                # We have a duplicate ELO - keep this valid one, mark old one for deletion
-                old_id = seen_elos[elo]
-                if old_id not in to_delete:
-                    to_delete.append(old_id)
-            seen_elos[elo] = discord_id
-        except:
-            # Can't fetch user - this is likely an invalid/old entry
-            to_delete.append(discord_id)
+            settings[key] = float(value)
+        except ValueError:
+            await ctx.send(usage)
+            return
+        if key in ('k', 'tau') and not settings[key] > 0:
+            await ctx.send(f"❌ `{key}` must be greater than 0!")
+            return
+    if not settings:
+        await ctx.send(usage)
+        return
+    
+    status_msg = await ctx.send("🔄 Replaying PUG history...")
+    # Replays run in a worker thread so the bot keeps responding
+    result = await asyncio.to_thread(run_simulation, db_manager, str(ctx.guild.id), settings.get('engine'),
+                                     settings.get('k'), settings.get('tau'), settings.get('seed'))
+    current, alternative = result['current'], result['alternative']
+    if not current['predictions']:
+        await status_msg.edit(content="❌ No decided PUGs to simulate on this server!")
+        return
+    
+    described = ", ".join(f"{key}={value:g}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in settings.items())
+    embed = discord.Embed(
+        title="🧪 What-If Rating Simulation",
+        description=f"**{described}** vs current settings\n"
+                    f"Replayed {current['pugs']} PUGs in {current['seconds'] + alternative['seconds']:.2f}s - nothing was saved",
+        color=discord.Color.blue()
+    )
+    for label, run in (("Current", current), ("What-If", alternative)):
+        predictions = run['predictions']
+        embed.add_field(
+            name=label,
+            value=f"Log-loss: **{predictions['log_loss']:.4f}**\n"
+                  f"Brier: **{predictions['brier']:.4f}**\n"
+                  f"Favourite won: **{predictions['accuracy']:.1%}**",
+            inline=True
+        )
+    
+    churn = result['churn']
+    embed.add_field(
+        name="Ladder Churn",
+        value=f"Mean move: **{churn['mean_move']:.1f}** places (max {churn['max_move']})\n"
+              f"Top {churn['top_n']} kept: **{churn['top_kept']}/{churn['top_n']}**\n"
+              f"Rank correlation: **{churn['spearman']:.3f}**",
+        inline=False
+    )
+    if churn['movers']:
+        lines = []
+        for mover in churn['movers']:
+            member = ctx.guild.get_member(int(mover['discord_id'])) if mover['discord_id'].isdigit() else None
+            name = member.display_name if member else f"User {mover['discord_id']}"
+            lines.append(f"{name}: #{mover['old_rank']} → #{mover['new_rank']} "
+                         f"({mover['old_elo']:.0f} → {mover['new_elo']:.0f})")
+        embed.add_field(name="Biggest Movers", value="\n".join(lines), inline=False)
+    if result['pool_churn']:
+        embed.add_field(
+            name="Rating Pools",
+            value="\n".join(f"**{pool}**: mean move {churn['mean_move']:.1f} places, "
+                            f"top {churn['top_n']} kept {churn['top_kept']}/{churn['top_n']}"
+                            for pool, churn in result['pool_churn'].items()),
+            inline=False
+        )
+    embed.set_footer(text="Lower log-loss/Brier = better predictions")
+    
+    await status_msg.edit(content=None, embed=embed)
+
+@background_job('rating_decay', RATING_DECAY_CHECK_INTERVAL)
+async def rating_decay_job():
+    """Decay inactive players on every server with decay on (each server at most once a day)"""
+    for server_id in db_manager.get_decay_servers():
+        result = await run_rating_write(server_id, db_manager.run_rating_decay, server_id)
+        if result and (result['decayed'] or result['flagged']):
+            print(f"📉 Rating decay for server {server_id}: {result['decayed']} decayed, {result['inactive']} inactive")
+            # One leaderboard refresh for the whole batch
+            schedule_leaderboard_refresh(int(server_id))
+
+@bot.command(name='decay')
+async def rating_decay(ctx, setting: str = None, value: str = None):
+    """Configure rating decay for inactive players (Admin role only)
+    
+    Usage:
+    .decay               - Show settings
+    .decay on / off      - Enable/disable decay
+    .decay days 28       - Days without a PUG before a player is inactive
+    .decay rate 10       - ELO lost per week while inactive
+    .decay floor 1000    - Decay never takes a player below this ELO
+    .decay hide on / off - Hide inactive players from leaderboard/topelo
+    .decay run           - Run a decay pass now
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    server_id = str(ctx.guild.id)
+    setting = setting.lower() if setting else None
+    
+    if setting in ('on', 'off'):
+        db_manager.set_decay_setting(server_id, 'enabled', 1 if setting == 'on' else 0)
+        if setting == 'on':
+            await ctx.send("✅ **Rating decay enabled!** Inactive players will be checked every hour.")
+        else:
+            await ctx.send("✅ **Rating decay disabled.** Inactive flags cleared.")
+        schedule_leaderboard_refresh(ctx.guild.id)
+        return
+    
+    if setting == 'run':
+        if not db_manager.get_decay_settings(server_id)['enabled']:
+            await ctx.send("❌ Rating decay is off. Turn it on with `.decay on` first.")
+            return
+        result = await run_rating_write(server_id, db_manager.run_rating_decay, server_id, True)
+        if result is None:
+            await ctx.send("❌ Rating decay was turned off. Nothing was decayed.")
+            return
+        await ctx.send(f"✅ **Decay pass complete!** {result['decayed']} players decayed "
+                       f"(-{result['total_decay']:.0f} ELO total), {result['inactive']} inactive.")
+        schedule_leaderboard_refresh(ctx.guild.id)
+        return
+    
+    numeric = {'days': ('inactive_days', int), 'rate': ('decay_per_week', float), 'floor': ('decay_floor', float)}
+    if setting in numeric:
+        field, cast = numeric[setting]
+        try:
+            number = cast(value)
+        except (TypeError, ValueError):
+            await ctx.send(f"❌ Usage: `.decay {setting} <number>`")
+            return
+        if number < 0 or (setting == 'days' and number < 1):
+            await ctx.send("❌ Value must be positive!")
+            return
+        db_manager.set_decay_setting(server_id, field, number)
+        await ctx.send(f"✅ Decay **{setting}** set to **{number:g}**.")
+        return
+    
+    if setting == 'hide' and value and value.lower() in ('on', 'off'):
+        db_manager.set_decay_setting(server_id, 'hide_inactive', 1 if value.lower() == 'on' else 0)
+        await ctx.send(f"✅ Inactive players will be **{'hidden from' if value.lower() == 'on' else 'shown on'}** the leaderboard.")
+        schedule_leaderboard_refresh(ctx.guild.id)
+        return
+    
+    if setting is not None:
+        await ctx.send("❌ Usage: `.decay [on|off|days N|rate N|floor N|hide on/off|run]`")
+        return
+    
+    settings = db_manager.get_decay_settings(server_id)
+    inactive = sum(1 for p in db_manager.get_all_players(server_id) if p.get('inactive'))
+    embed = discord.Embed(
+        title="📉 Rating Decay",
+        description="✅ Enabled" if settings['enabled'] else "❌ Disabled",
+        color=discord.Color.green() if settings['enabled'] else discord.Color.red()
+    )
+    embed.add_field(name="Inactive After", value=f"{settings['inactive_days']} days", inline=True)
+    embed.add_field(name="Decay", value=f"{settings['decay_per_week']:g} ELO/week", inline=True)
+    embed.add_field(name="Floor", value=f"{settings['decay_floor']:g} ELO", inline=True)
+    embed.add_field(name="Hide Inactive", value="Yes" if settings['hide_inactive'] else "No", inline=True)
+    embed.add_field(name="Inactive Players", value=str(inactive), inline=True)
+    embed.add_field(name="Last Run", value=f"{settings['last_run_at']} UTC" if settings['last_run_at'] else "Never", inline=True)
+    await ctx.send(embed=embed)
+
+@bot.command(name='fixstreaks')
+async def fix_streaks(ctx):
+    """Rebuild every player's win/loss streaks from PUG history (Admin role only)"""
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    changed = await run_rating_write(ctx.guild.id, repair_streaks, str(ctx.guild.id))
+    if changed:
+        await ctx.send(f"✅ Rebuilt streaks from PUG history - {changed} players corrected.")
+    else:
+        await ctx.send("✅ All streaks already match PUG history.")
+
+@bot.command(name='predictions', aliases=['calibration'])
+async def prediction_accuracy(ctx, game_mode: str = None):
+    """How well match predictions matched results, per mode (Admin role only)
+    
+    Usage:
+    .predictions        - Every mode
+    .predictions ctf    - One mode, with its calibration table
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    server_id = str(ctx.guild.id)
+    calibration = db_manager.get_prediction_calibration(server_id)
+    if game_mode is not None:
+        game_mode = db_manager.resolve_mode_alias(game_mode.lower())
+        calibration = {mode: stats for mode, stats in calibration.items() if mode == game_mode}
+    if not calibration:
+        await ctx.send("📊 No decided PUGs with a stored prediction yet!")
+        return
+    
+    embed = discord.Embed(
+        title="🎯 Match Prediction Accuracy",
+        description="Brier score: 0 = perfect, 0.25 = coin flip. Favourite = how often the predicted side won.",
+        color=discord.Color.teal()
+    )
+    
+    for mode, stats in sorted(calibration.items(), key=lambda item: -item[1]['predictions']):
+        # Rolling score over the most recent results, to spot drift
+        recent = db_manager.get_recent_predictions(server_id, 100, mode)
+        lines = [
+            f"{stats['predictions']} PUGs | Brier **{stats['brier']:.3f}** | log-loss {stats['log_loss']:.3f} | "
+            f"favourite won {stats['accuracy']*100:.0f}%"
+        ]
+        # Killed PUGs are left out of the recent list but stay in the calibration totals
+        if recent:
+            recent_brier = sum((p - (1.0 if winner == 'red' else 0.0)) ** 2 for p, winner in recent) / len(recent)
+            lines.append(f"Last {len(recent)}: Brier {recent_brier:.3f}")
+        # Calibration only fits in the embed for a single mode
+        if game_mode is not None:
+            lines.append("```")
+            lines.append("Favourite   PUGs  predicted  actual")
+            for bucket in stats['buckets']:
+                lines.append(f"{bucket['low']*100:.0f}-{bucket['high']*100:.0f}%    {bucket['predictions']:>5}  "
+                             f"{bucket['predicted']*100:>8.0f}%  {bucket['actual']*100:>5.0f}%")
+            lines.append("```")
+        embed.add_field(name=mode, value="\n".join(lines), inline=False)
+        if len(embed.fields) >= 25:
+            break
+    
+    if game_mode is None:
+        embed.set_footer(text="Use .predictions <mode> for the calibration table")
+    await ctx.send(embed=embed)
+
+@bot.command(name='rebuildpairs')
+async def rebuild_pairs(ctx):
+    """Rebuild the .h2h/.synergy pair statistics from PUG history (Admin role only)"""
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    pairs = await asyncio.to_thread(db_manager.rebuild_pair_stats, str(ctx.guild.id))
+    await ctx.send(f"✅ Rebuilt pair statistics from PUG history ({pairs} player pairs).")
+
+@bot.command(name='cleanduplicates')
+async def clean_duplicates(ctx):
+    """Remove duplicate, invalid and orphaned player entries (Admin only)
+    
+    Compares the player table with the server's member list in bulk - players still in the
+    server, with PUGs on record or with a non-default ELO are always kept.
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    server_id = str(ctx.guild.id)
+    
+    # Current members and their names from the gateway cache (no API calls) - the cache must hold
+    # the whole member list first, or members missing from it would look like departed players
+    if not ctx.guild.chunked:
+        await ctx.guild.chunk()
+    members = [(str(member.id), [member.display_name, member.name]) for member in ctx.guild.members]
+    to_delete = await asyncio.to_thread(db_manager.find_cleanup_candidates, server_id, members, STARTING_ELO)
     
     if not to_delete:
         await ctx.send("✅ No duplicate or invalid entries found!")
         return
     
     # Show what will be deleted
+    reasons = {'invalid': 'not a Discord user id', 'duplicate': 'left the server, named like a current member',
+               'orphan': 'left the server, never played'}
+    counts = {reason: sum(1 for row in to_delete if row['reason'] == reason) for reason in reasons}
     preview_msg = f"Found **{len(to_delete)}** entries to remove:\n"
-    for i, discord_id in enumerate(to_delete[:10]):
-        cursor.execute('SELECT elo FROM players WHERE discord_id = ? AND server_id = ?',
-                      (discord_id, str(ctx.guild.id)))
-        result = cursor.fetchone()
-        if result:
-            preview_msg += f"- ID: {discord_id} (ELO: {result[0]})\n"
+    for reason, label in reasons.items():
+        if counts[reason]:
+            preview_msg += f"**{counts[reason]}** {reason} ({label})\n"
+    preview_msg += "\n"
+    for row in to_delete[:10]:
+        preview_msg += f"- {row['name'] or 'ID'}: {row['discord_id']} (ELO: {row['elo']:.0f}, {row['reason']})\n"
     
     if len(to_delete) > 10:
         preview_msg += f"... and {len(to_delete) - 10} more\n"
@@ -5570,26 +6050,17 @@ async def clean_duplicates(ctx):
         
         if msg.content.upper() != 'CONFIRM':
             await ctx.send("❌ Cleanup cancelled.")
-            conn.close()
             return
     except asyncio.TimeoutError:
         await ctx.send("❌ Cleanup cancelled (timeout).")
-        conn.close()
         return
     
-    # Delete the invalid entries
-    deleted_count = 0
-    for discord_id in to_delete:
-        cursor.execute('''
-            DELETE FROM players 
-            WHERE discord_id = ? AND server_id = ?
-        ''', (discord_id, str(ctx.guild.id)))
-        deleted_count += 1
-    
-    conn.commit()
-    conn.close()
+    # Delete the entries in one transaction
+    deleted_count = await asyncio.to_thread(db_manager.delete_players, server_id,
+                                            [row['discord_id'] for row in to_delete])
     
     await ctx.send(f"✅ **Cleanup complete!** Removed {deleted_count} duplicate/invalid player entries.")
+    schedule_leaderboard_refresh(ctx.guild.id)
 
 @bot.command(name='cleartopelo')
 async def clear_top_elo(ctx):
@@ -5705,6 +6176,91 @@ async def autopick_off(ctx, game_mode: str = 'default'):
     queue.autopick_mode = False
     await ctx.send(f"✅ **Autopick disabled** for **{mode_data['name']}** mode! Teams will be picked manually by captains.")
 
+@bot.command(name='ratingengine')
+async def rating_engine(ctx, game_mode: str = None, engine_name: str = None):
+    """Show or set the rating engine for a game mode (Admin role only)
+    
+    Usage:
+    .ratingengine ctf          - Show the engine for ctf
+    .ratingengine ctf glicko2  - Use Glicko-2 for ctf results
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    available = ", ".join(f"`{name}`" for name in RATING_ENGINES)
+    if game_mode is None:
+        await ctx.send(f"❌ Usage: `.ratingengine <mode> [engine]` (engines: {available})")
+        return
+    
+    # Resolve alias
+    game_mode_resolved = db_manager.resolve_mode_alias(game_mode.lower())
+    mode_data = db_manager.get_game_mode(game_mode_resolved)
+    if not mode_data:
+        await ctx.send(f"❌ Game mode '{game_mode}' not found!")
+        return
+    
+    if engine_name is None:
+        engine = get_rating_engine(db_manager.get_mode_rating_engine(game_mode_resolved))
+        await ctx.send(f"📈 **{mode_data['name']}** results are rated with **{engine.label}**. (engines: {available})")
+        return
+    
+    engine_name = engine_name.lower()
+    if engine_name not in RATING_ENGINES:
+        await ctx.send(f"❌ Unknown rating engine '{engine_name}'! Available: {available}")
+        return
+    
+    db_manager.set_mode_rating_engine(game_mode_resolved, engine_name)
+    engine = get_rating_engine(engine_name)
+    await ctx.send(f"✅ **{mode_data['name']}** results will now be rated with **{engine.label}**.\n"
+                   f"Past PUGs keep their ratings - use `.replayratings` to re-rate history with the new engine.")
+
+@bot.command(name='ratingpool')
+async def rating_pool(ctx, game_mode: str = None, pool: str = None):
+    """Show or set the rating pool for a game mode (Admin role only)
+    
+    Usage:
+    .ratingpool ctf          - Show which ratings ctf uses
+    .ratingpool ctf own      - Give ctf its own ladder
+    .ratingpool 1v1 duel     - Rate 1v1 in a pool named 'duel' (modes can share a pool)
+    .ratingpool ctf shared   - Back to the server-wide ELO
+    """
+    if not is_full_admin(ctx):
+        await ctx.send("❌ You don't have permission to use this command!")
+        return
+    
+    if game_mode is None:
+        await ctx.send("❌ Usage: `.ratingpool <mode> [own|shared|<pool name>]`")
+        return
+    
+    # Resolve alias
+    game_mode_resolved = db_manager.resolve_mode_alias(game_mode.lower())
+    mode_data = db_manager.get_game_mode(game_mode_resolved)
+    if not mode_data:
+        await ctx.send(f"❌ Game mode '{game_mode}' not found!")
+        return
+    
+    current = db_manager.get_mode_rating_pool(game_mode_resolved)
+    if pool is None:
+        if current is None:
+            await ctx.send(f"📈 **{mode_data['name']}** uses the shared server ELO.")
+        else:
+            await ctx.send(f"📈 **{mode_data['name']}** is rated in the **{current}** pool (`.topelo {game_mode_resolved}`).")
+        return
+    
+    pool = pool.lower()
+    new_pool = None if pool == 'shared' else (game_mode_resolved if pool == 'own' else pool)
+    if new_pool == current:
+        await ctx.send(f"ℹ️ **{mode_data['name']}** already uses that rating pool.")
+        return
+    
+    db_manager.set_mode_rating_pool(game_mode_resolved, new_pool)
+    if new_pool is None:
+        await ctx.send(f"✅ **{mode_data['name']}** results will now change the shared server ELO.")
+    else:
+        await ctx.send(f"✅ **{mode_data['name']}** results will now be rated in the **{new_pool}** pool.\n"
+                       f"Players start the pool from their server ELO; past PUGs stay where they were rated.")
+
 # External Stats Integration Commands
 # NOTE: This section is for integrating with external game stat tracking websites
 # Configure the scraper.py file to match your game's stats website
@@ -6229,107 +6785,13 @@ async def player_stats(ctx, *, player_name: str):
         await ctx.send(f"❌ {member.mention} is not registered! They need to join a queue first.")
         return
     
-    player_data = db_manager.get_player(member.id, str(ctx.guild.id))
-    total = player_data['total_pugs']
-    wins = player_data['wins']
-    losses = player_data['losses']
-    elo = player_data['elo']
-    rank = get_elo_rank(elo)
-    # Win rate based on actual games (wins + losses), not total_pugs
-    actual_games = wins + losses
-    win_rate = (wins / actual_games * 100) if actual_games > 0 else 0
-    
-    # Find player's most recent PUG to show ELO change
-    recent_pugs = db_manager.get_recent_pugs(20)
-    last_elo_change = None
-    
-    for pug in recent_pugs:
-        if pug.get('winner'):  # Only check PUGs with results
-            player_id = str(member.id)
-            if player_id in pug['red_team'] or player_id in pug['blue_team']:
-                # Calculate what the ELO change was
-                K_FACTOR = 32
-                expected_red = 1 / (1 + 10 ** ((pug['avg_blue_elo'] - pug['avg_red_elo']) / 400))
-                expected_blue = 1 - expected_red
-                
-                # Calculate change
-                if pug['winner'] == 'red':
-                    if player_id in pug['red_team']:
-                        last_elo_change = K_FACTOR * (1 - expected_red)
-                    else:
-                        last_elo_change = K_FACTOR * (0 - expected_blue)
-                else:  # blue won
-                    if player_id in pug['blue_team']:
-                        last_elo_change = K_FACTOR * (1 - expected_blue)
-                    else:
-                        last_elo_change = K_FACTOR * (0 - expected_red)
-                break
+    summary = get_player_summary(member.id, str(ctx.guild.id))
     
     embed = discord.Embed(
         title=f"📊 Statistics for {member.display_name}",
         color=discord.Color.gold()
     )
-    
-    embed.add_field(name="Total PUGs", value=total, inline=True)
-    embed.add_field(name="Wins", value=wins, inline=True)
-    embed.add_field(name="Losses", value=losses, inline=True)
-    embed.add_field(name="Win Rate", value=f"{win_rate:.1f}%", inline=True)
-    
-    # Show ELO with recent change
-    if last_elo_change is not None:
-        elo_display = f"{elo:.0f} ({last_elo_change:+.0f})"
-    else:
-        elo_display = f"{elo:.0f}"
-    
-    peak_elo = player_data.get('peak_elo')
-    if peak_elo is None:
-        peak_elo = elo
-    
-    # Calculate net ELO over last 10 PUGs
-    recent_pugs_10 = db_manager.get_recent_pugs(100)  # Get more to find player's 10
-    player_pugs = [p for p in recent_pugs_10 if (str(member.id) in p['red_team'] or str(member.id) in p['blue_team']) and p.get('winner')]
-    player_pugs = player_pugs[:10]  # Take first 10
-    
-    net_elo_10 = 0
-    if len(player_pugs) > 0:
-        K_FACTOR = 32
-        for pug in player_pugs:
-            expected_red = 1 / (1 + 10 ** ((pug['avg_blue_elo'] - pug['avg_red_elo']) / 400))
-            expected_blue = 1 - expected_red
-            
-            player_id = str(member.id)
-            if pug['winner'] == 'red':
-                if player_id in pug['red_team']:
-                    net_elo_10 += K_FACTOR * (1 - expected_red)
-                else:
-                    net_elo_10 += K_FACTOR * (0 - expected_blue)
-            else:  # blue won
-                if player_id in pug['blue_team']:
-                    net_elo_10 += K_FACTOR * (1 - expected_blue)
-                else:
-                    net_elo_10 += K_FACTOR * (0 - expected_red)
-    
-    net_elo_display = f"{net_elo_10:+.0f}" if net_elo_10 != 0 else "0"
-    
-    embed.add_field(name="ELO", value=elo_display, inline=True)
-    embed.add_field(name="Peak ELO", value=f"{peak_elo:.0f}", inline=True)
-    embed.add_field(name="Rank", value=rank, inline=True)
-    embed.add_field(name="Last 10 PUGs", value=f"{net_elo_display} ELO", inline=True)
-    
-    # Add streak
-    streak = player_data.get('current_streak', 0)
-    if streak > 0:
-        streak_display = f"🔥 {streak}W"
-    elif streak < 0:
-        streak_display = f"❄️ {abs(streak)}L"
-    else:
-        streak_display = "—"
-    embed.add_field(name="Streak", value=streak_display, inline=True)
-    
-    # Add leaderboard position
-    position, total_players = get_leaderboard_position(member.id, str(ctx.guild.id))
-    if position:
-        embed.add_field(name="Leaderboard", value=f"#{position} of {total_players}", inline=True)
+    add_player_summary_fields(embed, summary)
     
     await ctx.send(embed=embed)
 
@@ -6354,14 +6816,26 @@ async def leaderboard(ctx):
             # Delete only the previous leaderboard messages
             for msg_id in old_data['message_ids']:
                 try:
-                    msg = await ctx.channel.fetch_message(msg_id)
-                    await msg.delete()
+                    await ctx.channel.get_partial_message(msg_id).delete()
                 except:
                     pass
     
-    players = db_manager.get_all_players(str(ctx.guild.id))
+    # Player query and rendering run in a worker thread so the bot keeps responding
+    chunks, total_players = await asyncio.to_thread(build_leaderboard_chunks, ctx.guild, str_guild_id)
+    if not chunks:
+        await ctx.send("No players found!")
+        return
     
-    # Filter out simulation players (IDs 1000-1999)
+    # Send embeds and store message IDs and channel ID for auto-update
+    leaderboard_auto_update_data[str_guild_id] = await post_leaderboard(ctx.channel, chunks, total_players)
+    save_leaderboard_state(str_guild_id, leaderboard_auto_update_data[str_guild_id])
+
+def build_leaderboard_chunks(guild, server_id):
+    """Ladder text per #leaderboard message and the number of players on it
+    
+    Simulation players (IDs 1000-1999) and hidden inactive players are left out.
+    """
+    players = db_manager.get_all_players(server_id)
     active_players = []
     for p in players:
         try:
@@ -6370,253 +6844,202 @@ async def leaderboard(ctx):
                 active_players.append(p)
         except (ValueError, TypeError):
             active_players.append(p)
-    
-    if not active_players:
-        await ctx.send("No players found!")
-        return
+    active_players = filter_inactive_players(active_players, server_id)
     
     # Sort by ELO (highest first)
     active_players.sort(key=lambda x: x['elo'], reverse=True)
     
-    # Build player entries (format: #1 PlayerName 1850)
     entries = []
-    
     for i, player in enumerate(active_players):
         discord_id = player['discord_id']
-        elo = int(player['elo'])
-        rank = i + 1
-        
-        # Try to get player name
-        member = ctx.guild.get_member(int(discord_id))
+        # Server nickname if they're still here, otherwise the name we have on file
+        member = guild.get_member(int(discord_id)) if guild else None
         if member:
             name = member.display_name
         else:
-            # Player left server, try database
-            player_data = db_manager.get_player(discord_id, str(ctx.guild.id))
-            name = player_data.get('display_name') or player_data.get('discord_name') or f"Player_{discord_id}"
-            # Clean up discriminator
-            if '#' in name:
-                name = name.split('#')[0]
-        
-        # Truncate name if too long (max 8 chars for tight fit)
-        if len(name) > 8:
-            name = name[:5] + "..."
-        
-        entries.append({
-            'rank': rank,
-            'name': name,
-            'elo': elo
-        })
-    
-    # Build 3-column layout (going down columns instead of across)
-    all_lines = []
-    
-    # Calculate how many rows we need (divide players into 3 columns)
-    total_players = len(entries)
-    rows_per_message = 60
-    players_per_column = (total_players + 2) // 3  # Round up, divide by 3 columns
-    
-    # Build rows - each row has 3 players from different positions
-    for row_idx in range(players_per_column):
-        columns = []
-        
-        # Column 1: players 0, 1, 2, 3... (top of column 1)
-        # Column 2: players N, N+1, N+2... (top of column 2)  
-        # Column 3: players 2N, 2N+1, 2N+2... (top of column 3)
-        for col_idx in range(3):
-            player_idx = row_idx + (col_idx * players_per_column)
-            
-            if player_idx < total_players:
-                entry = entries[player_idx]
-                rank_str = f"#{entry['rank']}".ljust(4)      # "#1  " (4 chars)
-                name_str = entry['name'].ljust(8)             # "Name    " (8 chars)
-                elo_str = str(entry['elo']).ljust(4)          # "1850" (4 chars)
-                
-                # Total per column: 16 chars fixed
-                column = f"{rank_str}{name_str}{elo_str}"
-                columns.append(column)
-            else:
-                # Empty column if we run out of players
-                columns.append(" " * 16)
-        
-        # Join columns with 2 spaces between (16+2+16+2+16 = 52 chars total)
-        line = "  ".join(columns)
-        all_lines.append(line.rstrip())  # Remove trailing spaces from incomplete rows
+            name = player.get('display_name') or player.get('discord_name') or f"Player_{discord_id}"
+        entries.append({'rank': i + 1, 'name': short_name(name), 'elo': int(player['elo'])})
     
-    # Split into chunks (60 lines per message = 180 players!)
-    chunk_size = 60
-    chunks = [all_lines[i:i + chunk_size] for i in range(0, len(all_lines), chunk_size)]
+    return render_chunks(entries), len(active_players)
+
+def leaderboard_embed(chunk_idx, chunk_text, total_players, footer_note=""):
+    """Embed for one leaderboard message (the first one carries the footer)"""
+    embed = discord.Embed(
+        title="🏆 Server ELO Leaderboard" if chunk_idx == 0 else f"🏆 Leaderboard (continued)",
+        description=f"```\n{chunk_text}\n```",
+        color=discord.Color.gold()
+    )
+    if chunk_idx == 0:
+        current_time = datetime.now()
+        embed.set_footer(
+            text=f"Total Players: {total_players} • {footer_note}Last Updated: {current_time.strftime('%I:%M %p')}"
+        )
+    return embed
+
+async def post_leaderboard(channel, chunks, total_players, footer_note=""):
+    """Send a fresh leaderboard - returns its auto-update record"""
+    data = {'channel_id': channel.id, 'message_ids': [], 'messages': {}, 'digests': [], 'last_update': datetime.now()}
+    await sync_leaderboard(channel, data, chunks, total_players, footer_note)
+    return data
+
+async def sync_leaderboard(channel, data, chunks, total_players, footer_note=""):
+    """Bring posted leaderboard messages in line with the new chunks using the fewest API calls
+    
+    Unchanged chunks are left alone, changed ones edited, extra chunks sent below and leftover
+    messages deleted (see diff_layout). Everything goes through the outbound scheduler, so it
+    is paced with the channel's other messages. If a message being edited turns out to be deleted, the
+    leaderboard is reposted from that chunk down to keep the order. Updates `data` in place
+    and returns the number of messages kept/edited/created/deleted.
+    """
+    new_digests = [chunk_digest(idx, text, total_players) for idx, text in enumerate(chunks)]
+    old_ids = list(data['message_ids'])
+    old_digests = (list(data.get('digests') or []) + [None] * len(old_ids))[:len(old_ids)]
+    old_messages = data.get('messages') or {}
+    plan = diff_layout(old_digests, new_digests)
+    
+    ids = old_ids[:len(chunks)] + [None] * (len(chunks) - len(old_ids))
+    digests = old_digests[:len(chunks)] + [None] * (len(chunks) - len(old_ids))
+    messages = {idx: msg for idx, msg in old_messages.items() if idx < len(chunks)}
+    lost = []
+    
+    def embed_for(idx):
+        return leaderboard_embed(idx, chunks[idx], total_players, footer_note)
+    
+    async def edit(idx):
+        msg = messages.get(idx) or channel.get_partial_message(ids[idx])
+        try:
+            messages[idx] = await outbound.call(channel, lambda: msg.edit(embed=embed_for(idx)))
+            digests[idx] = new_digests[idx]
+        except discord.NotFound:
+            lost.append(idx)
+        except discord.Forbidden:
+            print(f"❌ No permission to edit leaderboard message {idx}")
     
-    # Send embeds and store message IDs for auto-update
-    leaderboard_message_ids = []
+    async def delete(msg_id):
+        try:
+            await outbound.call(channel, channel.get_partial_message(msg_id).delete)
+        except discord.HTTPException:
+            pass
+    
+    async def create(idx):
+        messages[idx] = await outbound.send(channel, embed=embed_for(idx))
+        ids[idx] = messages[idx].id
+        digests[idx] = new_digests[idx]
+    
+    # Queued in this order, so new chunks land below the existing ones in chunk order
+    results = await asyncio.gather(*[edit(idx) for idx in plan['edit']],
+                                   *[delete(old_ids[idx]) for idx in plan['delete']],
+                                   *[create(idx) for idx in plan['create']],
+                                   return_exceptions=True)
+    
+    if lost:
+        # Repost from the first missing message down
+        first = min(lost)
+        print(f"⚠️ Leaderboard message {first} not found (deleted?) - reposting from there")
+        await asyncio.gather(*[delete(msg_id) for msg_id in ids[first + 1:] if msg_id is not None])
+        for idx in range(first, len(chunks)):
+            ids[idx] = None
+            messages.pop(idx, None)
+        plan['create'] = list(range(first, len(chunks)))
+        results = await asyncio.gather(*[create(idx) for idx in plan['create']], return_exceptions=True)
+    
+    for error in results:
+        if isinstance(error, Exception):
+            print(f"❌ Error updating leaderboard: {error}")
+    
+    # Only track chunks up to the first one that couldn't be sent
+    posted = ids.index(None) if None in ids else len(ids)
+    data['message_ids'] = ids[:posted]
+    data['digests'] = digests[:posted]
+    data['messages'] = {idx: msg for idx, msg in messages.items() if idx < posted}
+    data['last_update'] = datetime.now()
+    return {op: len(indexes) for op, indexes in plan.items()}
+
+async def check_leaderboard_messages(channel, data):
+    """Forget the digests of stored leaderboard messages that no longer exist
+    
+    sync_leaderboard never touches an unchanged chunk, so a message deleted while the bot was
+    offline would stay missing. One history pass from the first stored message finds them, and
+    missing ones get a None digest so their chunk is edited (reposting from there down).
+    Returns how many were missing.
+    """
+    ids = data['message_ids']
+    if not ids:
+        return 0
+    wanted = set(ids)
+    last_id = max(ids)
+    found = set()
+    try:
+        async for message in channel.history(limit=None, after=discord.Object(id=min(ids) - 1), oldest_first=True):
+            if message.id in wanted:
+                found.add(message.id)
+            if message.id >= last_id:
+                break
+    except discord.HTTPException as e:
+        print(f"⚠️ Could not check leaderboard messages: {e}")
+        return 0
+    digests = (list(data.get('digests') or []) + [None] * len(ids))[:len(ids)]
+    data['digests'] = [digest if msg_id in found else None for msg_id, digest in zip(ids, digests)]
+    return len(wanted - found)
+
+def schedule_leaderboard_refresh(guild_id):
+    """Refresh the auto-update leaderboard shortly (debounced)
+    
+    Results settled within LEADERBOARD_REFRESH_DELAY of each other share one refresh, e.g.
+    .setwinner undoing and re-settling a PUG. A result landing while a refresh is already
+    running schedules another, so the last change is always shown.
+    """
+    str_guild_id = str(guild_id)
+    if str_guild_id not in leaderboard_auto_update_data:
+        return
+    pending = leaderboard_refresh_tasks.get(str_guild_id)
+    if pending and not pending.done():
+        return
     
-    for chunk_idx, chunk in enumerate(chunks):
-        # Join lines with newlines
-        chunk_text = "\n".join(chunk)
-        
-        embed = discord.Embed(
-            title="🏆 Server ELO Leaderboard" if chunk_idx == 0 else f"🏆 Leaderboard (continued)",
-            description=f"```\n{chunk_text}\n```",
-            color=discord.Color.gold()
-        )
-        
-        if chunk_idx == 0:
-            current_time = datetime.now()
-            embed.set_footer(
-                text=f"Total Players: {len(active_players)} • Last Updated: {current_time.strftime('%I:%M %p')}"
-            )
-        
-        msg = await ctx.send(embed=embed)
-        leaderboard_message_ids.append(msg.id)
+    async def refresh():
+        await asyncio.sleep(LEADERBOARD_REFRESH_DELAY)
+        leaderboard_refresh_tasks.pop(str_guild_id, None)
+        await update_leaderboard(guild_id)
     
-    # Store message IDs and channel ID for auto-update
-    leaderboard_auto_update_data[str_guild_id] = {
-        'channel_id': ctx.channel.id,
-        'message_ids': leaderboard_message_ids,
-        'last_update': datetime.now()
-    }
+    leaderboard_refresh_tasks[str_guild_id] = asyncio.create_task(refresh())
 
 async def update_leaderboard(guild_id):
-    """Auto-update the leaderboard when ELOs change"""
-    try:
-        str_guild_id = str(guild_id)
-        
-        print(f"🔄 update_leaderboard called for guild {str_guild_id}")
-        
-        # Check if leaderboard exists for this server
-        if str_guild_id not in leaderboard_auto_update_data:
-            print(f"⚠️ No leaderboard data found for guild {str_guild_id}")
-            return
-        
-        data = leaderboard_auto_update_data[str_guild_id]
-        channel_id = data['channel_id']
-        message_ids = data['message_ids']
-        
-        print(f"📊 Leaderboard found - Channel: {channel_id}, Messages: {len(message_ids)}")
-        
-        # Get the channel
-        channel = bot.get_channel(channel_id)
-        if not channel:
-            print(f"❌ Could not find channel {channel_id}")
-            return
-        
-        # Get updated player list
-        players = db_manager.get_all_players(str_guild_id)
-        
-        # Filter out simulation players
-        active_players = []
-        for p in players:
-            try:
-                player_id = int(p['discord_id'])
-                if player_id < 1000 or player_id >= 2000:
-                    active_players.append(p)
-            except (ValueError, TypeError):
-                active_players.append(p)
-        
-        if not active_players:
-            return
-        
-        # Sort by ELO
-        active_players.sort(key=lambda x: x['elo'], reverse=True)
-        
-        # Build player entries
-        entries = []
-        guild = bot.get_guild(int(guild_id))
-        
-        for i, player in enumerate(active_players):
-            discord_id = player['discord_id']
-            elo = int(player['elo'])
-            rank = i + 1
-            
-            # Get player name
-            if guild:
-                member = guild.get_member(int(discord_id))
-                if member:
-                    name = member.display_name
-                else:
-                    player_data = db_manager.get_player(discord_id, str_guild_id)
-                    name = player_data.get('display_name') or player_data.get('discord_name') or f"Player_{discord_id}"
-                    if '#' in name:
-                        name = name.split('#')[0]
-            else:
-                name = f"Player_{discord_id}"
-            
-            # Truncate name if too long (max 8 chars)
-            if len(name) > 8:
-                name = name[:5] + "..."
-            
-            entries.append({
-                'rank': rank,
-                'name': name,
-                'elo': elo
-            })
-        
-        # Build 3-column layout (going down columns)
-        all_lines = []
-        
-        total_players = len(entries)
-        players_per_column = (total_players + 2) // 3
-        
-        for row_idx in range(players_per_column):
-            columns = []
+    """Auto-update the leaderboard when ELOs change
+    
+    Only chunks whose text changed are edited, through the cached Message (or a partial
+    message - no fetch needed); chunks are added or removed as the ladder grows or shrinks.
+    """
+    str_guild_id = str(guild_id)
+    
+    # Check if leaderboard exists for this server
+    if str_guild_id not in leaderboard_auto_update_data:
+        print(f"⚠️ No leaderboard data found for guild {str_guild_id}")
+        return
+    
+    lock = leaderboard_locks.setdefault(str_guild_id, asyncio.Lock())
+    async with lock:
+        try:
+            data = leaderboard_auto_update_data[str_guild_id]
+            channel = bot.get_channel(data['channel_id'])
+            if not channel:
+                print(f"❌ Could not find channel {data['channel_id']}")
+                return
             
-            for col_idx in range(3):
-                player_idx = row_idx + (col_idx * players_per_column)
-                
-                if player_idx < total_players:
-                    entry = entries[player_idx]
-                    rank_str = f"#{entry['rank']}".ljust(4)
-                    name_str = entry['name'].ljust(8)
-                    elo_str = str(entry['elo']).ljust(4)
-                    
-                    column = f"{rank_str}{name_str}{elo_str}"
-                    columns.append(column)
-                else:
-                    columns.append(" " * 16)
+            chunks, total_players = await asyncio.to_thread(build_leaderboard_chunks,
+                                                            bot.get_guild(int(guild_id)), str_guild_id)
+            if not chunks:
+                return
             
-            line = "  ".join(columns)
-            all_lines.append(line.rstrip())
-        
-        # Split into chunks of 60 lines
-        chunk_size = 60
-        chunks = [all_lines[i:i + chunk_size] for i in range(0, len(all_lines), chunk_size)]
+            counts = await sync_leaderboard(channel, data, chunks, total_players)
+            if counts['edit'] or counts['create'] or counts['delete']:
+                await asyncio.to_thread(save_leaderboard_state, str_guild_id, data)
+            print(f"✅ Leaderboard auto-update for guild {str_guild_id}: {counts['edit']} edited, "
+                  f"{counts['create']} added, {counts['delete']} removed, {counts['keep']} unchanged")
         
-        # Update existing messages
-        for chunk_idx, chunk in enumerate(chunks):
-            if chunk_idx < len(message_ids):
-                try:
-                    msg = await channel.fetch_message(message_ids[chunk_idx])
-                    chunk_text = "\n".join(chunk)
-                    
-                    embed = discord.Embed(
-                        title="🏆 Server ELO Leaderboard" if chunk_idx == 0 else f"🏆 Leaderboard (continued)",
-                        description=f"```\n{chunk_text}\n```",
-                        color=discord.Color.gold()
-                    )
-                    
-                    if chunk_idx == 0:
-                        current_time = datetime.now()
-                        embed.set_footer(
-                            text=f"Total Players: {len(active_players)} • Last Updated: {current_time.strftime('%I:%M %p')}"
-                        )
-                    
-                    await msg.edit(embed=embed)
-                    print(f"✅ Updated leaderboard message {chunk_idx + 1}/{len(message_ids)}")
-                except discord.NotFound:
-                    print(f"❌ Leaderboard message {chunk_idx} not found (deleted?)")
-                except discord.Forbidden:
-                    print(f"❌ No permission to edit leaderboard message {chunk_idx}")
-                except Exception as e:
-                    print(f"❌ Error updating leaderboard message {chunk_idx}: {e}")
-        
-        # Update last update time
-        leaderboard_auto_update_data[str_guild_id]['last_update'] = datetime.now()
-        print(f"✅ Leaderboard auto-update completed for guild {str_guild_id}")
-        
-    except Exception as e:
-        print(f"❌ Error in update_leaderboard: {e}")
-        import traceback
-        traceback.print_exc()
+        except Exception as e:
+            print(f"❌ Error in update_leaderboard: {e}")
+            import traceback
+            traceback.print_exc()
 
 @bot.command(name='promote', aliases=['spam'])
 async def promote_pugs(ctx):
@@ -6694,60 +7117,16 @@ async def deadpug_vote(ctx):
     all_players = player_pug['red_team'] + player_pug['blue_team']
     votes_needed = len(all_players) // 2 + 1
     
-    # Create vote message
-    vote_msg = await ctx.send(
-        f"🗳️ **Deadpug Vote Started for PUG #{player_pug['number']}**\n"
-        f"Players in this PUG, react with ✅ to vote to cancel.\n"
-        f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
-        f"Vote ends in 60 seconds or when majority is reached."
-    )
-    
-    # Add reactions
-    await vote_msg.add_reaction("✅")
-    await vote_msg.add_reaction("❌")
-    
-    # Monitor reactions for 60 seconds
-    start_time = asyncio.get_event_loop().time()
-    timeout = 60
-    
     try:
-        while True:
-            elapsed = asyncio.get_event_loop().time() - start_time
-            remaining = timeout - elapsed
-            
-            if remaining <= 0:
-                break
-            
-            # Check current vote count
-            vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-            yes_votes = 0
-            
-            for reaction in vote_msg.reactions:
-                if str(reaction.emoji) == "✅":
-                    users = [user async for user in reaction.users()]
-                    yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                    break
-            
-            # If majority reached, end voting immediately
-            if yes_votes >= votes_needed:
-                db_manager.delete_pug(player_pug['pug_id'])
-                await ctx.send(f"✅ **Vote passed! PUG #{player_pug['number']} has been cancelled.** ({yes_votes}/{len(all_players)} votes)")
-                return
-            
-            # Wait a bit before checking again (every 2 seconds)
-            await asyncio.sleep(min(2, remaining))
-        
-        # Timeout reached, count final votes
-        vote_msg = await ctx.channel.fetch_message(vote_msg.id)
-        yes_votes = 0
-        
-        for reaction in vote_msg.reactions:
-            if str(reaction.emoji) == "✅":
-                users = [user async for user in reaction.users()]
-                yes_votes = sum(1 for user in users if not user.bot and str(user.id) in all_players)
-                break
-        
-        if yes_votes >= votes_needed:
+        passed, yes_votes = await run_reaction_vote(
+            ctx,
+            f"🗳️ **Deadpug Vote Started for PUG #{player_pug['number']}**\n"
+            f"Players in this PUG, react with ✅ to vote to cancel.\n"
+            f"Requires **{votes_needed}/{len(all_players)}** votes to pass.\n"
+            f"Vote ends in 60 seconds or when majority is reached.",
+            all_players, votes_needed, 60)
+        
+        if passed:
             db_manager.delete_pug(player_pug['pug_id'])
             await ctx.send(f"✅ **Vote passed! PUG #{player_pug['number']} has been cancelled.** ({yes_votes}/{len(all_players)} votes)")
         else:
@@ -6895,12 +7274,14 @@ async def help_command(ctx):
     player_embed.add_field(name="**Stats Commands**", value="""
 `.mystats` - View your statistics
 `.stats @player` / `.stats PlayerName` - View another player's stats
-`.topelo` - Top 10 ELO players
+`.topelo [mode]` - Top 10 ELO players (server or mode pool)
 `.top10` - Top 10 most active players
 `.leaderboard` - Full ELO leaderboard (only in #leaderboard channel)
 `.playerelos` - DM list of all player ELOs
 `.longestwin` / `.beststreak` - Player with longest winning streak
 `.longestloss` / `.worststreak` - Player with longest losing streak
+`.h2h @a @b` - Head-to-head record of two players
+`.synergy @a [@b]` - Record together (or a player's best partners)
 `.last` - View most recent PUG (shows PUG ID & tiebreaker)
 `.mylast` - View your most recent PUG (shows PUG ID)
 `.last @player` - View a player's most recent PUG (shows PUG ID)
@@ -7001,7 +7382,7 @@ async def help_command(ctx):
         admin_embed.add_field(name="**Admin Only Commands - Part 1**", value="""
 `.tamproon` / `.tamprooff` - Enable/disable bot
 `.status` - Show bot status & statistics
-`.exportstats` - Export player stats as CSV (DMs admin)
+`.exportstats [matches|ledger]` - Export player stats, match history or ELO ledger as CSV (DMs admin)
 `.importelos` - Import ELO updates from CSV (attach file)
 `.exportelos` - Export all ELOs to CSV
 `.examplepugcsv` - Generate template CSV for PUG count updates
@@ -7010,6 +7391,11 @@ async def help_command(ctx):
 `.setpugs @Player 150` - Set player's total PUG count
 `.setpeak @Player 1500` - Set player's peak ELO
 `.reseteloall` - Reset ALL players to 1000 ELO
+`.replayratings [apply]` - Recompute ratings from PUG history
+`.ledger @Player` / `.voidadjustment <id>` - Exclude a mistaken change from replays
+`.ratingengine <mode> [elo|glicko2]` - Rating system per mode
+`.whatif k=24 / engine=glicko2 / seed=1000` - Simulate rating changes
+`.decay [on|off|days|rate|floor|hide|run]` - Inactivity rating decay
 `.deleteplayer @Player` - Permanently delete player from database
     """, inline=False)
         
@@ -7022,8 +7408,11 @@ async def help_command(ctx):
 `.showpugadmins` - Show all PUG Admins (server-specific)
 `.undowinner [pug_id]` - Reset PUG winner (allows re-voting)
 `.setwinner <pug_id> <team>` - Set specific PUG winner (override)
-`.cleanduplicates` - Remove duplicate topelo entries
+`.cleanduplicates` - Remove duplicate, invalid and orphaned player entries
 `.cleartopelo` - Clear all topelo entries
+`.ratingpool <mode> [own|shared|name]` - Give a mode its own ladder
+`.fixstreaks` / `.rebuildpairs` - Rebuild streaks / pair stats from history
+`.predictions [mode]` - Match prediction accuracy and calibration
     """, inline=False)
     
     admin_embed.add_field(name="**Usage Examples**", value="""
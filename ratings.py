@@ -0,0 +1,581 @@
+"""
+PUG Pro Discord Bot - Rating Engines
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import Optional, List, Dict, Tuple, Iterable
+
+from balancer import rating_uncertainty, RATING_DEVIATION_MIN
+
+# ============================================================================
+# Rating Configuration
+# ============================================================================
+
+# ELO settings
+K_FACTOR = 32
+STARTING_ELO = 1000  # ELO a player is registered with before any admin adjustment
+
+# Glicko-2 settings (deviations are in ELO points, like rating_deviation)
+GLICKO_SCALE = 400 / math.log(10)  # ELO points per Glicko-2 unit (~173.7)
+GLICKO_VOLATILITY = 0.06  # Starting volatility
+GLICKO_TAU = 0.5  # How fast volatility can change (0.3-1.2, lower = steadier)
+
+# Ledger fields a rating adjustment can set (None in a ledger row = leave as is)
+ADJUSTABLE_FIELDS = ('elo', 'peak_elo', 'wins', 'losses', 'current_streak', 'best_win_streak', 'best_loss_streak')
+
+# Uncertainty fields only rating engines write (None = engine doesn't track them)
+UNCERTAINTY_FIELDS = ('rating_deviation', 'rating_volatility')
+
+# Fields of a per-mode pool rating (player_ratings) a replay rebuilds
+POOL_FIELDS = ('elo', 'peak_elo', 'wins', 'losses', 'games')
+
+# (elo, rating_deviation, rating_volatility) - deviation/volatility may be None
+Rating = Tuple[float, Optional[float], Optional[float]]
+
+
+def expected_score(team_avg: float, opponent_avg: float) -> float:
+    """Expected score (win probability) of a team from average ELOs"""
+    return 1 / (1 + 10 ** ((opponent_avg - team_avg) / 400))
+
+
+# ============================================================================
+# Rating Engines
+# ============================================================================
+
+class RatingEngine(ABC):
+    """Rates a whole match in one call - subclasses implement rate_match"""
+
+    name = None
+    label = None
+    OPTIONS = ()  # Constructor keywords that can be tuned (e.g. by the what-if simulator)
+
+    def seed(self, elo: float, deviation: Optional[float], volatility: Optional[float], games_played: int) -> Rating:
+        """Rating tuple for a player from stored values (games_played = wins + losses before the match)"""
+        return (elo, deviation, volatility)
+
+    @abstractmethod
+    def rate_match(self, red: List[Rating], blue: List[Rating], red_score: float,
+                   averages: Optional[Tuple[float, float]] = None) -> Tuple[List[Rating], List[Rating]]:
+        """New ratings for both teams
+
+        red_score: 1 = red won, 0 = blue won, 0.5 = split
+        averages: (avg_red, avg_blue) stored when the PUG started - used instead of the
+                  current ratings so results match the odds shown at pick time
+        """
+
+    def win_probability(self, red: List[Rating], blue: List[Rating],
+                        averages: Optional[Tuple[float, float]] = None) -> float:
+        """Pre-match red win probability"""
+        if averages is None:
+            averages = (sum(r[0] for r in red) / len(red), sum(r[0] for r in blue) / len(blue))
+        return expected_score(averages[0], averages[1])
+
+
+class EloEngine(RatingEngine):
+    """Team-average ELO - every player on a team moves by the same amount"""
+
+    name = 'elo'
+    label = 'ELO'
+    OPTIONS = ('k_factor',)
+
+    def __init__(self, k_factor: float = K_FACTOR):
+        self.k_factor = k_factor
+
+    def team_changes(self, avg_red: float, avg_blue: float, red_score: float) -> Tuple[float, float]:
+        """(red_change, blue_change) for a result"""
+        expected_red = expected_score(avg_red, avg_blue)
+        return (self.k_factor * (red_score - expected_red),
+                self.k_factor * ((1 - red_score) - (1 - expected_red)))
+
+    def rate_match(self, red, blue, red_score, averages=None):
+        if averages is None:
+            averages = (sum(r[0] for r in red) / len(red), sum(r[0] for r in blue) / len(blue))
+        red_change, blue_change = self.team_changes(averages[0], averages[1], red_score)
+        return ([(elo + red_change, dev, vol) for elo, dev, vol in red],
+                [(elo + blue_change, dev, vol) for elo, dev, vol in blue])
+
+
+class Glicko2TeamEngine(RatingEngine):
+    """Glicko-2 with teams as composite players
+
+    Each player is rated as if their team's average had played one game against the
+    other team's average (deviation = RMS of that team's deviations). A player's own
+    deviation decides how far they move: new or returning players settle quickly,
+    regulars barely move on an upset.
+    """
+
+    name = 'glicko2'
+    label = 'Glicko-2'
+    OPTIONS = ('tau', 'starting_volatility')
+
+    def __init__(self, tau: float = GLICKO_TAU, starting_volatility: float = GLICKO_VOLATILITY):
+        self.tau = tau
+        self.starting_volatility = starting_volatility
+
+    def seed(self, elo, deviation, volatility, games_played):
+        return (elo, rating_uncertainty(games_played, deviation),
+                volatility if volatility is not None else self.starting_volatility)
+
+    def _volatility(self, phi: float, sigma: float, delta: float, v: float) -> float:
+        """New volatility (Glickman's Illinois iteration, step 5)"""
+        tau = self.tau
+        a = math.log(sigma * sigma)
+
+        def f(x):
+            ex = math.exp(x)
+            return (ex * (delta * delta - phi * phi - v - ex) / (2 * (phi * phi + v + ex) ** 2)
+                    - (x - a) / (tau * tau))
+
+        big_a = a
+        if delta * delta > phi * phi + v:
+            big_b = math.log(delta * delta - phi * phi - v)
+        else:
+            k = 1
+            while f(a - k * tau) < 0:
+                k += 1
+            big_b = a - k * tau
+        f_a, f_b = f(big_a), f(big_b)
+        while abs(big_b - big_a) > 1e-6:
+            big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+            f_c = f(big_c)
+            if f_c * f_b <= 0:
+                big_a, f_a = big_b, f_b
+            else:
+                f_a /= 2
+            big_b, f_b = big_c, f_c
+        return math.exp(big_a / 2)
+
+    def _rate_team(self, team, team_mu, opp_mu, opp_phi, score):
+        g = 1 / math.sqrt(1 + 3 * opp_phi * opp_phi / math.pi ** 2)
+        expected = 1 / (1 + math.exp(-g * (team_mu - opp_mu)))
+        v = 1 / (g * g * expected * (1 - expected))
+        surprise = g * (score - expected)
+        floor = RATING_DEVIATION_MIN / GLICKO_SCALE
+
+        rated = []
+        for elo, dev, vol in team:
+            phi = dev / GLICKO_SCALE
+            new_vol = self._volatility(phi, vol, v * surprise, v)
+            phi_star = math.sqrt(phi * phi + new_vol * new_vol)
+            new_phi = max(floor, 1 / math.sqrt(1 / (phi_star * phi_star) + 1 / v))
+            new_mu = elo / GLICKO_SCALE + new_phi * new_phi * surprise
+            rated.append((new_mu * GLICKO_SCALE, new_phi * GLICKO_SCALE, new_vol))
+        return rated
+
+    def rate_match(self, red, blue, red_score, averages=None):
+        if averages is None:
+            averages = (sum(r[0] for r in red) / len(red), sum(r[0] for r in blue) / len(blue))
+        red_mu, blue_mu = averages[0] / GLICKO_SCALE, averages[1] / GLICKO_SCALE
+        red_phi = math.sqrt(sum(r[1] * r[1] for r in red) / len(red)) / GLICKO_SCALE
+        blue_phi = math.sqrt(sum(r[1] * r[1] for r in blue) / len(blue)) / GLICKO_SCALE
+        return (self._rate_team(red, red_mu, blue_mu, blue_phi, red_score),
+                self._rate_team(blue, blue_mu, red_mu, red_phi, 1 - red_score))
+
+    def win_probability(self, red, blue, averages=None):
+        if averages is None:
+            averages = (sum(r[0] for r in red) / len(red), sum(r[0] for r in blue) / len(blue))
+        # Both teams' uncertainty flattens the prediction towards 50%
+        phi_sq = (sum(r[1] * r[1] for r in red) / len(red) + sum(r[1] * r[1] for r in blue) / len(blue))
+        g = 1 / math.sqrt(1 + 3 * phi_sq / (GLICKO_SCALE * GLICKO_SCALE) / math.pi ** 2)
+        return 1 / (1 + math.exp(-g * (averages[0] - averages[1]) / GLICKO_SCALE))
+
+
+RATING_ENGINES = {
+    EloEngine.name: EloEngine,
+    Glicko2TeamEngine.name: Glicko2TeamEngine
+}
+DEFAULT_RATING_ENGINE = EloEngine.name
+
+
+def get_rating_engine(name: Optional[str] = None, **options) -> RatingEngine:
+    """Engine instance by name (unknown/None = ELO); options the engine doesn't take are ignored"""
+    engine_class = RATING_ENGINES.get(name or DEFAULT_RATING_ENGINE, EloEngine)
+    return engine_class(**{key: value for key, value in options.items()
+                           if key in engine_class.OPTIONS and value is not None})
+
+
+# ============================================================================
+# History Replay
+# ============================================================================
+
+
+class ReplayState:
+    """Array-backed rating state for one server, one slot per player
+
+    Per-mode rating pools get a ReplayState of their own in pools (see pool_slots).
+    """
+
+    def __init__(self, starting_elo: float = STARTING_ELO):
+        self.starting_elo = starting_elo
+        self.slots = {}  # {discord_id: slot}
+        self.ids = []
+        self.elo = array('d')
+        self.peak = array('d')  # NaN = never set (peak_elo NULL)
+        self.wins = array('l')
+        self.losses = array('l')
+        self.games = array('l')  # PUGs rated in this state, splits included
+        self.streak = array('l')
+        self.best_win = array('l')
+        self.best_loss = array('l')
+        self.deviation = array('d')  # NaN = not tracked (rating_deviation NULL)
+        self.volatility = array('d')
+        self.pools = {}  # {pool: ReplayState}
+
+    def slot(self, discord_id: str) -> int:
+        slot = self.slots.get(discord_id)
+        if slot is None:
+            slot = self.slots[discord_id] = len(self.ids)
+            self.ids.append(discord_id)
+            self.elo.append(self.starting_elo)
+            self.peak.append(math.nan)
+            self.deviation.append(math.nan)
+            self.volatility.append(math.nan)
+            for column in (self.wins, self.losses, self.games, self.streak, self.best_win, self.best_loss):
+                column.append(0)
+        return slot
+
+    def pool_slots(self, pool: str, discord_ids: List[str]) -> Tuple['ReplayState', List[int]]:
+        """The state a pool's ratings live in and the players' slots there
+
+        Players new to a pool start from their server ELO at that point, as live (DatabaseManager.get_ratings).
+        """
+        pool_state = self.pools.get(pool)
+        if pool_state is None:
+            pool_state = self.pools[pool] = ReplayState(self.starting_elo)
+        slots = []
+        for discord_id in discord_ids:
+            if discord_id not in pool_state.slots:
+                pool_state.elo[pool_state.slot(discord_id)] = self.elo[self.slot(discord_id)]
+            slots.append(pool_state.slots[discord_id])
+        return pool_state, slots
+
+    def set_elo(self, slot: int, new_elo: float):
+        """Same peak rule as DatabaseManager.update_player_elo"""
+        self.elo[slot] = new_elo
+        peak = self.peak[slot]
+        if math.isnan(peak) or new_elo > peak:
+            self.peak[slot] = new_elo
+
+    def apply_adjustment(self, discord_id: str, adjustment: Dict):
+        """Apply one ledger row (.setelo, .importelos, baseline snapshot, decay, ...)"""
+        slot = self.slot(discord_id)
+        if adjustment.get('elo') is not None:
+            self.set_elo(slot, adjustment['elo'])
+        if adjustment.get('elo_delta') is not None:
+            # Relative change (rating decay) - applied to the replayed ELO, never taking it below the floor
+            floor = adjustment.get('elo_floor')
+            if floor is None:
+                self.elo[slot] += adjustment['elo_delta']
+            elif self.elo[slot] > floor:
+                self.elo[slot] = max(floor, self.elo[slot] + adjustment['elo_delta'])
+        if adjustment.get('peak_elo') is not None:
+            self.peak[slot] = adjustment['peak_elo']
+        for field, column in (('wins', self.wins), ('losses', self.losses), ('current_streak', self.streak),
+                              ('best_win_streak', self.best_win), ('best_loss_streak', self.best_loss)):
+            if adjustment.get(field) is not None:
+                column[slot] = adjustment[field]
+
+    def record_result(self, slot: int, won: bool):
+        """Same streak rules as DatabaseManager.update_player_stats"""
+        streak = self.streak[slot]
+        if won:
+            self.wins[slot] += 1
+            streak = streak + 1 if streak >= 0 else 1
+            self.best_win[slot] = max(self.best_win[slot], streak)
+        else:
+            self.losses[slot] += 1
+            streak = streak - 1 if streak <= 0 else -1
+            self.best_loss[slot] = max(self.best_loss[slot], -streak)
+        self.streak[slot] = streak
+
+    def rating(self, slot: int, engine: RatingEngine) -> Rating:
+        deviation, volatility = self.deviation[slot], self.volatility[slot]
+        return engine.seed(self.elo[slot],
+                           None if math.isnan(deviation) else deviation,
+                           None if math.isnan(volatility) else volatility,
+                           self.wins[slot] + self.losses[slot])
+
+    def set_rating(self, slot: int, rating: Rating):
+        elo, deviation, volatility = rating
+        self.set_elo(slot, elo)
+        self.deviation[slot] = math.nan if deviation is None else deviation
+        self.volatility[slot] = math.nan if volatility is None else volatility
+
+    def player(self, discord_id: str) -> Dict:
+        slot = self.slots[discord_id]
+        peak = self.peak[slot]
+        deviation, volatility = self.deviation[slot], self.volatility[slot]
+        return {
+            'discord_id': discord_id,
+            'elo': self.elo[slot],
+            'peak_elo': None if math.isnan(peak) else peak,
+            'wins': self.wins[slot],
+            'losses': self.losses[slot],
+            'games': self.games[slot],
+            'current_streak': self.streak[slot],
+            'best_win_streak': self.best_win[slot],
+            'best_loss_streak': self.best_loss[slot],
+            'rating_deviation': None if math.isnan(deviation) else deviation,
+            'rating_volatility': None if math.isnan(volatility) else volatility
+        }
+
+
+def replay_history(pugs: Iterable[Tuple[int, str, str, List[str], List[str], Optional[str], int,
+                                         Optional[Tuple[float, float]], Dict[str, float]]],
+                   adjustments: Iterable[Tuple[int, str, Dict]],
+                   mode_engines: Optional[Dict] = None,
+                   starting_elo: float = STARTING_ELO, record_changes: bool = False,
+                   default_engine: Optional[RatingEngine] = None) -> Dict:
+    """Recompute ratings for one server from its settled PUGs
+
+    pugs: (pug_id, game_mode, winner, red_team, blue_team, pool, settled_seq, averages, elo_before) in settle
+          order, winner in red/blue/split, pool the rating pool the PUG was settled in (None = the shared
+          server ELO), averages the team averages stored at pick time and elo_before the logged rating of
+          each player before the result (see DatabaseManager.iter_settled_pugs)
+    adjustments: (after_seq, discord_id, fields) in ledger order - applied once every PUG settled
+                 up to after_seq has been replayed (settle order, not PUG number - PUGs overlap)
+    mode_engines: {game_mode: engine name or RatingEngine}; modes not listed use default_engine (ELO)
+    record_changes: also return every (pug_id, discord_id, engine, before, after, score, pool) rating change
+
+    Same maths and streak rules as live result processing. Live results use the averages stored
+    when the teams were picked, which can predate other results for the same players (PUGs overlap),
+    so the replay starts from the stored averages and moves each team's by how far its replayed
+    ratings are from the logged ones - untouched history replays to exactly the live values, and a
+    correction still carries through. PUGs from before the rating history use the replayed averages.
+    O(total player-games).
+    PUGs settled in a per-mode pool are rated in that pool (state.pools) and count towards
+    the players' overall wins/losses/streaks, as live.
+    Pre-match win probabilities of decided (non-split) PUGs are scored as they go.
+    Returns {'state': ReplayState, 'pug_averages': {pug_id: (avg_red, avg_blue)}, 'rating_changes': list,
+             'predictions': {'count', 'log_loss', 'brier', 'accuracy'} or None, 'pugs': count, 'seconds': float}
+    """
+    started = time.perf_counter()
+    state = ReplayState(starting_elo)
+    engines = {mode: engine if isinstance(engine, RatingEngine) else get_rating_engine(engine)
+               for mode, engine in (mode_engines or {}).items()}
+    default_engine = default_engine or get_rating_engine()
+    pending = iter(adjustments)
+    next_adjustment = next(pending, None)
+    pug_averages = {}
+    rating_changes = []
+    count = 0
+    predicted = 0
+    log_loss = brier = correct = 0.0
+
+    def apply_until(settled_seq):
+        nonlocal next_adjustment
+        while next_adjustment is not None and next_adjustment[0] < settled_seq:
+            state.apply_adjustment(next_adjustment[1], next_adjustment[2])
+            next_adjustment = next(pending, None)
+
+    for pug_id, game_mode, winner, red_team, blue_team, pool, settled_seq, stored_averages, elo_before in pugs:
+        apply_until(settled_seq)
+        if not red_team or not blue_team:
+            continue
+        engine = engines.get(game_mode, default_engine)
+        if pool is None:
+            rated = state
+            red_slots = [state.slot(uid) for uid in red_team]
+            blue_slots = [state.slot(uid) for uid in blue_team]
+        else:
+            rated, red_slots = state.pool_slots(pool, red_team)
+            blue_slots = state.pool_slots(pool, blue_team)[1]
+        elo = rated.elo
+        averages = (sum(elo[s] for s in red_slots) / len(red_slots),
+                    sum(elo[s] for s in blue_slots) / len(blue_slots))
+        if stored_averages is not None and all(uid in elo_before for uid in red_team + blue_team):
+            averages = (stored_averages[0] + averages[0] - sum(elo_before[uid] for uid in red_team) / len(red_team),
+                        stored_averages[1] + averages[1] - sum(elo_before[uid] for uid in blue_team) / len(blue_team))
+        pug_averages[pug_id] = averages
+
+        red_score = 0.5 if winner == 'split' else (1.0 if winner == 'red' else 0.0)
+        slots = red_slots + blue_slots
+        before = [rated.rating(s, engine) for s in slots]
+        before_red, before_blue = before[:len(red_slots)], before[len(red_slots):]
+        if winner != 'split':
+            p_red = engine.win_probability(before_red, before_blue, averages)
+            p_result = min(max(p_red if red_score else 1 - p_red, 1e-12), 1.0)
+            log_loss -= math.log(p_result)
+            brier += (p_red - red_score) ** 2
+            correct += 1.0 if p_result > 0.5 else (0.5 if p_result == 0.5 else 0.0)
+            predicted += 1
+        new_red, new_blue = engine.rate_match(before_red, before_blue, red_score, averages)
+        for s, rating in zip(slots, new_red + new_blue):
+            rated.set_rating(s, rating)
+            rated.games[s] += 1
+        if record_changes:
+            scores = [red_score] * len(red_slots) + [1.0 - red_score] * len(blue_slots)
+            rating_changes.extend((pug_id, rated.ids[s], engine.name, old, new, score, pool)
+                                  for s, old, new, score in zip(slots, before, new_red + new_blue, scores))
+        if winner != 'split':
+            for team, team_slots in (('red', red_slots), ('blue', blue_slots)):
+                for s in team_slots:
+                    rated.record_result(s, winner == team)
+            if pool is not None:
+                # Pool games still count towards the overall record and streaks
+                for uid in red_team:
+                    state.record_result(state.slot(uid), winner == 'red')
+                for uid in blue_team:
+                    state.record_result(state.slot(uid), winner == 'blue')
+        count += 1
+
+    apply_until(math.inf)
+    return {
+        'state': state,
+        'pug_averages': pug_averages,
+        'rating_changes': rating_changes,
+        'predictions': {
+            'count': predicted,
+            'log_loss': log_loss / predicted,
+            'brier': brier / predicted,
+            'accuracy': correct / predicted
+        } if predicted else None,
+        'pugs': count,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def _changed_fields(old: Dict, new: Dict, fields: Iterable[str], tolerance: float) -> List[str]:
+    changed = []
+    for field in fields:
+        if field in UNCERTAINTY_FIELDS and new[field] is None:
+            continue  # Only written by engines that track it
+        if old.get(field) is None and new[field] is None:
+            continue
+        if old.get(field) is None or new[field] is None or abs(old[field] - new[field]) > tolerance:
+            changed.append(field)
+    return changed
+
+
+def diff_replay(state: ReplayState, current_players: List[Dict], tolerance: float = 0.005) -> List[Dict]:
+    """Players whose stored stats differ from the replayed ones (largest ELO change first)
+
+    Only players that exist in the players table are reported; players the history never
+    touched keep their stored values. Entries have pool None (see diff_pool_replay).
+    """
+    changes = []
+    for player in current_players:
+        discord_id = player['discord_id']
+        if discord_id not in state.slots:
+            continue
+        replayed = state.player(discord_id)
+        changed_fields = _changed_fields(player, replayed, ADJUSTABLE_FIELDS + UNCERTAINTY_FIELDS, tolerance)
+        if changed_fields:
+            changes.append({
+                'discord_id': discord_id,
+                'pool': None,
+                'old': {field: player.get(field) for field in ADJUSTABLE_FIELDS + UNCERTAINTY_FIELDS},
+                'new': replayed,
+                'fields': changed_fields
+            })
+    changes.sort(key=lambda c: abs((c['new']['elo'] or 0) - (c['old']['elo'] or 0)), reverse=True)
+    return changes
+
+
+def diff_pool_replay(state: ReplayState, stored: Dict[Tuple[str, str], Dict], player_ids: Iterable[str],
+                     tolerance: float = 0.005) -> List[Dict]:
+    """Per-mode pool ratings that differ from the replayed ones (largest ELO change first)
+
+    stored: {(pool, discord_id): player_ratings row}. Only players in player_ids (the players
+    table) are reported; a replayed rating with no stored row is reported with old values None.
+    """
+    player_ids = set(player_ids)
+    fields = POOL_FIELDS + UNCERTAINTY_FIELDS
+    changes = []
+    for pool, pool_state in state.pools.items():
+        for discord_id in pool_state.ids:
+            if discord_id not in player_ids:
+                continue
+            replayed = pool_state.player(discord_id)
+            row = stored.get((pool, discord_id), {})
+            changed_fields = _changed_fields(row, replayed, fields, tolerance)
+            if changed_fields:
+                changes.append({
+                    'discord_id': discord_id,
+                    'pool': pool,
+                    'old': {field: row.get(field) for field in fields},
+                    'new': replayed,
+                    'fields': changed_fields
+                })
+    changes.sort(key=lambda c: abs((c['new']['elo'] or 0) - (c['old']['elo'] or 0)), reverse=True)
+    return changes
+
+
+# ============================================================================
+# What-If Simulation
+# ============================================================================
+
+def ranking_churn(before: ReplayState, after: ReplayState, player_ids: Iterable[str], top_n: int = 10) -> Dict:
+    """How much the ELO ladder reorders between two replays
+
+    Only players in both replays (and in player_ids, i.e. still in the players table) are ranked.
+    Returns {'players', 'mean_move', 'max_move', 'spearman', 'top_kept', 'top_n', 'movers'}
+    """
+    ranked = [uid for uid in player_ids if uid in before.slots and uid in after.slots]
+    if not ranked:
+        return {'players': 0, 'mean_move': 0.0, 'max_move': 0, 'spearman': 1.0,
+                'top_kept': 0, 'top_n': top_n, 'movers': []}
+
+    def ladder(state):
+        order = sorted(ranked, key=lambda uid: state.elo[state.slots[uid]], reverse=True)
+        return {uid: rank for rank, uid in enumerate(order, 1)}, order
+
+    old_ranks, old_order = ladder(before)
+    new_ranks, new_order = ladder(after)
+    n = len(ranked)
+    moves = {uid: old_ranks[uid] - new_ranks[uid] for uid in ranked}  # Positive = moved up
+    squared = sum(move * move for move in moves.values())
+    movers = sorted(ranked, key=lambda uid: abs(moves[uid]), reverse=True)[:5]
+    return {
+        'players': n,
+        'mean_move': sum(abs(move) for move in moves.values()) / n,
+        'max_move': max(abs(move) for move in moves.values()),
+        'spearman': 1 - 6 * squared / (n * (n * n - 1)) if n > 1 else 1.0,
+        'top_kept': len(set(old_order[:top_n]) & set(new_order[:top_n])),
+        'top_n': min(top_n, n),
+        'movers': [{
+            'discord_id': uid,
+            'old_rank': old_ranks[uid],
+            'new_rank': new_ranks[uid],
+            'old_elo': before.elo[before.slots[uid]],
+            'new_elo': after.elo[after.slots[uid]]
+        } for uid in movers if moves[uid]]
+    }
+
+
+def what_if(pugs: List[Tuple], adjustments: List[Tuple], mode_engines: Dict[str, str], player_ids: List[str],
+            engine: Optional[str] = None, starting_elo: float = STARTING_ELO,
+            alternative_adjustments: Optional[List[Tuple]] = None, **options) -> Dict:
+    """Replay history with the current settings and with alternative ones, entirely in memory
+
+    engine: switch every mode to this engine (default: keep each mode's engine)
+    options: engine settings to try, e.g. k_factor=24, tau=0.3
+    alternative_adjustments: ledger for the alternative run (e.g. without the baseline
+                             snapshot, so starting_elo re-seeds everyone)
+    Returns {'current': replay result, 'alternative': replay result, 'churn': ranking_churn,
+             'pool_churn': {pool: ranking_churn}}
+    """
+    current = replay_history(pugs, adjustments, mode_engines)
+    alternative_engines = {mode: get_rating_engine(engine or name, **options) for mode, name in mode_engines.items()}
+    alternative = replay_history(pugs, adjustments if alternative_adjustments is None else alternative_adjustments,
+                                 alternative_engines, starting_elo,
+                                 default_engine=get_rating_engine(engine, **options))
+    return {
+        'current': current,
+        'alternative': alternative,
+        'churn': ranking_churn(current['state'], alternative['state'], player_ids),
+        'pool_churn': {pool: ranking_churn(pool_state, alternative['state'].pools[pool], player_ids)
+                       for pool, pool_state in sorted(current['state'].pools.items())
+                       if pool in alternative['state'].pools}
+    }
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+PUG Pro Discord Bot - What-If Rating Simulator
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Replays a server's stored PUG history under different rating settings entirely in memory
+(nothing is written) and compares them with the current settings: how well each predicted
+the results, and how much the ladder would reorder.
+
+Usage:
+    python simulate_ratings.py --k 24                      # smaller ELO steps
+    python simulate_ratings.py --engine glicko2 --tau 0.3  # try Glicko-2 for every mode
+    python simulate_ratings.py --seed 1000                 # everyone starts from 1000 at PUG #1
+    python simulate_ratings.py --db pug_data.db --server 123456789012345678 --k 40
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from typing import List, Dict
+from urllib.parse import quote
+
+from database import DatabaseManager
+from ratings import what_if, RATING_ENGINES
+
+
+class ReadOnlyDatabase(DatabaseManager):
+    """DatabaseManager over an existing database opened read-only - no schema setup or migrations"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def get_connection(self):
+        return sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True)
+
+
+def server_pug_counts(db: DatabaseManager) -> Dict[str, int]:
+    """{server_id: decided PUGs} for every server in the database"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT server_id, COUNT(*) FROM pugs
+        WHERE server_id IS NOT NULL AND winner IS NOT NULL
+        GROUP BY server_id
+    ''')
+    counts = dict(cursor.fetchall())
+    conn.close()
+    return counts
+
+
+def run_simulation(db: DatabaseManager, server_id: str, engine: str = None, k_factor: float = None,
+                   tau: float = None, seed_elo: float = None) -> Dict:
+    """What-if comparison for one server (see ratings.what_if)"""
+    pugs = list(db.iter_settled_pugs(server_id))
+    adjustments = db.get_rating_adjustments(server_id)
+    # Re-seeding ignores the baseline snapshot so the whole history is replayed from seed_elo
+    alternative_adjustments = db.get_rating_adjustments(server_id, include_baseline=False) if seed_elo is not None else None
+    player_ids = [p['discord_id'] for p in db.get_all_players(server_id)]
+    options = {'k_factor': k_factor, 'tau': tau}
+    if seed_elo is not None:
+        options['starting_elo'] = seed_elo
+    return what_if(pugs, adjustments, db.get_mode_rating_engines(), player_ids, engine,
+                   alternative_adjustments=alternative_adjustments, **options)
+
+
+def format_report(result: Dict, names: Dict[str, str] = None) -> List[str]:
+    """Plain-text report lines"""
+    names = names or {}
+    lines = []
+    current, alternative = result['current'], result['alternative']
+    lines.append(f"Replayed {current['pugs']} PUGs twice in "
+                 f"{current['seconds'] + alternative['seconds']:.2f}s")
+    lines.append("")
+    lines.append(f"{'':<12}{'current':>10}{'what-if':>10}")
+    for key, label, fmt in (('log_loss', 'Log-loss', '{:.4f}'), ('brier', 'Brier', '{:.4f}'),
+                            ('accuracy', 'Favourite', '{:.1%}')):
+        cur = current['predictions'][key] if current['predictions'] else None
+        alt = alternative['predictions'][key] if alternative['predictions'] else None
+        lines.append(f"{label:<12}{fmt.format(cur) if cur is not None else '-':>10}"
+                     f"{fmt.format(alt) if alt is not None else '-':>10}")
+    lines.append("(lower log-loss/Brier = better predictions; favourite = how often the "
+                 "higher-rated team won)")
+
+    churn = result['churn']
+    lines.append("")
+    lines.append(f"Ladder churn over {churn['players']} players: mean move {churn['mean_move']:.1f} places, "
+                 f"max {churn['max_move']}, Spearman {churn['spearman']:.3f}, "
+                 f"top {churn['top_n']} kept {churn['top_kept']}/{churn['top_n']}")
+    for mover in churn['movers']:
+        name = names.get(mover['discord_id'], mover['discord_id'])
+        lines.append(f"  {name}: #{mover['old_rank']} -> #{mover['new_rank']} "
+                     f"({mover['old_elo']:.0f} -> {mover['new_elo']:.0f})")
+    for pool, churn in result['pool_churn'].items():
+        lines.append(f"Pool {pool} churn over {churn['players']} players: mean move {churn['mean_move']:.1f} places, "
+                     f"max {churn['max_move']}, top {churn['top_n']} kept {churn['top_kept']}/{churn['top_n']}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay PUG history under different rating settings (read-only)")
+    parser.add_argument('--db', default='pug_data.db', help="Bot database (default: pug_data.db)")
+    parser.add_argument('--server', help="Discord server ID (default: the only server in the database)")
+    parser.add_argument('--engine', choices=list(RATING_ENGINES), help="Rate every mode with this engine")
+    parser.add_argument('--k', type=float, dest='k_factor', help="ELO K-factor to try")
+    parser.add_argument('--tau', type=float, help="Glicko-2 volatility constraint to try")
+    parser.add_argument('--seed', type=float, dest='seed_elo',
+                        help="Start every player from this ELO at the first PUG")
+    args = parser.parse_args(argv)
+    if args.k_factor is not None and args.k_factor <= 0:
+        parser.error("--k must be greater than 0")
+    if args.tau is not None and args.tau <= 0:
+        parser.error("--tau must be greater than 0")
+    if not os.path.isfile(args.db):
+        print(f"❌ Database not found: {args.db}")
+        return 1
+
+    db = ReadOnlyDatabase(args.db)
+    try:
+        return simulate(db, args)
+    except sqlite3.OperationalError as e:
+        # e.g. a database from an older bot version - start the bot once to bring its schema up to date
+        print(f"❌ Could not read {args.db}: {e}")
+        return 1
+
+
+def simulate(db: DatabaseManager, args) -> int:
+    server_id = args.server
+    if server_id is None:
+        counts = server_pug_counts(db)
+        if len(counts) != 1:
+            print("❌ Pick a server with --server:" if counts else "❌ No decided PUGs in this database")
+            for sid, count in sorted(counts.items(), key=lambda item: -item[1]):
+                print(f"   {sid}  ({count} PUGs)")
+            return 1
+        server_id = next(iter(counts))
+
+    result = run_simulation(db, server_id, args.engine, args.k_factor, args.tau, args.seed_elo)
+    if not result['current']['pugs']:
+        print(f"❌ No decided PUGs for server {server_id}")
+        return 1
+
+    names = {p['discord_id']: p['display_name'] or p['discord_name'] or p['discord_id']
+             for p in db.get_all_players(server_id)}
+    print("\n".join(format_report(result, names)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+PUG Pro Discord Bot - Win/Loss Streaks
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Streak rules shared by result processing and repairs. Streaks can be rebuilt from the
+settled match sequence in one streaming pass, e.g. after a result is undone or to backfill
+best streaks that were never tracked.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+from typing import Iterable, Iterator, List, Dict, Tuple, Optional
+
+# (current_streak, best_win_streak, best_loss_streak) - current is +wins / -losses
+Streak = Tuple[int, int, int]
+
+STREAK_FIELDS = ('current_streak', 'best_win_streak', 'best_loss_streak')
+NO_STREAK = (0, 0, 0)
+
+
+def advance_streak(streak: Streak, won: bool) -> Streak:
+    """Streak after one more decided result (same rules as DatabaseManager.update_player_stats)"""
+    current, best_win, best_loss = streak
+    if won:
+        current = current + 1 if current >= 0 else 1
+        best_win = max(best_win, current)
+    else:
+        current = current - 1 if current <= 0 else -1
+        best_loss = max(best_loss, -current)
+    return current, best_win, best_loss
+
+
+def apply_streak_fields(streak: Streak, fields: Dict) -> Streak:
+    """Streak after a ledger adjustment (fields left as None are unchanged)"""
+    return tuple(streak[i] if fields.get(name) is None else fields[name]
+                 for i, name in enumerate(STREAK_FIELDS))
+
+
+def compute_streaks(results: Iterable[Tuple[str, int, bool]],
+                    adjustments: Iterable[Tuple[int, str, Dict]] = (),
+                    player_ids: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Streak]]:
+    """Rebuild streaks from history, one player at a time
+
+    results: (discord_id, settled_seq, won) for decided, non-split PUGs, ordered by player then settled_seq
+    adjustments: ledger rows (after_seq, discord_id, fields) in ledger order - applied once
+                 every PUG settled up to after_seq has been counted, as in ratings.replay_history
+    player_ids: also yield these players if they have no results (they end at NO_STREAK or
+                their last adjustment)
+    Only one player's results are held at a time. Yields (discord_id, streak).
+    """
+    by_player: Dict[str, List[Tuple[int, Dict]]] = {}
+    for after_seq, discord_id, fields in adjustments:
+        if any(fields.get(name) is not None for name in STREAK_FIELDS):
+            by_player.setdefault(str(discord_id), []).append((after_seq, fields))
+    remaining = set(map(str, player_ids)) if player_ids is not None else set()
+
+    def finish(discord_id, streak, pending, index):
+        for _, fields in pending[index:]:
+            streak = apply_streak_fields(streak, fields)
+        remaining.discard(discord_id)
+        return discord_id, streak
+
+    current_id = None
+    streak, pending, index = NO_STREAK, [], 0
+    for discord_id, settled_seq, won in results:
+        discord_id = str(discord_id)
+        if discord_id != current_id:
+            if current_id is not None:
+                yield finish(current_id, streak, pending, index)
+            current_id = discord_id
+            streak, pending, index = NO_STREAK, by_player.pop(discord_id, []), 0
+        while index < len(pending) and pending[index][0] < settled_seq:
+            streak = apply_streak_fields(streak, pending[index][1])
+            index += 1
+        streak = advance_streak(streak, won)
+    if current_id is not None:
+        yield finish(current_id, streak, pending, index)
+
+    # Players with adjustments but no results, then anyone asked for who has neither
+    for discord_id, pending in by_player.items():
+        if player_ids is None or discord_id in remaining:
+            yield finish(discord_id, NO_STREAK, pending, 0)
+    for discord_id in sorted(remaining):
+        yield discord_id, NO_STREAK
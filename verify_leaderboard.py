@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+PUG Pro Discord Bot - Leaderboard Sync Check
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Runs the #leaderboard auto-update (diff_layout + sync_leaderboard) against synthetic ladders
+of 10 to 5000 players without Discord: PUG results, players joining and leaving, and
+leaderboard messages deleted by hand while the bot was offline (picked up by the startup
+check). After every update the simulated channel must show exactly the freshly rendered
+ladder, in order, with the stored message ids and digests matching it.
+
+sync_leaderboard and check_leaderboard_messages are taken from pug_bot.py's source (importing
+pug_bot would need discord.py and start the bot) and run with a stand-in channel and an
+unthrottled outbound scheduler.
+
+Usage:
+    python verify_leaderboard.py                          # default sizes, 30 updates each
+    python verify_leaderboard.py --sizes 180,181,5000 --steps 100
+    python verify_leaderboard.py --seed 7                 # different random updates
+
+Exits with status 1 on the first update that leaves the channel out of step.
+"""
+
+import argparse
+import ast
+import asyncio
+import os
+import random
+import sys
+import time
+import types
+from datetime import datetime
+from itertools import count
+from typing import Dict, List
+
+from leaderboard import chunk_digest, diff_layout, render_chunks, short_name
+from outbound import OutboundScheduler
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pug_bot.py')
+DEFAULT_SIZES = [10, 100, 180, 181, 500, 1000, 2500, 5000]
+
+
+# ============================================================================
+# Stand-in Discord channel
+# ============================================================================
+
+class HTTPException(Exception):
+    pass
+
+
+class NotFound(HTTPException):
+    pass
+
+
+class Forbidden(HTTPException):
+    pass
+
+
+class FakeMessage:
+    def __init__(self, channel: 'FakeChannel', message_id: int):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, embed=None):
+        self.channel.calls += 1
+        if self.id not in self.channel.posts:
+            raise NotFound()
+        self.channel.posts[self.id] = embed
+        return self
+
+    async def delete(self):
+        self.channel.calls += 1
+        if self.id not in self.channel.posts:
+            raise NotFound()
+        del self.channel.posts[self.id]
+
+
+class FakeChannel:
+    """Messages by id (ids increase, so sorting gives the on-screen order) and an API call count"""
+
+    _ids = count(1)
+
+    def __init__(self):
+        self.id = next(self._ids)
+        self.posts = {}
+        self.next_message_id = 0
+        self.calls = 0
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self, message_id)
+
+    async def history(self, limit=None, after=None, oldest_first=False):
+        """Messages after `after`, oldest first - one API call per 100 like Discord's pages"""
+        message_ids = sorted(self.posts)
+        if after is not None:
+            message_ids = [message_id for message_id in message_ids if message_id > after.id]
+        for n, message_id in enumerate(message_ids[:limit]):
+            if n % 100 == 0:
+                self.calls += 1
+            yield FakeMessage(self, message_id)
+
+    async def send(self, content=None, embed=None) -> FakeMessage:
+        self.calls += 1
+        self.next_message_id += 1
+        self.posts[self.next_message_id] = embed
+        return FakeMessage(self, self.next_message_id)
+
+    def shown(self) -> List:
+        return [self.posts[message_id] for message_id in sorted(self.posts)]
+
+
+def fake_embed(idx: int, text: str, total_players: int, footer_note: str = ""):
+    """What leaderboard_embed puts on screen, as a comparable tuple"""
+    return idx, text, total_players if idx == 0 else None
+
+
+def load_leaderboard_functions():
+    """(sync_leaderboard, check_leaderboard_messages) from pug_bot.py, bound to the stand-ins above"""
+    with open(BOT_FILE, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    names = ('sync_leaderboard', 'check_leaderboard_messages')
+    nodes = [n for n in tree.body if isinstance(n, ast.AsyncFunctionDef) and n.name in names]
+    namespace = {
+        'asyncio': asyncio,
+        'datetime': datetime,
+        'discord': types.SimpleNamespace(HTTPException=HTTPException, NotFound=NotFound, Forbidden=Forbidden,
+                                         Object=lambda id: types.SimpleNamespace(id=id)),
+        'chunk_digest': chunk_digest,
+        'diff_layout': diff_layout,
+        'leaderboard_embed': fake_embed,
+        'outbound': OutboundScheduler(rate=1e9, burst=10 ** 9, coalesce_window=0)
+    }
+    exec(compile(ast.Module(nodes, type_ignores=[]), BOT_FILE, 'exec'), namespace)
+    return tuple(namespace[name] for name in names)
+
+
+# ============================================================================
+# Simulation
+# ============================================================================
+
+def render_ladder(players: Dict[str, int]):
+    """(chunks, total_players) the way update_leaderboard renders them"""
+    ranked = sorted(players.items(), key=lambda item: -item[1])
+    entries = [{'rank': rank, 'name': short_name(name), 'elo': elo}
+               for rank, (name, elo) in enumerate(ranked, 1)]
+    return render_chunks(entries), len(entries)
+
+
+def random_update(rng: random.Random, players: Dict[str, int]):
+    """One change to the ladder: a PUG result, players joining, or players leaving"""
+    roll = rng.random()
+    if roll < 0.5:
+        for name in rng.sample(list(players), min(10, len(players))):
+            players[name] += rng.randint(-25, 25)
+    elif roll < 0.75:
+        for _ in range(rng.randint(1, 200)):
+            players[f"new{rng.random():.12f}"] = rng.randint(600, 2000)
+    else:
+        for name in rng.sample(list(players), min(len(players) - 5, rng.randint(1, 200))):
+            del players[name]
+
+
+async def check_size(sync_leaderboard, check_leaderboard_messages, size: int, steps: int,
+                     rng: random.Random) -> Dict:
+    """Run `steps` updates on a ladder of `size` players; raises AssertionError on a mismatch"""
+    channel = FakeChannel()
+    players = {f"player{i}": rng.randint(600, 2000) for i in range(size)}
+    data = {'channel_id': channel.id, 'message_ids': [], 'messages': {}, 'digests': []}
+    chunks, total = render_ladder(players)
+    await sync_leaderboard(channel, data, chunks, total)
+
+    calls = 0
+    extra_calls = 0
+    for step in range(steps):
+        random_update(rng, players)
+        if rng.random() < 0.1 and channel.posts:
+            # Someone deleted a leaderboard message while the bot was offline - restart from the
+            # stored ids and digests the way init_guild_leaderboard does
+            victim = rng.choice(list(channel.posts))
+            del channel.posts[victim]
+            data = {'channel_id': channel.id, 'message_ids': list(data['message_ids']), 'messages': {},
+                    'digests': list(data['digests'])}
+            missing = await check_leaderboard_messages(channel, data)
+            assert missing == 1, f"{size} players, update {step}: {missing} missing messages found, expected 1"
+
+        chunks, total = render_ladder(players)
+        digests = [chunk_digest(idx, text, total) for idx, text in enumerate(chunks)]
+        plan = diff_layout(data['digests'], digests)
+        needed = len(plan['edit']) + len(plan['create']) + len(plan['delete'])
+
+        channel.calls = 0
+        await sync_leaderboard(channel, data, chunks, total)
+        expected = [fake_embed(idx, text, total) for idx, text in enumerate(chunks)]
+        assert channel.shown() == expected, f"{size} players, update {step}: channel doesn't show the ladder"
+        assert data['message_ids'] == sorted(channel.posts), f"{size} players, update {step}: message ids out of step"
+        assert data['digests'] == digests, f"{size} players, update {step}: digests out of step"
+        calls += channel.calls
+        extra_calls = max(extra_calls, channel.calls - needed)
+
+    return {'chunks': len(chunks), 'calls': calls, 'extra_calls': extra_calls}
+
+
+async def run_checks(sizes: List[int], steps: int, seed: int) -> int:
+    sync_leaderboard, check_leaderboard_messages = load_leaderboard_functions()
+    for size in sizes:
+        rng = random.Random(f"{seed}-{size}")
+        start = time.perf_counter()
+        try:
+            result = await check_size(sync_leaderboard, check_leaderboard_messages, size, steps, rng)
+        except AssertionError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"{size:>5} players  {result['chunks']:>3} chunks  {result['calls']:>5} API calls  "
+              f"max {result['extra_calls']} extra (deleted message recovery)  "
+              f"{time.perf_counter() - start:.2f}s")
+    print("✅ Leaderboard stayed in sync for every size")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the leaderboard auto-update on synthetic ladders")
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help="Comma-separated ladder sizes (default 10-5000)")
+    parser.add_argument('--steps', type=int, default=30, help="Updates per ladder size")
+    parser.add_argument('--seed', type=int, default=2004)
+    args = parser.parse_args(argv)
+
+    sizes = [int(n) for n in args.sizes.split(',')]
+    if any(n < 10 for n in sizes):
+        parser.error("sizes must be at least 10 players")
+    return asyncio.run(run_checks(sizes, args.steps, args.seed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+PUG Pro Discord Bot - Reaction Votes
+
+A customizable version of the TAM Pro Bot
+Originally developed for the UT2004 Unreal Fight Club Discord Community
+
+Developed by: fallacy
+
+Tracks reaction votes (.winner, .splitwin, .deadpug) from gateway reaction events instead
+of re-fetching the vote message. Each vote is registered by message id, its tally is
+updated in O(1) per reaction, and it resolves through an asyncio Future as soon as the
+majority is reached or its timer runs out.
+
+Bot made for Competitive Gaming Communities to use for Pick Up Games (PUGs)
+Any questions? Please message fallacy on Discord.
+"""
+
+import asyncio
+from typing import Dict, Iterable, Optional
+
+VOTE_EMOJI = "✅"
+
+
+class Vote:
+    """One active vote - eligible voters, who has voted so far and the Future it resolves"""
+
+    def __init__(self, message_id: int, eligible: Iterable, votes_needed: int, emoji: str = VOTE_EMOJI):
+        self.message_id = message_id
+        self.eligible = {str(uid) for uid in eligible}
+        self.votes_needed = votes_needed
+        self.emoji = emoji
+        self.voters = set()
+        self.rest_calls = 0
+        self.future = asyncio.get_running_loop().create_future()
+        self.timer = None
+
+    @property
+    def yes_votes(self) -> int:
+        return len(self.voters)
+
+    def resolve(self, passed: bool):
+        if not self.future.done():
+            self.future.set_result(passed)
+
+    def add(self, user_id) -> bool:
+        """Count a vote - returns True if it was from an eligible player"""
+        user_id = str(user_id)
+        if user_id not in self.eligible:
+            return False
+        self.voters.add(user_id)
+        if len(self.voters) >= self.votes_needed:
+            self.resolve(True)
+        return True
+
+    def remove(self, user_id) -> bool:
+        """Take a vote back (reaction removed) - a vote that has already passed stays passed"""
+        user_id = str(user_id)
+        if user_id not in self.voters:
+            return False
+        self.voters.discard(user_id)
+        return True
+
+
+class VoteManager:
+    """Active votes by message id, fed by on_raw_reaction_add/remove"""
+
+    def __init__(self):
+        self.votes: Dict[int, Vote] = {}
+        self.finished = 0
+        self.finished_rest_calls = 0
+        self.events = 0
+
+    def start(self, message_id: int, eligible: Iterable, votes_needed: int, timeout: float,
+              emoji: str = VOTE_EMOJI, rest_calls: int = 0) -> Vote:
+        """Register a vote on a sent message; it fails when `timeout` seconds pass without a majority"""
+        vote = Vote(message_id, eligible, votes_needed, emoji)
+        vote.rest_calls = rest_calls
+        vote.timer = asyncio.get_running_loop().call_later(timeout, vote.resolve, False)
+        self.votes[message_id] = vote
+        return vote
+
+    def handle_reaction(self, message_id: int, user_id, emoji: str, added: bool) -> bool:
+        """Apply one reaction event - returns True if it changed an active vote's tally"""
+        vote = self.votes.get(message_id)
+        if vote is None or vote.future.done() or emoji != vote.emoji:
+            return False
+        self.events += 1
+        return vote.add(user_id) if added else vote.remove(user_id)
+
+    async def wait(self, vote: Vote) -> bool:
+        """Wait for a vote to pass (True) or time out (False), then stop tracking it"""
+        try:
+            return await vote.future
+        finally:
+            self.finish(vote)
+
+    def finish(self, vote: Vote):
+        if vote.timer:
+            vote.timer.cancel()
+        vote.resolve(False)
+        if self.votes.pop(vote.message_id, None) is not None:
+            self.finished += 1
+            self.finished_rest_calls += vote.rest_calls
+
+    def get(self, message_id: int) -> Optional[Vote]:
+        return self.votes.get(message_id)
+
+    def stats(self) -> Dict:
+        """{'active', 'active_rest_calls', 'finished', 'rest_calls', 'events'} - REST calls made for votes
+        (sending the message and adding its reactions); counting votes costs none"""
+        active_rest_calls = sum(vote.rest_calls for vote in self.votes.values())
+        return {
+            'active': len(self.votes),
+            'active_rest_calls': active_rest_calls,
+            'finished': self.finished,
+            'rest_calls': self.finished_rest_calls + active_rest_calls,
+            'events': self.events
+        }